@@ -0,0 +1,162 @@
+# aggregates.py
+# Pre-agregación de data_graf: tablas diarias por MCP y totales acumulados.
+# El dashboard lee solo estas tablas pequeñas en vez de agrupar el crudo.
+import json
+import os
+
+import pandas as pd
+
+import cache
+import campaigns
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+# Relativas a la campaña activa (campaigns.py)
+AGG_DIR = "agregados"
+DATA_GRAF_FILE = "data_graf.xlsx"
+
+DIARIO_MCP = "diario_mcp"        # date, mcp, count, cum_count
+TOTAL_DIARIO = "total_diario"    # date, total_count, cum_total
+_MANIFEST = "manifest.json"
+
+
+def agg_dir() -> str:
+    return campaigns.cache_path(AGG_DIR)
+
+
+def data_graf_path() -> str:
+    return campaigns.data_path(DATA_GRAF_FILE)
+
+
+def parse_dates(s: pd.Series) -> pd.Series:
+    """
+    Convierte la columna 'date' (formato Stata tipo '01dec2025').
+    Si el formato no calza, se intenta el parseo genérico.
+    """
+    try:
+        return pd.to_datetime(s, format="%d%b%Y")
+    except (ValueError, TypeError):
+        return pd.to_datetime(s, errors="coerce")
+
+
+def build_tables(data_graf: pd.DataFrame) -> dict:
+    """
+    A partir del crudo (date, mcp, dni_ciu) o de la tabla compacta de
+    facts.py calcula:
+    - diario_mcp: registros por fecha y MCP, con su acumulado por MCP.
+    - total_diario: registros por fecha (todas las MCP) y su acumulado.
+    Lanza KeyError si faltan las columnas necesarias.
+    """
+    import facts
+
+    # Solo las columnas necesarias, ya compactas (día entero, MCP categórica)
+    hechos = data_graf if "dia" in data_graf.columns else facts.to_compact(data_graf)
+    diario = (
+        hechos.groupby(["dia", "mcp"], observed=True)
+        .size()
+        .reset_index(name="count")
+    )
+    diario = pd.DataFrame({
+        "date": pd.to_datetime(facts.day_to_date(diario["dia"])),
+        "mcp": diario["mcp"].astype(str),
+        "count": diario["count"],
+    })
+    return finalize_tables(diario)
+
+
+def finalize_tables(diario: pd.DataFrame) -> dict:
+    """
+    Completa los acumulados a partir de la tabla diaria (date, mcp, count).
+    Se reutiliza cuando la tabla diaria se actualiza de forma incremental.
+    """
+    diario = diario.sort_values(["date", "mcp"], ignore_index=True)
+    diario["count"] = diario["count"].astype("int64")
+    diario["cum_count"] = diario.groupby("mcp")["count"].cumsum()
+
+    total = (
+        diario.groupby("date")["count"]
+        .sum()
+        .reset_index(name="total_count")
+    )
+    total["cum_total"] = total["total_count"].cumsum()
+    return {DIARIO_MCP: diario, TOTAL_DIARIO: total}
+
+
+def _table_path(name: str) -> str:
+    return os.path.join(agg_dir(), f"{name}.parquet")
+
+
+def _read_manifest() -> dict:
+    try:
+        with open(os.path.join(agg_dir(), _MANIFEST), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_tables(tables: dict, sources: dict):
+    """
+    Guarda las tablas en agg_dir() (parquet) y el manifiesto con las huellas
+    de los archivos de origen. Cada archivo se escribe de forma atómica.
+    """
+    os.makedirs(agg_dir(), exist_ok=True)
+    for name, df in tables.items():
+        dest = _table_path(name)
+        tmp = dest + f".tmp{os.getpid()}"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, dest)
+
+    manifest = {"sources": {p: list(fp) for p, fp in sources.items() if fp is not None}}
+    tmp = os.path.join(agg_dir(), _MANIFEST + f".tmp{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, os.path.join(agg_dir(), _MANIFEST))
+
+
+def is_fresh(path: str = None) -> bool:
+    """True si las tablas existen y se construyeron con la versión actual de `path`."""
+    path = path or data_graf_path()
+    fp = cache.fingerprint(path)
+    sources = _read_manifest().get("sources", {})
+    if fp is None or sources.get(path) != list(fp):
+        return False
+    return all(os.path.exists(_table_path(n)) for n in (DIARIO_MCP, TOTAL_DIARIO))
+
+
+def read_tables() -> dict:
+    """Lee las tablas pre-agregadas (sin validar frescura)."""
+    return {n: pd.read_parquet(_table_path(n)) for n in (DIARIO_MCP, TOTAL_DIARIO)}
+
+
+def rebuild(path: str = None) -> dict:
+    """Recalcula las tablas desde el crudo y las persiste."""
+    import schema
+
+    path = path or data_graf_path()
+    data_graf = schema.read_records(path)
+    tables = build_tables(data_graf)
+    write_tables(tables, {path: cache.fingerprint(path)})
+    return tables
+
+
+def load_tables(path: str = None) -> dict:
+    """
+    Punto de entrada del dashboard: devuelve las tablas pre-agregadas,
+    reconstruyéndolas solo si el crudo cambió desde la última vez.
+    Si existe el almacén de ingesta incremental (ingest.py), sus contadores
+    por fecha/MCP mandan sobre data_graf.
+    """
+    import ingest
+
+    path = path or data_graf_path()
+    counts = ingest.daily_counts()
+    if counts is not None:
+        return finalize_tables(counts)
+
+    if is_fresh(path):
+        try:
+            return read_tables()
+        except Exception:
+            pass
+    return rebuild(path)
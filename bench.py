@@ -0,0 +1,266 @@
+# bench.py
+# Pruebas de rendimiento de las rutas de carga y render del dashboard.
+#
+# Genera datos sintéticos (data_graf, data_monitoreo_* y libros crosstab/annot)
+# en una carpeta temporal, mide cada etapa y guarda los resultados en JSON:
+#
+#   python cli.py bench --rows 10000 100000 --mcps 10 100 --out bench.json
+#
+# Etapas medidas (tiempo en segundos y pico de memoria con tracemalloc):
+#   load_excel_cold     data_graf.xlsx con openpyxl + escritura de la caché
+#   load_excel_warm     data_graf desde la caché columnar
+#   load_mcp_details    todos los data_monitoreo_* en frío con el pool de
+#                       procesos (loaders.py); tracemalloc solo ve al padre,
+#                       así que se suma el pico de RSS de los hijos (psutil)
+#   tab1_aggregation    agregación por fecha/MCP (aggregates.build_tables)
+#   fig_progress        figura de líneas de la pestaña 1
+#   fig_heatmap         matriz (.npz, construida en frío) + figura del heatmap
+#
+# Un .xlsx admite como máximo 1_048_576 filas por hoja: por encima de ese
+# tamaño las etapas de Excel se miden con el máximo y las etapas en memoria
+# (agregación y figuras) con el tamaño pedido.
+import json
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # sin psutil no se mide la memoria de los procesos hijos
+    psutil = None
+
+EXCEL_MAX_ROWS = 1_048_575  # sin contar la fila de encabezados
+DEFAULT_ROWS = [10_000, 100_000]
+DEFAULT_MCPS = [10, 100]
+N_DAYS = 30
+EMPADRONADORES_POR_MCP = 12
+CHILD_SAMPLE_SECONDS = 0.02
+
+
+# ========================
+# DATOS SINTÉTICOS
+# ========================
+def synthetic_data_graf(rows: int, mcps: int, seed: int = 0) -> pd.DataFrame:
+    """Crudo con el mismo esquema que data/data_graf.xlsx."""
+    rng = np.random.default_rng(seed)
+    fechas = pd.date_range("2025-11-25", periods=N_DAYS, freq="D").strftime("%d%b%Y").str.lower()
+    mcp_idx = rng.integers(0, mcps, rows)
+    return pd.DataFrame({
+        "departamento": np.array(["PIURA", "LA LIBERTAD", "CAJAMARCA", "LAMBAYEQUE"])[mcp_idx % 4],
+        "mcp": np.array([f"MCP {i:04d}" for i in range(mcps)])[mcp_idx],
+        "dni_ciu": rng.integers(1_000_000, 99_999_999, rows),
+        "date": np.asarray(fechas)[rng.integers(0, N_DAYS, rows)],
+    })
+
+
+def synthetic_crosstab(mcp_i: int, seed: int = 0):
+    """Hojas crosstab/annot de una MCP (empadronador × fecha)."""
+    rng = np.random.default_rng(seed + mcp_i)
+    fechas = pd.date_range("2025-11-25", periods=N_DAYS, freq="D").strftime("%d%b%Y").str.lower()
+    nombres = [f"EMPADRONADOR {mcp_i:04d}-{j:02d}" for j in range(EMPADRONADORES_POR_MCP)]
+    z = rng.integers(0, 40, (len(nombres), N_DAYS))
+    crosstab = pd.DataFrame(z, columns=list(fechas))
+    crosstab.insert(0, "empadronador", nombres)
+    return crosstab, crosstab.copy()
+
+
+def write_dataset(base: str, rows: int, mcps: int) -> dict:
+    """
+    Escribe en `base` los Excel sintéticos. Devuelve el data_graf completo
+    (para las etapas en memoria) y la ruta de un libro de heatmap.
+    """
+    os.makedirs(base, exist_ok=True)
+    data_graf = synthetic_data_graf(rows, mcps)
+    data_graf.head(EXCEL_MAX_ROWS).to_excel(os.path.join(base, "data_graf.xlsx"), index=False)
+
+    for i in range(mcps):
+        nombres = [f"EMPADRONADOR {i:04d}-{j:02d}" for j in range(EMPADRONADORES_POR_MCP)]
+        pd.DataFrame({
+            "empadronador": nombres,
+            "total_registros": np.arange(len(nombres)) * 7 + 10,
+        }).to_excel(os.path.join(base, f"data_monitoreo_mcp_{i:04d}.xlsx"), index=False)
+
+    # Un solo libro de heatmap basta: elegir una MCP lee un solo archivo
+    crosstab, annot = synthetic_crosstab(0)
+    hm_path = os.path.join(base, "mcp_0000.xlsx")
+    with pd.ExcelWriter(hm_path) as writer:
+        crosstab.to_excel(writer, sheet_name="crosstab", index=False)
+        annot.to_excel(writer, sheet_name="annot", index=False)
+    return {"data_graf": data_graf, "heatmap_path": hm_path}
+
+
+# ========================
+# MEDICIÓN
+# ========================
+class ChildSampler(threading.Thread):
+    """Muestrea la suma de RSS de los procesos hijos y guarda el pico en bytes."""
+
+    def __init__(self, interval: float = CHILD_SAMPLE_SECONDS):
+        super().__init__(name="bench-children", daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def run(self):
+        yo = psutil.Process()
+        while not self._stop_event.is_set():
+            total = 0
+            for hijo in yo.children(recursive=True):
+                try:
+                    total += hijo.memory_info().rss
+                except psutil.Error:  # el hijo terminó entre listar y leer
+                    pass
+            self.peak = max(self.peak, total)
+            self._stop_event.wait(self.interval)
+
+
+def measure(fn, *args, setup=None, children=False, **kwargs):
+    """
+    Ejecuta fn dos veces: una para el tiempo y otra bajo tracemalloc para el
+    pico de memoria (tracemalloc distorsiona mucho los tiempos).
+    `setup` se llama antes de cada pasada (p. ej. para vaciar una caché).
+    Con children=True la pasada de memoria también muestrea el RSS de los
+    procesos hijos (`children_rss_mb`; None sin psutil).
+    Devuelve (resultado, {'seconds', 'peak_mb'[, 'children_rss_mb']}).
+    """
+    if setup:
+        setup()
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    seconds = time.perf_counter() - t0
+
+    if setup:
+        setup()
+    sampler = ChildSampler() if children and psutil is not None else None
+    if sampler:
+        sampler.start()
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        if sampler:
+            sampler.stop()
+    medida = {"seconds": round(seconds, 4), "peak_mb": round(peak / 2**20, 2)}
+    if children:
+        medida["children_rss_mb"] = round(sampler.peak / 2**20, 2) if sampler else None
+    return result, medida
+
+
+def run_case(rows: int, mcps: int, workdir: str) -> dict:
+    """Mide todas las etapas para un tamaño (filas, MCPs)."""
+    # Cada caso es una campaña propia: datos y caché aislados (ver campaigns.py)
+    import campaigns
+
+    base = os.path.join(workdir, f"r{rows}_m{mcps}")
+    cache_dir = os.path.join(base, ".cache")
+    campana = {
+        "id": f"bench_r{rows}_m{mcps}", "titulo": "bench", "region": None,
+        "data": os.path.join(base, "data"), "cache": cache_dir, "static": os.path.join(base, "static"),
+    }
+    with campaigns.activate(campana):
+        return _run_stages(rows, mcps, base, cache_dir)
+
+
+def _run_stages(rows: int, mcps: int, base: str, cache_dir: str) -> dict:
+    import aggregates
+    import cache
+    import charts
+    import heatmaps
+    import loaders
+
+    t0 = time.perf_counter()
+    data = write_dataset(os.path.join(base, "data"), rows, mcps)
+    stages = {}
+
+    def clear_cache():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    path = os.path.join(base, "data", "data_graf.xlsx")
+    _, stages["load_excel_cold"] = measure(cache.read_excel_cached, path, setup=clear_cache)
+    _, stages["load_excel_warm"] = measure(cache.read_excel_cached, path)
+    # Ambas pasadas en frío y con el mismo ejecutor: sin fijarlo, la primera
+    # parsea Excel en procesos y la segunda lee la caché en hilos
+    _, stages["load_mcp_details"] = measure(
+        loaders.load_all_monitoring_files, os.path.join(base, "data"),
+        processes=True, setup=clear_cache, children=True
+    )
+    tablas, stages["tab1_aggregation"] = measure(aggregates.build_tables, data["data_graf"])
+    # Peor caso: todas las MCPs seleccionadas en el gráfico
+    diario = tablas[aggregates.DIARIO_MCP]
+    _, stages["fig_progress"] = measure(
+        charts.build_progress_figure, diario, tablas[aggregates.TOTAL_DIARIO],
+        mcps_visibles=diario["mcp"].unique()
+    )
+
+    def heatmap():
+        return charts.build_heatmap_figure(heatmaps.load_matrix(data["heatmap_path"]), "MCP 0000")
+    _, stages["fig_heatmap"] = measure(heatmap)
+
+    return {
+        "rows": rows,
+        "excel_rows": min(rows, EXCEL_MAX_ROWS),
+        "mcps": mcps,
+        "setup_seconds": round(time.perf_counter() - t0, 2),
+        "stages": stages,
+    }
+
+
+def run(rows_list=None, mcps_list=None, out=None, keep=False) -> dict:
+    """Corre la matriz filas × MCPs y escribe el JSON en `out` (si se da)."""
+    rows_list = rows_list or DEFAULT_ROWS
+    mcps_list = mcps_list or DEFAULT_MCPS
+    workdir = tempfile.mkdtemp(prefix="bench_dashboard_")
+
+    # Calentamiento: la primera figura paga la carga de los validadores de Plotly
+    import aggregates
+    import charts
+    tablas = aggregates.build_tables(synthetic_data_graf(100, 2))
+    charts.build_progress_figure(tablas[aggregates.DIARIO_MCP], tablas[aggregates.TOTAL_DIARIO])
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "cases": [],
+    }
+    try:
+        for rows in rows_list:
+            for mcps in mcps_list:
+                results["cases"].append(run_case(rows, mcps, workdir))
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if out:
+        with open(out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return results
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.2) -> list:
+    """
+    Regresiones de tiempo entre dos resultados: etapas que empeoraron más
+    que `tolerance` (20% por defecto). Devuelve [(caso, etapa, antes, ahora)].
+    """
+    before = {(c["rows"], c["mcps"]): c["stages"] for c in baseline["cases"]}
+    regressions = []
+    for case in current["cases"]:
+        key = (case["rows"], case["mcps"])
+        for stage, m in case["stages"].items():
+            old = before.get(key, {}).get(stage)
+            if old and m["seconds"] > old["seconds"] * (1 + tolerance):
+                regressions.append((key, stage, old["seconds"], m["seconds"]))
+    return regressions
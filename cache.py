@@ -0,0 +1,251 @@
+# cache.py
+# Caché columnar en disco (Arrow/Feather) delante de pd.read_excel.
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+import campaigns
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow es opcional: sin él se lee siempre el Excel
+    pa = None
+    feather = None
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+COLUMNAR_DIR = "columnar"  # dentro de la caché de la campaña
+
+# Clave de metadatos donde guardamos el origen de cada entrada (para desalojo)
+_META_KEY = b"dashboard_source"
+
+
+def columnar_dir() -> str:
+    return campaigns.cache_path(COLUMNAR_DIR)
+
+
+def fingerprint(path: str):
+    """
+    Huella barata de un archivo: (mtime_ns, tamaño).
+    Devuelve None si el archivo no existe.
+    """
+    try:
+        st_ = os.stat(path)
+    except OSError:
+        return None
+    return st_.st_mtime_ns, st_.st_size
+
+
+def _source_key(path: str, sheet_name) -> str:
+    raw = f"{os.path.abspath(path)}|{sheet_name}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _version_key(fp) -> str:
+    raw = f"{fp[0]}|{fp[1]}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def cache_path(path: str, sheet_name=0, fp=None) -> str:
+    """
+    Ruta de la entrada de caché para (archivo, hoja, mtime, tamaño).
+    El nombre es '<clave_origen>-<clave_version>.arrow' para poder
+    desalojar versiones viejas del mismo origen sin leerlas.
+    """
+    if fp is None:
+        fp = fingerprint(path)
+    return os.path.join(columnar_dir(), f"{_source_key(path, sheet_name)}-{_version_key(fp)}.arrow")
+
+
+def _evict_versions(path: str, sheet_name, keep: str):
+    """Borra las entradas viejas del mismo (archivo, hoja) excepto `keep`."""
+    prefix = _source_key(path, sheet_name) + "-"
+    folder = columnar_dir()
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return
+    for name in names:
+        full = os.path.join(folder, name)
+        if name.startswith(prefix) and full != keep:
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+def _write_entry(df: pd.DataFrame, dest: str, path: str, sheet_name, fp) -> bool:
+    """
+    Escribe el DataFrame como Arrow IPC sin compresión (permite memory-map).
+    Devuelve False si el DataFrame no es representable en Arrow
+    (columnas con tipos mezclados, nombres de columna no texto, etc.).
+    """
+    if not all(isinstance(c, str) for c in df.columns):
+        return False
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowException, TypeError, ValueError):
+        return False
+
+    meta = dict(table.schema.metadata or {})
+    meta[_META_KEY] = json.dumps({
+        "path": os.path.abspath(path),
+        "sheet": sheet_name,
+        "mtime_ns": fp[0],
+        "size": fp[1],
+    }).encode("utf-8")
+    table = table.replace_schema_metadata(meta)
+
+    # Escritura atómica: archivo temporal + rename
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = dest + f".tmp{os.getpid()}"
+    try:
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, dest)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+    return True
+
+
+def read_excel_cached(path: str, sheet_name=0, columns=None) -> pd.DataFrame:
+    """
+    Lee una hoja de Excel pasando por la caché columnar.
+    - Si existe una entrada vigente (misma ruta, hoja, mtime y tamaño) se
+      lee con memory-map, sin tocar openpyxl.
+    - Si no, se parsea el Excel, se guarda la entrada y se desalojan las
+      versiones viejas del mismo archivo/hoja.
+    - `columns` limita la lectura a esas columnas (la entrada de caché
+      siempre guarda la hoja completa).
+    - Sin pyarrow se comporta igual que pd.read_excel.
+    Los errores de lectura del Excel se propagan al llamador.
+    """
+    if pa is None:
+        return pd.read_excel(path, sheet_name=sheet_name, usecols=columns)
+
+    fp = fingerprint(path)
+    if fp is None:
+        # Dejar que read_excel produzca el error habitual
+        return pd.read_excel(path, sheet_name=sheet_name, usecols=columns)
+
+    dest = cache_path(path, sheet_name, fp)
+    if os.path.exists(dest):
+        try:
+            return feather.read_table(dest, columns=columns, memory_map=True).to_pandas()
+        except (pa.ArrowException, OSError):
+            # Entrada corrupta: se regenera abajo
+            pass
+
+    df = pd.read_excel(path, sheet_name=sheet_name)
+    if isinstance(df, pd.DataFrame) and _write_entry(df, dest, path, sheet_name, fp):
+        _evict_versions(path, sheet_name, keep=dest)
+    return df if columns is None else df[list(columns)]
+
+
+def read_columns(path: str, sheet_name=0) -> list:
+    """
+    Nombres de columna de una hoja: del esquema de la entrada de caché si
+    existe (sin leer datos), si no solo la fila de encabezados del Excel.
+    """
+    if pa is not None and fingerprint(path) is not None:
+        dest = cache_path(path, sheet_name)
+        try:
+            with pa.memory_map(dest) as source:
+                return list(pa.ipc.open_file(source).schema.names)
+        except (pa.ArrowException, OSError):
+            pass
+    return list(pd.read_excel(path, sheet_name=sheet_name, nrows=0).columns)
+
+
+def evict_stale() -> int:
+    """
+    Recorre la caché y borra las entradas cuyo archivo de origen ya no
+    existe o cambió (mtime/tamaño). Devuelve cuántas entradas se borraron.
+    """
+    folder = columnar_dir()
+    if pa is None or not os.path.isdir(folder):
+        return 0
+
+    removed = 0
+    for name in os.listdir(folder):
+        full = os.path.join(folder, name)
+        if not name.endswith(".arrow"):
+            # Restos de escrituras interrumpidas
+            if ".arrow.tmp" in name:
+                os.remove(full)
+                removed += 1
+            continue
+        try:
+            with pa.memory_map(full) as source:
+                meta = pa.ipc.open_file(source).schema.metadata or {}
+            info = json.loads(meta[_META_KEY])
+        except (pa.ArrowException, OSError, KeyError, ValueError):
+            info = None
+
+        stale = info is None or fingerprint(info["path"]) != (info["mtime_ns"], info["size"])
+        if stale:
+            os.remove(full)
+            removed += 1
+    return removed
+
+
+def list_sheets(path: str):
+    """Nombres de las hojas de un Excel (lee solo el índice del libro)."""
+    with pd.ExcelFile(path) as xls:
+        return list(xls.sheet_names)
+
+
+def prebuild_file(path: str) -> list:
+    """
+    Convierte todas las hojas de un Excel a la caché columnar.
+    Devuelve [(hoja, estado)]; los errores quedan como estado.
+    """
+    try:
+        sheets = list_sheets(path)
+    except Exception as e:
+        return [(None, f"error: {e}")]
+
+    report = []
+    for i, sheet in enumerate(sheets):
+        # La app pide la primera hoja como 0 y las demás por nombre:
+        # cacheamos con ambas claves para la primera.
+        keys = [0, sheet] if i == 0 else [sheet]
+        for key in keys:
+            fp = fingerprint(path)
+            if os.path.exists(cache_path(path, key, fp)):
+                report.append((key, "vigente"))
+                continue
+            try:
+                read_excel_cached(path, sheet_name=key)
+            except Exception as e:
+                report.append((key, f"error: {e}"))
+                continue
+            estado = "convertido" if os.path.exists(cache_path(path, key, fp)) else "no cacheable"
+            report.append((key, estado))
+    return report
+
+
+def prebuild(base_path: str = None):
+    """
+    Convierte todas las hojas de todos los Excel de `base_path` a la caché
+    columnar y desaloja las entradas obsoletas.
+    Devuelve una lista de (archivo, hoja, estado) para reportar en la CLI.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow no está instalado: no se puede construir la caché columnar.")
+
+    base_path = base_path or campaigns.data_path()
+    report = []
+    for f in sorted(os.listdir(base_path)):
+        low = f.lower()
+        if not (low.endswith(".xlsx") or low.endswith(".xls")):
+            continue
+        report += [(f, sheet, estado) for sheet, estado in prebuild_file(os.path.join(base_path, f))]
+
+    removed = evict_stale()
+    return report, removed
@@ -0,0 +1,145 @@
+# campaigns.py
+# Particiones por campaña (2do empadronamiento, 3ro, otras regiones...).
+#
+# Cada campaña tiene su carpeta de datos, su carpeta de caché (columnar,
+# agregados, hechos, cubo, índices, SQLite...) y su carpeta del mapa estático:
+#
+#   campaña por defecto   data/             .cache/                  static/mapa/
+#   otras campañas        campanas/<id>/    .cache/campanas/<id>/    static/mapa/<id>/
+#
+# Una campaña extra es cualquier subcarpeta de campanas/; puede traer un
+# campana.json con {"titulo": ..., "region": ...}. Los módulos no guardan
+# rutas fijas: las resuelven al llamarse con data_path()/cache_path() sobre
+# la campaña activa, así dos campañas nunca comparten cachés ni índices.
+#
+# La campaña activa vive en un ContextVar: cada hilo (rerun de Streamlit,
+# watcher, CLI) fija la suya sin afectar a los demás.
+import contextlib
+import contextvars
+import json
+import os
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+CACHE_ROOT = os.environ.get("DASHBOARD_CACHE_DIR", ".cache")
+CAMPAIGNS_DIR = os.environ.get("DASHBOARD_CAMPAIGNS_DIR", "campanas")
+INFO_FILE = "campana.json"
+STATIC_MAP_ROOT = os.path.join("static", "mapa")
+
+DEFAULT = {
+    "id": "2do",
+    "titulo": "2do Empadronamiento",
+    "region": None,
+    "data": "data",
+    "cache": CACHE_ROOT,
+    "static": STATIC_MAP_ROOT,
+}
+
+# Agregados compartidos entre campañas (la vista de comparación solo lee esto)
+SHARED_DIR = os.path.join(CACHE_ROOT, "compartido")
+
+_current = contextvars.ContextVar("campana", default=None)
+
+
+def _read_info(folder: str) -> dict:
+    try:
+        with open(os.path.join(folder, INFO_FILE), encoding="utf-8") as fh:
+            info = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return info if isinstance(info, dict) else {}
+
+
+def discover(root: str = None) -> dict:
+    """
+    {id: campaña} de las campañas disponibles: la de data/ primero y luego
+    las subcarpetas de `root` en orden alfabético. Solo lista carpetas.
+    """
+    root = root or CAMPAIGNS_DIR
+    found = {DEFAULT["id"]: {**DEFAULT, **{k: v for k, v in _read_info(DEFAULT["data"]).items()
+                                           if k in ("titulo", "region")}}}
+    try:
+        names = sorted(os.listdir(root))
+    except OSError:
+        names = []
+    for name in names:
+        folder = os.path.join(root, name)
+        if name.startswith(".") or name == DEFAULT["id"] or not os.path.isdir(folder):
+            continue
+        info = _read_info(folder)
+        found[name] = {
+            "id": name,
+            "titulo": info.get("titulo") or name.replace("_", " ").strip(),
+            "region": info.get("region"),
+            "data": folder,
+            "cache": os.path.join(CACHE_ROOT, "campanas", name),
+            "static": os.path.join(STATIC_MAP_ROOT, name),
+        }
+    return found
+
+
+def default_id() -> str:
+    """Campaña de arranque: DASHBOARD_CAMPAIGN o la de data/."""
+    return os.environ.get("DASHBOARD_CAMPAIGN") or DEFAULT["id"]
+
+
+def get(campaign_id: str = None) -> dict:
+    """Campaña por id (None = la por defecto). KeyError si no existe."""
+    if campaign_id is None or campaign_id == DEFAULT["id"]:
+        return discover()[DEFAULT["id"]]
+    campaigns = discover()
+    if campaign_id not in campaigns:
+        raise KeyError(f"campaña desconocida: {campaign_id}")
+    return campaigns[campaign_id]
+
+
+def current() -> dict:
+    """Campaña activa en este contexto (por defecto, la de default_id())."""
+    campaign = _current.get()
+    if campaign is None:
+        campaign = get(default_id())
+        _current.set(campaign)
+    return campaign
+
+
+def current_id() -> str:
+    return current()["id"]
+
+
+def set_current(campaign) -> dict:
+    """
+    Fija la campaña activa (id o dict) del contexto actual: al inicio de un
+    rerun o como initializer de los hilos/procesos de un pool.
+    """
+    if not isinstance(campaign, dict):
+        campaign = get(campaign)
+    _current.set(campaign)
+    return campaign
+
+
+@contextlib.contextmanager
+def activate(campaign):
+    """Activa una campaña (id o dict) dentro del bloque y restaura la anterior al salir."""
+    if not isinstance(campaign, dict):
+        campaign = get(campaign)
+    token = _current.set(campaign)
+    try:
+        yield campaign
+    finally:
+        _current.reset(token)
+
+
+def data_path(*parts) -> str:
+    """Ruta dentro de la carpeta de datos de la campaña activa."""
+    return os.path.join(current()["data"], *parts)
+
+
+def cache_path(*parts) -> str:
+    """Ruta dentro de la carpeta de caché de la campaña activa."""
+    return os.path.join(current()["cache"], *parts)
+
+
+def static_map_dir() -> str:
+    """Carpeta del mapa estático extraído de la campaña activa."""
+    return current()["static"]
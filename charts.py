@@ -0,0 +1,268 @@
+# charts.py
+# Constructores de las figuras Plotly del dashboard (sin llamadas a Streamlit,
+# para poder medirlos fuera de la app).
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+# Máximo de puntos por serie que se envían al navegador en la línea de avance
+MAX_POINTS = 500
+
+
+def downsample_lttb(x: np.ndarray, y: np.ndarray, n_out: int):
+    """
+    Largest-Triangle-Three-Buckets: reduce una serie a `n_out` puntos
+    conservando su forma (picos y valles). x debe estar ordenado.
+    Si la serie ya es corta se devuelve tal cual.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    xf = x.astype("datetime64[ns]").astype("float64") if np.issubdtype(x.dtype, np.datetime64) else x.astype("float64")
+    yf = y.astype("float64")
+    # Bordes de los buckets intermedios (el primero y el último punto se conservan)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Promedio del bucket siguiente como tercer vértice
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = xf[nlo:nhi].mean(), yf[nlo:nhi].mean()
+        area = np.abs((xf[a] - cx) * (yf[lo:hi] - yf[a]) - (xf[a] - xf[lo:hi]) * (cy - yf[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def build_progress_figure(data_agregado: pd.DataFrame, data_total: pd.DataFrame,
+                          mcps_visibles=None, max_points: int = MAX_POINTS) -> go.Figure:
+    """
+    Línea de avance: TOTAL GENERAL + una traza por cada MCP de `mcps_visibles`.
+    - Las series se separan con una sola pasada de groupby.
+    - Solo se construyen (y envían al navegador) las MCPs pedidas.
+    - Trazas WebGL (Scattergl) y, si una serie tiene más de `max_points`
+      fechas, se reduce en el servidor con LTTB.
+    Espera data_agregado (date, mcp, count) y data_total (date, total_count).
+    """
+    fig = go.Figure()
+    x_total, y_total = downsample_lttb(
+        data_total['date'].to_numpy(), data_total['total_count'].to_numpy(), max_points
+    )
+    fig.add_trace(go.Scattergl(
+        x=x_total,
+        y=y_total,
+        mode='lines+markers',
+        name='TOTAL GENERAL',
+        line=dict(color='red', width=3),
+        marker=dict(size=8),
+        hovertemplate='<b>TOTAL GENERAL</b><br>Fecha: %{x}<br>Registros: %{y}<extra></extra>'
+    ))
+
+    visibles = set(mcps_visibles or [])
+    if visibles:
+        subset = data_agregado[data_agregado['mcp'].isin(visibles)]
+        for mcp, df_mcp_line in subset.groupby('mcp', sort=True):
+            x, y = downsample_lttb(df_mcp_line['date'].to_numpy(), df_mcp_line['count'].to_numpy(), max_points)
+            fig.add_trace(go.Scattergl(
+                x=x,
+                y=y,
+                mode='lines+markers',
+                name=mcp,
+                line=dict(width=1.5),
+                marker=dict(size=5),
+                hovertemplate=f'<b>{mcp}</b><br>Fecha: %{{x}}<br>Registros: %{{y}}<extra></extra>'
+            ))
+
+    fig.update_layout(
+        title='📈 Avance de Registros por MCP y Fecha',
+        xaxis_title='Fecha',
+        yaxis_title='Cantidad de Registros (DNI)',
+        hovermode='x unified',
+        legend=dict(
+            title='MCPs (clic para mostrar/ocultar)',
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=1.01
+        ),
+        height=600,
+        template='plotly_white'
+    )
+    return fig
+
+
+def build_empadronador_bar(conteo: pd.DataFrame, mcp: str) -> go.Figure:
+    """Barras horizontales de total_registros por empadronador."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=conteo["total_registros"],
+        y=conteo["empadronador"],
+        orientation="h",
+        marker=dict(color="#4A90E2"),
+        hovertemplate="<b>%{y}</b><br>Registros: %{x}<extra></extra>"
+    ))
+
+    fig.update_layout(
+        title=f"Total de registros por empadronador — {mcp}",
+        xaxis_title="Total de registros (DNIs)",
+        yaxis_title="Empadronador",
+        height=600,
+        template="plotly_white",
+        margin=dict(l=200)  # espacio para nombres largos de empadronadores
+    )
+    return fig
+
+
+def build_drilldown_bar(hijos: pd.DataFrame, nivel: str, titulo: str) -> go.Figure:
+    """Barras horizontales de registros por hijo de un nodo del cubo (etiqueta, registros)."""
+    hijos = hijos.sort_values("registros", ascending=True)
+    fig = go.Figure(go.Bar(
+        x=hijos["registros"],
+        y=hijos["etiqueta"],
+        orientation="h",
+        marker=dict(color="#4A90E2"),
+        hovertemplate=f"<b>%{{y}}</b><br>Registros: %{{x:,}}<extra></extra>"
+    ))
+    fig.update_layout(
+        title=titulo,
+        xaxis_title="Registros (DNIs)",
+        yaxis_title=nivel,
+        height=max(300, 28 * len(hijos) + 120),
+        template="plotly_white",
+        margin=dict(l=200)
+    )
+    return fig
+
+
+def build_pace_figure(serie: pd.DataFrame, mcp: str, meta=None, fecha_proyectada=None) -> go.Figure:
+    """
+    Acumulado de un MCP (línea), ritmo de la ventana móvil (barras, eje
+    derecho) y, si hay meta y fecha proyectada, la proyección hasta la meta.
+    `serie` viene de forecast.series (date, count, cum_count, ritmo).
+    """
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=serie["date"], y=serie["ritmo"], name="Ritmo (DNIs/día)", yaxis="y2",
+        marker=dict(color="#4A90E2"), opacity=0.35,
+        hovertemplate="Fecha: %{x|%d/%m/%Y}<br>Ritmo: %{y:.1f} DNIs/día<extra></extra>"
+    ))
+    fig.add_trace(go.Scatter(
+        x=serie["date"], y=serie["cum_count"], mode="lines+markers", name="Acumulado",
+        line=dict(color="#1f77b4", width=3),
+        hovertemplate="Fecha: %{x|%d/%m/%Y}<br>Acumulado: %{y:,}<extra></extra>"
+    ))
+    if meta is not None and pd.notna(meta):
+        if fecha_proyectada is not None and pd.notna(fecha_proyectada):
+            fig.add_trace(go.Scatter(
+                x=[serie["date"].iloc[-1], fecha_proyectada], y=[serie["cum_count"].iloc[-1], meta],
+                mode="lines", name="Proyección", line=dict(color="#ff7f0e", dash="dash"),
+                hovertemplate="Fecha: %{x|%d/%m/%Y}<br>Proyectado: %{y:,.0f}<extra></extra>"
+            ))
+        fig.add_hline(y=meta, line=dict(color="gray", dash="dot"),
+                      annotation_text=f"Meta: {meta:,.0f}", annotation_position="top left")
+
+    fig.update_layout(
+        title=f"Ritmo de avance y proyección — {mcp}",
+        xaxis_title="Fecha",
+        yaxis=dict(title="DNIs acumulados"),
+        yaxis2=dict(title="DNIs por día (media móvil)", overlaying="y", side="right", showgrid=False),
+        hovermode="x unified",
+        template="plotly_white",
+        height=500,
+        legend=dict(orientation="h", y=-0.2)
+    )
+    return fig
+
+
+def build_campaign_comparison(compartido: pd.DataFrame) -> go.Figure:
+    """
+    Acumulado de registros por día de campaña, una línea por campaña, para
+    comparar rondas que empezaron en fechas distintas. Espera los agregados
+    compartidos de compare.py (campana, titulo, dia, date, cum_count).
+    """
+    fig = go.Figure()
+    for _, serie in compartido.groupby("campana", sort=False):
+        titulo = serie["titulo"].iloc[0]
+        fig.add_trace(go.Scatter(
+            x=serie["dia"],
+            y=serie["cum_count"],
+            customdata=serie["date"],
+            mode="lines+markers",
+            name=titulo,
+            hovertemplate=f"<b>{titulo}</b><br>Día %{{x}} (%{{customdata|%d/%m/%Y}})"
+                          "<br>Acumulado: %{y:,}<extra></extra>"
+        ))
+    fig.update_layout(
+        title="🔀 Avance acumulado por día de campaña",
+        xaxis_title="Días desde el primer registro",
+        yaxis_title="DNIs acumulados",
+        hovermode="x unified",
+        template="plotly_white",
+        height=500,
+        legend=dict(orientation="h", y=-0.2)
+    )
+    return fig
+
+
+def build_heatmap_figure(hm: dict, mcp: str) -> go.Figure:
+    """Heatmap empadronador × fecha a partir de las matrices de heatmaps.py."""
+    # Formato de fecha bonito para etiquetas x
+    x_labels = pd.DatetimeIndex(hm["dates"]).strftime('%d/%m/%Y')
+    # Anotaciones como texto (celdas vacías sin 'nan')
+    annot_text = np.where(np.isnan(hm["annot"]), "", np.char.mod("%g", np.nan_to_num(hm["annot"])))
+
+    fig_hm = go.Figure(data=go.Heatmap(
+        z=hm["z"],
+        x=x_labels,
+        y=hm["y"],
+        text=annot_text,
+        texttemplate="%{text}",
+        colorscale="YlGnBu",
+        zmin=0,
+        zmax=30,
+        colorbar=dict(title="Avances diarios"),
+        hovertemplate=(
+            'Empadronador: %{y}<br>'
+            'Fecha: %{x}<br>'
+            'Avances: %{z}<extra></extra>'
+        )
+    ))
+
+    fig_hm.update_layout(
+        title=f"📅 Heatmap de avances diarios — {mcp}",
+        xaxis_title="Fecha",
+        yaxis_title="Empadronadores",
+        width=1000,
+        height=600,
+        margin=dict(l=160, r=20)
+    )
+
+    # Asegurar que Plotly muestre los nombres y margenes
+    fig_hm.update_yaxes(automargin=True)
+    return fig_hm
+
+
+def build_points_map(puntos: pd.DataFrame, bbox) -> go.Figure:
+    """Mapa de puntos de registro centrado en el recuadro (lat_min, lat_max, lon_min, lon_max)."""
+    fig_map = go.Figure(go.Scattermap(
+        lat=puntos["lat"],
+        lon=puntos["lon"],
+        mode="markers",
+        marker=dict(size=6, color="red"),
+        text=puntos["empadronador"] if "empadronador" in puntos.columns else None,
+        hovertemplate="%{text}<extra></extra>"
+    ))
+    fig_map.update_layout(
+        map=dict(
+            style="open-street-map",
+            center=dict(lat=(bbox[0] + bbox[1]) / 2, lon=(bbox[2] + bbox[3]) / 2),
+            zoom=12
+        ),
+        height=800,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig_map
@@ -0,0 +1,383 @@
+# cli.py
+# Tareas de mantenimiento del dashboard (ejecutar antes de desplegar).
+#
+#   python cli.py prebuild            -> convierte los Excel de la campaña a la caché columnar
+#   python cli.py prebuild --data X   -> idem sobre otra carpeta
+#   python cli.py aggregate           -> recalcula las tablas de avance de data_graf
+#   python cli.py ingest              -> agrega al almacén los snapshots monitoreo_*.xlsx nuevos
+#   python cli.py load-mcps           -> carga en paralelo los data_monitoreo_* y muestra tiempos
+#   python cli.py map                 -> extrae el HTML del mapa a static/ e indexa los puntos
+#   python cli.py heatmaps            -> precalcula las matrices de los heatmaps por MCP (.npz)
+#   python cli.py bench               -> mide carga/agregación/figuras con datos sintéticos
+#   python cli.py loadtest            -> sesiones concurrentes contra la app con datos sintéticos
+#   python cli.py db                  -> carga los Excel en la base SQLite del dashboard
+#   python cli.py dedup               -> DNIs únicos vs. registros brutos y duplicados por MCP
+#   python cli.py cube                -> cubo departamento → provincia → MCP → ... × día del drill-down
+#   python cli.py pace                -> ritmo diario y fecha proyectada de meta por MCP
+#   python cli.py export --out dist   -> instantánea estática de las tres pestañas (HTML + JSON)
+#   python cli.py campanas --comparar -> lista las campañas y publica sus agregados compartidos
+#
+# Todas las tareas corren sobre una campaña (ver campaigns.py): la de data/
+# por defecto, u otra con `python cli.py --campana <id> <tarea>`.
+import argparse
+import sys
+import time
+
+
+def cmd_prebuild(args):
+    import cache
+
+    t0 = time.perf_counter()
+    report, removed = cache.prebuild(args.data)
+    for f, sheet, estado in report:
+        print(f"{f:<55} {str(sheet):<20} {estado}")
+    print(f"\n{len(report)} hojas procesadas, {removed} entradas obsoletas borradas "
+          f"en {time.perf_counter() - t0:.1f}s")
+    return 1 if any(estado.startswith("error") for _, _, estado in report) else 0
+
+
+def cmd_aggregate(args):
+    import aggregates
+
+    t0 = time.perf_counter()
+    if aggregates.is_fresh(args.source) and not args.force:
+        print("Las tablas pre-agregadas ya están al día.")
+        return 0
+    tablas = aggregates.rebuild(args.source)
+    for name, df in tablas.items():
+        print(f"{name:<15} {len(df):>8} filas")
+    print(f"\nTablas escritas en {aggregates.agg_dir()} en {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+def cmd_ingest(args):
+    import compare
+    import cube
+    import db
+    import facts
+    import forecast
+    import ingest
+
+    t0 = time.perf_counter()
+    if args.file:
+        results = [(path, ingest.ingest_file(path)) for path in args.file]
+    else:
+        results = ingest.ingest_pending(args.data)
+    if not results:
+        print("No hay lotes nuevos para ingerir.")
+        return _verify_ingest() if args.verificar else 0
+    for path, added in results:
+        print(f"{path:<60} {added:>8} registros nuevos")
+    # El cubo del drill-down, el resumen compartido y el ritmo se precalculan con cada ingesta
+    cubo = cube.load()
+    compare.publish()
+    forecast.compute(facts.load(), save=True)
+    # La base SQLite, si se usa, quedaría vieja (ver db.available)
+    if db.exists():
+        db.build(args.data)
+    print(f"\nAlmacén actualizado en {ingest.store_dir()} y cubo en {cube.cube_path()} "
+          f"({sum(len(l) for l in cubo['labels'])} nodos) en {time.perf_counter() - t0:.1f}s")
+    return _verify_ingest() if args.verificar else 0
+
+
+def _verify_ingest():
+    import ingest
+
+    problemas = ingest.verify()
+    for problema in problemas:
+        print(f"! {problema}")
+    if not problemas:
+        contadores = ingest.read_counters()
+        print(f"Verificación: {int(contadores['mcp']['count'].sum())} registros, "
+              f"{int(contadores['empadronador']['count'].sum())} con empadronador")
+    return 1 if problemas else 0
+
+
+def cmd_load_mcps(args):
+    import loaders
+
+    processes = {"auto": None, "process": True, "thread": False}[args.pool]
+    t0 = time.perf_counter()
+    reports = loaders.load_all_monitoring_files(args.data, max_workers=args.workers, processes=processes)
+    total = time.perf_counter() - t0
+
+    # Los más lentos primero
+    for r in sorted(reports, key=lambda r: r["segundos"], reverse=True):
+        print(f"{r['archivo']:<50} {r['filas']:>8} filas {r['segundos']:>8.3f}s")
+        for aviso in r["avisos"]:
+            print(f"    ! {aviso}")
+    print(f"\n{len(reports)} archivos en {total:.2f}s (suma secuencial: "
+          f"{sum(r['segundos'] for r in reports):.2f}s)")
+    return 0
+
+
+def cmd_map(args):
+    import map_assets
+
+    t0 = time.perf_counter()
+    html_path = map_assets.extract_map(args.zip)
+    print(f"Mapa estático: {html_path}")
+
+    puntos = map_assets.build_points_from_store()
+    if puntos is not None:
+        print(f"Puntos por MCP: {len(puntos):,} en {map_assets.points_path()}")
+    else:
+        print("El almacén de registros no tiene coordenadas: ejecuta antes `python cli.py ingest`.")
+    print(f"\nListo en {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+def cmd_heatmaps(args):
+    import heatmaps
+
+    t0 = time.perf_counter()
+    report = heatmaps.build_all(args.data)
+    for f, estado in report:
+        print(f"{f:<45} {estado}")
+    print(f"\n{len(report)} matrices en {heatmaps.heatmap_dir()} en {time.perf_counter() - t0:.1f}s")
+    return 1 if any(estado.startswith("error") for _, estado in report) else 0
+
+
+def cmd_bench(args):
+    import json
+
+    import bench
+
+    results = bench.run(args.rows, args.mcps, out=args.out, keep=args.keep)
+    for case in results["cases"]:
+        print(f"\nfilas={case['rows']:,} (excel={case['excel_rows']:,}) mcps={case['mcps']}")
+        for stage, m in case["stages"].items():
+            hijos = m.get("children_rss_mb")
+            extra = f" (+{hijos:.2f} MB RSS hijos)" if hijos is not None else ""
+            print(f"  {stage:<20} {m['seconds']:>9.4f}s {m['peak_mb']:>9.2f} MB{extra}")
+    if args.out:
+        print(f"\nResultados en {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = bench.compare(json.load(fh), results, args.tolerance)
+        for (rows, mcps), stage, before, now in regressions:
+            print(f"REGRESIÓN filas={rows} mcps={mcps} {stage}: {before:.4f}s -> {now:.4f}s")
+        return 1 if regressions else 0
+    return 0
+
+
+def cmd_loadtest(args):
+    import loadtest
+
+    def mostrar(caso):
+        r, w = caso["rerun"], caso["worker"]
+        print(f"{caso['rows']:>9} filas {caso['mcps']:>5} MCPs {caso['users']:>4} usuarios  "
+              f"rerun p50 {r.get('p50', 0):.3f}s p95 {r.get('p95', 0):.3f}s p99 {r.get('p99', 0):.3f}s  "
+              f"CPU {w['cpu_pct_mean']}% (pico {w['cpu_pct_peak']}%)  RSS pico {w['rss_mb_peak']} MB")
+        mapa = caso["actions"]["mapa"]
+        if mapa["n"]:
+            print(f"{'':>37}mapa p50 {mapa['p50']:.3f}s p95 {mapa['p95']:.3f}s p99 {mapa['p99']:.3f}s")
+        for error in caso["errors"]:
+            print(f"{'':>37}! {error}")
+
+    results = loadtest.run(args.users, args.rows, args.mcps, steps=args.steps, think=args.think,
+                           map_mb=args.map_mb, out=args.out, keep=args.keep, progress=mostrar)
+    if args.out:
+        print(f"\nResultados en {args.out}")
+    return 1 if any(caso["errors"] for caso in results["cases"]) else 0
+
+
+def cmd_db(args):
+    import db
+
+    t0 = time.perf_counter()
+    counts = db.build(args.data)
+    for table, n in counts.items():
+        print(f"{table:<22} {n:>10} filas")
+    print(f"\nBase escrita en {db.db_path()} en {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+def cmd_dedup(args):
+    import dedup
+
+    t0 = time.perf_counter()
+    calidad = dedup.load_quality()
+    con_duplicados = calidad[calidad["registros"] > calidad["unicos"]]
+    for _, row in con_duplicados.sort_values("registros", ascending=False).iterrows():
+        print(f"{row['mcp']:<40} {row['registros']:>8} registros {row['unicos']:>8} únicos "
+              f"{row['duplicados_mcp']:>5} dup. misma MCP {row['duplicados_otra_mcp']:>5} dup. otra MCP")
+    totales = dedup.totals(calidad)
+    print(f"\n{totales['registros']:,} registros, {totales['unicos']:,} DNIs únicos, "
+          f"{totales['duplicados']:,} duplicados en {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+def cmd_cube(args):
+    import cube
+
+    t0 = time.perf_counter()
+    cubo = cube.load()
+    print(f"{'total':<15} {1:>8} nodos")
+    for k, nivel in enumerate(cubo["levels"], 1):
+        print(f"{nivel:<15} {len(cubo['labels'][k]):>8} nodos")
+    print(f"\n{cube.total(cubo, cube.node(cubo)):,} registros × {len(cube.dates(cubo))} días "
+          f"en {cube.cube_path()} en {time.perf_counter() - t0:.1f}s")
+    if args.verificar:
+        import facts
+
+        faltan = cube.missing_levels(cubo, facts.load())
+        for nivel in faltan:
+            print(f"! los hechos traen {nivel} pero el cubo no llega a ese nivel")
+        return 1 if faltan else 0
+    return 0
+
+
+def cmd_pace(args):
+    import pandas as pd
+
+    import cache
+    import db
+    import facts
+    import forecast
+
+    t0 = time.perf_counter()
+    window = args.window or forecast.WINDOW
+    tabla_mcp = db.mcp_table() if db.available() else cache.read_excel_cached(db.mcp_info_path())
+    ritmo = forecast.load(facts.load(), tabla_mcp, window=window, save=True)
+    for _, row in ritmo["mcp"].sort_values("fecha_proyectada").iterrows():
+        fecha = row["fecha_proyectada"].date() if pd.notna(row["fecha_proyectada"]) else "-"
+        print(f"{row['mcp']:<40} {row['registros']:>8} registros {row['ritmo_diario']:>8.1f} DNIs/día  meta {fecha}")
+    print(f"\nVentana de {window} días, actualizado desde la columna "
+          f"{ritmo['estados']['mcp']['desde']} en {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+def cmd_export(args):
+    import export
+
+    resumen = export.export(args.out, args.data)
+    for aviso in resumen["avisos"]:
+        print(f"! {aviso}")
+    print(f"Paquete estático en {args.out}/ ({resumen['mcps']} MCPs) en {resumen['segundos']:.1f}s")
+    return 0
+
+
+def cmd_campanas(args):
+    import campaigns
+
+    for cid, c in campaigns.discover().items():
+        region = f" ({c['region']})" if c["region"] else ""
+        print(f"{cid:<20} {c['titulo'] + region:<40} datos {c['data']:<25} caché {c['cache']}")
+    if not args.comparar:
+        return 0
+
+    import compare
+    import views
+
+    t0 = time.perf_counter()
+    compartido = compare.load()
+    if compartido.empty:
+        print("\nNinguna campaña tiene datos de avance para comparar.")
+        return 1
+    print()
+    print(views.campaign_table(compartido).to_string(index=False))
+    print(f"\nAgregados compartidos en {compare.SHARED_PATH} en {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Tareas de datos del dashboard de empadronamiento.")
+    parser.add_argument("--campana", default=None,
+                        help="Campaña sobre la que corre la tarea (por defecto: DASHBOARD_CAMPAIGN o la de data/)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("prebuild", help="Construir la caché columnar de todos los Excel de la campaña.")
+    p.add_argument("--data", default=None, help="Carpeta con los Excel (por defecto: la de la campaña)")
+    p.set_defaults(func=cmd_prebuild)
+
+    p = sub.add_parser("aggregate", help="Pre-agregar data_graf en tablas diarias por MCP.")
+    p.add_argument("--source", default=None, help="Excel crudo de avance (por defecto: data_graf.xlsx de la campaña)")
+    p.add_argument("--force", action="store_true", help="Recalcular aunque estén al día")
+    p.set_defaults(func=cmd_aggregate)
+
+    p = sub.add_parser("ingest", help="Ingerir de forma incremental snapshots/deltas de registros.")
+    p.add_argument("--data", default=None, help="Carpeta donde buscar monitoreo_*.xlsx (por defecto: la de la campaña)")
+    p.add_argument("--file", nargs="+", help="Ingerir estos archivos en vez de buscar en --data")
+    p.add_argument("--verificar", action="store_true",
+                   help="Revisar el almacén contra los lotes ingeridos (sale con 1 si no cuadra)")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("load-mcps", help="Cargar los data_monitoreo_* en paralelo y reportar tiempos por archivo.")
+    p.add_argument("--data", default=None, help="Carpeta con los Excel (por defecto: la de la campaña)")
+    p.add_argument("--workers", type=int, default=None, help="Tamaño del pool")
+    p.add_argument("--pool", choices=["auto", "process", "thread"], default="auto",
+                   help="Tipo de pool (auto: procesos si hay que parsear Excel)")
+    p.set_defaults(func=cmd_load_mcps)
+
+    p = sub.add_parser("map", help="Preparar el mapa estático y el índice de puntos.")
+    p.add_argument("--zip", default=None, help="ZIP con el HTML del mapa (por defecto: el de la campaña)")
+    p.set_defaults(func=cmd_map)
+
+    p = sub.add_parser("heatmaps", help="Precalcular las matrices empadronador × fecha de cada MCP.")
+    p.add_argument("--data", default=None, help="Carpeta con los Excel (por defecto: la de la campaña)")
+    p.set_defaults(func=cmd_heatmaps)
+
+    p = sub.add_parser("bench", help="Medir las rutas de carga y render con datos sintéticos.")
+    p.add_argument("--rows", type=int, nargs="+", help="Filas de data_graf (por defecto: 10000 100000)")
+    p.add_argument("--mcps", type=int, nargs="+", help="Cantidad de MCPs (por defecto: 10 100)")
+    p.add_argument("--out", help="Archivo JSON de resultados")
+    p.add_argument("--baseline", help="JSON anterior para detectar regresiones")
+    p.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento tolerado (0.2 = 20%%)")
+    p.add_argument("--keep", action="store_true", help="No borrar la carpeta temporal con los datos")
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("loadtest", help="Simular usuarios concurrentes contra la app (offline, datos sintéticos).")
+    p.add_argument("--users", type=int, nargs="+", help="Sesiones concurrentes (por defecto: 1 10 50)")
+    p.add_argument("--rows", type=int, nargs="+", help="Filas de data_graf (por defecto: 10000)")
+    p.add_argument("--mcps", type=int, nargs="+", help="Cantidad de MCPs (por defecto: 10)")
+    p.add_argument("--steps", type=int, default=6, help="Acciones por sesión después de abrir la app")
+    p.add_argument("--think", type=float, default=1.0, help="Pausa máxima entre acciones en segundos")
+    p.add_argument("--map-mb", type=float, default=5, help="Tamaño del HTML sintético del mapa en MB")
+    p.add_argument("--out", help="Archivo JSON de resultados")
+    p.add_argument("--keep", action="store_true", help="No borrar la carpeta temporal con la app y los datos")
+    p.set_defaults(func=cmd_loadtest)
+
+    p = sub.add_parser("db", help="Construir la base SQLite indexada que usa el dashboard.")
+    p.add_argument("--data", default=None, help="Carpeta con los Excel (por defecto: la de la campaña)")
+    p.set_defaults(func=cmd_db)
+
+    p = sub.add_parser("export", help="Exportar el dashboard a un paquete estático (HTML + figuras JSON).")
+    p.add_argument("--out", default="dist", help="Carpeta de salida (por defecto: dist)")
+    p.add_argument("--data", default=None, help="Carpeta con los Excel (por defecto: la de la campaña)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("cube", help="Precalcular el cubo de agregados del drill-down por nivel y día.")
+    p.add_argument("--verificar", action="store_true",
+                   help="Salir con 1 si una dimensión de los hechos no llega al cubo")
+    p.set_defaults(func=cmd_cube)
+
+    p = sub.add_parser("pace", help="Ritmo de avance y fecha proyectada de cumplimiento por MCP.")
+    p.add_argument("--window", type=int, default=None, help="Días de la ventana móvil (por defecto: DASHBOARD_PACE_WINDOW o 7)")
+    p.set_defaults(func=cmd_pace)
+
+    p = sub.add_parser("dedup", help="Contar DNIs únicos, registros brutos y duplicados por MCP.")
+    p.set_defaults(func=cmd_dedup)
+
+    p = sub.add_parser("campanas", help="Listar las campañas (particiones de datos y caché).")
+    p.add_argument("--comparar", action="store_true",
+                   help="Publicar y mostrar los agregados compartidos para compararlas")
+    p.set_defaults(func=cmd_campanas)
+
+    return parser
+
+
+def main(argv=None):
+    import campaigns
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.campana is not None and args.campana not in campaigns.discover():
+        parser.error(f"campaña desconocida: {args.campana} (ver `python cli.py campanas`)")
+    with campaigns.activate(args.campana or campaigns.default_id()):
+        return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
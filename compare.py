@@ -0,0 +1,129 @@
+# compare.py
+# Agregados compartidos para comparar campañas (ver campaigns.py).
+#
+# Cada campaña publica un resumen pequeño de su avance en
+# .cache/compartido/campanas.parquet, una fila por día con registros:
+#
+#   campana, titulo, region   identificación de la campaña
+#   dia                       días desde su primer día con registros
+#   date, count, cum_count    registros del día y acumulado
+#   meta                      población objetivo total (tabla por MCP) o NaN
+#   mcps                      MCPs con registros
+#   fuentes                   huellas de origen (JSON) con que se armó
+#
+# La vista de comparación solo lee este archivo: no abre la tabla de hechos,
+# el cubo ni las cachés de las campañas, así comparar no suma su memoria.
+# Una campaña se (re)publica al reconstruir sus derivados (refresh.py,
+# cli.py ingest) o, si falta o quedó vieja, la primera vez que se compara.
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import cache
+import campaigns
+import db
+import facts
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+SHARED_PATH = os.path.join(campaigns.SHARED_DIR, "campanas.parquet")
+COLUMNS = ["campana", "titulo", "region", "dia", "date", "count", "cum_count", "meta", "mcps", "fuentes"]
+
+# Varias campañas pueden publicar a la vez desde sus vigilantes
+_lock = threading.Lock()
+
+
+def _sources() -> str:
+    """Huellas (JSON) de lo que define el resumen: origen de los hechos y tabla por MCP."""
+    info = db.mcp_info_path()
+    fp = cache.fingerprint(info)
+    return json.dumps({**facts.sources(), info: list(fp) if fp is not None else None}, sort_keys=True)
+
+
+def _meta() -> float:
+    """Suma de POBLACION_AJUSTADA_FINAL de la tabla por MCP de la campaña activa."""
+    path = db.mcp_info_path()
+    if not os.path.exists(path):
+        return np.nan
+    tabla = cache.read_excel_cached(path)
+    if "POBLACION_AJUSTADA_FINAL" not in tabla.columns:
+        return np.nan
+    return float(pd.to_numeric(tabla["POBLACION_AJUSTADA_FINAL"], errors="coerce").sum())
+
+
+def summarize(campaign=None) -> pd.DataFrame:
+    """Filas compartidas de una campaña (la activa si None) desde sus tablas pre-agregadas."""
+    with campaigns.activate(campaign or campaigns.current()) as c:
+        fuentes = _sources()
+        tablas = aggregates.load_tables()
+        meta = _meta()
+    total = tablas[aggregates.TOTAL_DIARIO].sort_values("date", ignore_index=True)
+    fechas = pd.to_datetime(total["date"])
+    return pd.DataFrame({
+        "campana": c["id"],
+        "titulo": c["titulo"],
+        "region": c["region"],
+        "dia": (fechas - fechas.min()).dt.days.astype("int32"),
+        "date": fechas,
+        "count": total["total_count"].astype("int64"),
+        "cum_count": total["total_count"].cumsum().astype("int64"),
+        "meta": meta,
+        "mcps": int(tablas[aggregates.DIARIO_MCP]["mcp"].nunique()),
+        "fuentes": fuentes,
+    }, columns=COLUMNS)
+
+
+def _read(path: str) -> pd.DataFrame:
+    try:
+        return pd.read_parquet(path)
+    except (OSError, ValueError):
+        return pd.DataFrame(columns=COLUMNS)
+
+
+def publish(campaign=None, path: str = None) -> int:
+    """Reemplaza en `path` las filas de una campaña (la activa si None). Devuelve cuántas escribió."""
+    path = path or SHARED_PATH
+    with campaigns.activate(campaign or campaigns.current()) as c:
+        filas = summarize(c)
+    with _lock:
+        previas = _read(path)
+        previas = previas[previas["campana"] != c["id"]]
+        tabla = pd.concat([previas, filas], ignore_index=True) if len(previas) else filas
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + f".tmp{os.getpid()}-{threading.get_ident()}"
+        tabla.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    return len(filas)
+
+
+def load(campaign_ids=None, path: str = None) -> pd.DataFrame:
+    """
+    Resumen compartido de las campañas pedidas (todas las descubiertas si
+    None). Publica antes las que faltan o cuyo origen cambió; si una no se
+    puede resumir (p. ej. sin data_graf.xlsx) queda fuera.
+    """
+    path = path or SHARED_PATH
+    disponibles = campaigns.discover()
+    campaign_ids = list(disponibles) if campaign_ids is None else list(campaign_ids)
+    tabla = _read(path)
+    publicadas = tabla.groupby("campana")["fuentes"].first().to_dict() if len(tabla) else {}
+    cambios = False
+    for cid in campaign_ids:
+        if cid not in disponibles:
+            continue
+        with campaigns.activate(disponibles[cid]):
+            vigente = publicadas.get(cid) == _sources()
+        if not vigente:
+            try:
+                publish(disponibles[cid], path)
+                cambios = True
+            except Exception:
+                continue
+    if cambios:
+        tabla = _read(path)
+    return tabla[tabla["campana"].isin(campaign_ids)].reset_index(drop=True)
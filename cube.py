@@ -0,0 +1,285 @@
+# cube.py
+# Cubo de agregados precalculado para el drill-down:
+#
+#   departamento → provincia → MCP → centro poblado → empadronador × día
+#
+# Se construye una sola vez desde la tabla de hechos (facts.py); la provincia
+# (y el departamento si los registros no lo traen) sale de
+# tabla_desagregada_mcp_merged por la clave sin tildes de la MCP. Los niveles
+# cuya dimensión no viene en los datos se omiten.
+#
+# Por nivel k (0 = total general) se guarda en .cache/cubo.npz:
+#
+#   labels_k     etiqueta del nodo dentro de su padre (unicode)
+#   parent_k     índice del padre en el nivel k-1
+#   child_ptr_k  hijos del nodo i = nodos [child_ptr_k[i], child_ptr_k[i+1]) del nivel k+1
+#   counts_k     int32 (nodos × días) registros por día
+#
+# Los nodos de cada nivel van en orden lexicográfico de su ruta, así los
+# descendientes de un nodo en cualquier nivel son un rango contiguo. Cada
+# clic del drill-down es una búsqueda en un dict y un corte de arreglo: no se
+# vuelve a agrupar el crudo.
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import cache
+import campaigns
+import facts
+import forecast
+import schema
+from db import mcp_info_path
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+CUBE_PATH = "cubo.npz"  # dentro de la caché de la campaña
+HIERARCHY = {
+    "departamento": "Departamento",
+    "provincia": "Provincia",
+    "mcp": "MCP",
+    "ccpp": "Centro poblado",
+    "empadronador": "Empadronador",
+}
+TOTAL = "TOTAL GENERAL"
+SIN_DATO = "(sin dato)"
+_SEP = "\x1f"  # separa las etiquetas en la ruta de un nodo
+
+
+def cube_path() -> str:
+    return campaigns.cache_path(CUBE_PATH)
+
+
+def _sources() -> dict:
+    """Huellas de lo que define el cubo: origen de los hechos y la tabla por MCP."""
+    info = mcp_info_path()
+    fp = cache.fingerprint(info)
+    return {**facts.sources(), info: list(fp) if fp is not None else None}
+
+
+def _dimensions(hechos: pd.DataFrame, tabla_mcp: pd.DataFrame = None) -> dict:
+    """{nivel: etiquetas por fila} de los niveles disponibles, en orden jerárquico."""
+    dims = {}
+    por_mcp = {}
+    if tabla_mcp is not None and "MCP" in tabla_mcp.columns:
+        claves = tabla_mcp["MCP"].map(schema.mcp_key)
+        for col, nivel in (("departamento", "departamento"), ("PROV", "provincia")):
+            if col in tabla_mcp.columns:
+                por_mcp[nivel] = pd.Series(tabla_mcp[col].to_numpy(), index=claves).groupby(level=0).first()
+
+    # map sobre la categórica transforma solo las categorías
+    mcp_key = hechos["mcp"].map(schema.mcp_key)
+    for nivel in HIERARCHY:
+        if nivel in hechos.columns and hechos[nivel].notna().any():
+            valores = hechos[nivel]
+        elif nivel in por_mcp:
+            valores = mcp_key.map(por_mcp[nivel])
+        else:
+            continue
+        dims[nivel] = valores.astype(object).where(valores.notna(), SIN_DATO).astype(str).str.strip().to_numpy(dtype=str)
+    return dims
+
+
+def build(hechos: pd.DataFrame, tabla_mcp: pd.DataFrame = None, path: str = None) -> dict:
+    """Arma el cubo desde la tabla de hechos y lo guarda en `path`."""
+    path = path or cube_path()
+    sources = _sources()
+    dims = _dimensions(hechos, tabla_mcp)
+    levels = list(dims)
+    first_day = int(hechos["dia"].min()) if len(hechos) else 0
+    n_days = int(hechos["dia"].max()) - first_day + 1 if len(hechos) else 0
+    days = hechos["dia"].to_numpy().astype("int64") - first_day
+
+    # Códigos ordenados por etiqueta: el orden de los códigos es el de las rutas
+    codes, labels = [], []
+    for nivel in levels:
+        c, u = pd.factorize(dims[nivel], sort=True)
+        codes.append(c)
+        labels.append(np.asarray(u, dtype=str))
+    paths = np.stack(codes, axis=1) if codes else np.zeros((len(hechos), 0), dtype="int64")
+
+    # Hojas: combinaciones distintas del nivel más fino, en orden lexicográfico
+    leaves, leaf_of_row = np.unique(paths, axis=0, return_inverse=True)
+    leaf_counts = forecast.daily_matrix(leaf_of_row.ravel(), days, len(leaves), n_days)
+
+    arrays = {"levels": np.asarray(levels, dtype=str), "first_day": np.asarray(first_day),
+              "fuentes": np.asarray(json.dumps(sources))}
+    # Nivel 0 (total) y un nivel por dimensión: nodos = prefijos distintos de las hojas
+    node_of_leaf = [np.zeros(len(leaves), dtype="int64")]
+    starts = [np.zeros(min(len(leaves), 1), dtype="int64")]
+    for k in range(1, len(levels) + 1):
+        cambia = np.ones(len(leaves), dtype=bool)
+        if len(leaves):
+            cambia[1:] = (leaves[1:, :k] != leaves[:-1, :k]).any(axis=1)
+        node_of_leaf.append(np.cumsum(cambia) - 1)
+        starts.append(np.flatnonzero(cambia))
+
+    for k in range(len(levels) + 1):
+        s = starts[k]
+        arrays[f"counts_{k}"] = (np.add.reduceat(leaf_counts, s, axis=0) if len(s)
+                                 else np.zeros((0, n_days), dtype="int64")).astype("int32")
+        if k == 0:
+            arrays[f"labels_{k}"] = np.asarray([TOTAL], dtype=str)[:len(s)]
+            arrays[f"parent_{k}"] = np.full(len(s), -1, dtype="int32")
+        else:
+            arrays[f"labels_{k}"] = labels[k - 1][leaves[s, k - 1]]
+            arrays[f"parent_{k}"] = node_of_leaf[k - 1][s].astype("int32")
+        if k < len(levels):
+            # Primer hijo de cada nodo y fin del último
+            arrays[f"child_ptr_{k}"] = np.append(node_of_leaf[k + 1][s], len(starts[k + 1])).astype("int32")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + f".tmp{os.getpid()}"
+    with open(tmp, "wb") as fh:
+        np.savez(fh, **arrays)
+    os.replace(tmp, path)
+    return _index(arrays)
+
+
+def _index(arrays: dict) -> dict:
+    """Cubo en memoria: arreglos por nivel, totales y dict ruta -> (nivel, índice)."""
+    levels = [str(x) for x in arrays["levels"]]
+    n = len(levels) + 1
+    cubo = {
+        "levels": levels,
+        "first_day": int(arrays["first_day"]),
+        "labels": [arrays[f"labels_{k}"].astype(str) for k in range(n)],
+        "parent": [arrays[f"parent_{k}"] for k in range(n)],
+        "child_ptr": [arrays[f"child_ptr_{k}"] for k in range(n - 1)],
+        "counts": [arrays[f"counts_{k}"] for k in range(n)],
+    }
+    cubo["totals"] = [c.sum(axis=1, dtype="int64") for c in cubo["counts"]]
+
+    # Rutas completas (etiquetas unidas por _SEP) para ubicar un nodo en O(1)
+    rutas = [np.asarray([""] * len(cubo["labels"][0]), dtype=str)]
+    for k in range(1, n):
+        padre = rutas[k - 1][cubo["parent"][k]] if len(cubo["parent"][k]) else np.asarray([], dtype=str)
+        prefijo = np.char.add(padre, _SEP) if k > 1 else padre
+        rutas.append(np.char.add(prefijo, cubo["labels"][k]))
+    cubo["index"] = {ruta: (k, i) for k in range(n) for i, ruta in enumerate(rutas[k].tolist())}
+    # MCPs por clave sin tildes: la pestaña 2 elige la MCP por nombre de archivo
+    k_mcp = levels.index("mcp") + 1 if "mcp" in levels else None
+    cubo["mcp_nodes"] = {} if k_mcp is None else {
+        schema.mcp_key(label): (k_mcp, i) for i, label in enumerate(cubo["labels"][k_mcp].tolist())
+    }
+    return cubo
+
+
+def load(path: str = None) -> dict:
+    """
+    Cubo vigente: desde `path` si se armó con los orígenes actuales, si no
+    se reconstruye desde facts.load() y tabla_desagregada_mcp_merged.
+    """
+    path = path or cube_path()
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+        if json.loads(str(arrays["fuentes"])) == _sources():
+            return _index(arrays)
+    except (OSError, KeyError, ValueError):
+        pass
+    info = mcp_info_path()
+    tabla_mcp = cache.read_excel_cached(info) if os.path.exists(info) else None
+    return build(facts.load(), tabla_mcp, path)
+
+
+# ========================
+# CONSULTAS (drill-down)
+# ========================
+def node(cubo: dict, ruta=()) -> tuple:
+    """
+    (nivel, índice) del nodo con esa ruta de etiquetas, p. ej.
+    ('PIURA', 'PIURA', 'MALINGAS'). () es el total. KeyError si no existe.
+    """
+    return cubo["index"][_SEP.join(ruta)]
+
+
+def level_name(cubo: dict, k: int) -> str:
+    """Nombre de la dimensión del nivel k (k >= 1)."""
+    return cubo["levels"][k - 1]
+
+
+def children(cubo: dict, nodo: tuple) -> pd.DataFrame:
+    """Hijos de un nodo con su total de registros (vacío en el último nivel)."""
+    k, i = nodo
+    if k >= len(cubo["levels"]):
+        return pd.DataFrame(columns=["etiqueta", "registros"])
+    lo, hi = cubo["child_ptr"][k][i], cubo["child_ptr"][k][i + 1]
+    return pd.DataFrame({
+        "etiqueta": cubo["labels"][k + 1][lo:hi],
+        "registros": cubo["totals"][k + 1][lo:hi],
+    })
+
+
+def missing_levels(cubo: dict, hechos: pd.DataFrame) -> list:
+    """
+    Niveles cuya dimensión trae valores en la tabla de hechos pero que el
+    cubo no tiene, o tiene solo como SIN_DATO (p. ej. empadronador si las
+    dimensiones de los snapshots no llegaron a los hechos).
+    """
+    faltan = []
+    for nivel in HIERARCHY:
+        if nivel not in hechos.columns or not hechos[nivel].notna().any():
+            continue
+        k = cubo["levels"].index(nivel) + 1 if nivel in cubo["levels"] else None
+        if k is None or (cubo["labels"][k] == SIN_DATO).all():
+            faltan.append(nivel)
+    return faltan
+
+
+def mcp_node(cubo: dict, mcp: str):
+    """Nodo de una MCP por su clave sin tildes, o None si no está en el cubo."""
+    return cubo["mcp_nodes"].get(schema.mcp_key(mcp))
+
+
+def descendants(cubo: dict, nodo: tuple, level: str) -> tuple:
+    """
+    (nivel, rango) de los descendientes de `nodo` en la dimensión `level`.
+    Si el nodo está más abajo que `level`, el rango es su ancestro en ese nivel.
+    """
+    k, i = nodo
+    destino = cubo["levels"].index(level) + 1
+    while k > destino:
+        k, i = k - 1, int(cubo["parent"][k][i])
+    lo, hi = i, i + 1
+    for nivel in range(k, destino):
+        lo, hi = cubo["child_ptr"][nivel][lo], cubo["child_ptr"][nivel][hi]
+    return destino, range(lo, hi)
+
+
+def labels(cubo: dict, nodo: tuple, level: str) -> np.ndarray:
+    """Etiquetas de los descendientes (o del ancestro) de `nodo` en `level`."""
+    k, rango = descendants(cubo, nodo, level)
+    return cubo["labels"][k][rango.start:rango.stop]
+
+
+def total(cubo: dict, nodo: tuple) -> int:
+    k, i = nodo
+    return int(cubo["totals"][k][i])
+
+
+def dates(cubo: dict) -> pd.DatetimeIndex:
+    n_days = cubo["counts"][0].shape[1]
+    return pd.to_datetime(facts.day_to_date(cubo["first_day"] + np.arange(n_days)))
+
+
+def daily_counts(cubo: dict, nodo: tuple, level: str = "mcp") -> pd.DataFrame:
+    """
+    (date, <level>, count) de los descendientes de `nodo` en `level`, solo
+    días con registros: el formato de aggregates.finalize_tables si level='mcp'.
+    Un nodo más abajo que `level` aparece como una sola serie con su etiqueta.
+    """
+    k = nodo[0]
+    if k > cubo["levels"].index(level) + 1:
+        rango = range(nodo[1], nodo[1] + 1)
+    else:
+        k, rango = descendants(cubo, nodo, level)
+    bloque = cubo["counts"][k][rango.start:rango.stop]
+    fila, dia = np.nonzero(bloque)
+    return pd.DataFrame({
+        "date": dates(cubo)[dia],
+        level: cubo["labels"][k][rango.start:rango.stop][fila],
+        "count": bloque[fila, dia].astype("int64"),
+    })
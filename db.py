@@ -0,0 +1,235 @@
+# db.py
+# Almacén analítico embebido (SQLite) como backend de datos del dashboard.
+#
+# Los Excel se cargan una vez en dashboard.sqlite (caché de la campaña) con índices por mcp,
+# fecha y empadronador, y las pestañas piden agregados ya calculados por
+# SQLite: las tablas de avance y el detalle por MCP no cargan los registros en
+# el worker. La calidad de DNIs y el ritmo (dedup.py, forecast.py) sí leen la
+# tabla de hechos completa (facts.py), compartida por memory-map entre sesiones.
+# El drill-down por departamento de la pestaña 1 no pasa por aquí: lee el
+# cubo (cube.py), y la base solo se consulta cuando el cubo no existe.
+#
+# Tablas:
+#   registros            dni_ciu, date (YYYY-MM-DD), mcp, mcp_key, departamento, ccpp, empadronador
+#   empadronador_totales mcp, mcp_key, empadronador, total_registros   (data_monitoreo_*)
+#   mcp_info             tabla_desagregada_mcp_merged + mcp_key
+#   fuentes              archivos cargados y su huella (available() las compara con las actuales)
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+import cache
+import campaigns
+import facts
+import ingest
+import loaders
+import schema
+from aggregates import data_graf_path
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+# Relativas a la campaña activa (campaigns.py)
+DB_FILE = "dashboard.sqlite"
+MCP_INFO_FILE = "tabla_desagregada_mcp_merged.xlsx"
+
+_SCHEMA = """
+CREATE TABLE registros (
+    dni_ciu      INTEGER NOT NULL,
+    date         TEXT    NOT NULL,
+    mcp          TEXT    NOT NULL,
+    mcp_key      TEXT    NOT NULL,
+    departamento TEXT,
+    ccpp         TEXT,
+    empadronador TEXT
+);
+CREATE INDEX ix_registros_mcp_date ON registros (mcp_key, date);
+CREATE INDEX ix_registros_date ON registros (date);
+CREATE INDEX ix_registros_empadronador ON registros (mcp_key, empadronador);
+
+CREATE TABLE empadronador_totales (
+    mcp             TEXT    NOT NULL,
+    mcp_key         TEXT    NOT NULL,
+    empadronador    TEXT,
+    total_registros INTEGER NOT NULL
+);
+CREATE INDEX ix_empadronador_totales_mcp ON empadronador_totales (mcp_key);
+
+CREATE TABLE fuentes (
+    path     TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size     INTEGER
+);
+"""
+
+
+def db_path() -> str:
+    return campaigns.cache_path(DB_FILE)
+
+
+def mcp_info_path() -> str:
+    return campaigns.data_path(MCP_INFO_FILE)
+
+
+def connect(path: str = None, readonly: bool = True) -> sqlite3.Connection:
+    """Conexión nueva (una por llamada: las sesiones corren en hilos distintos)."""
+    path = path or db_path()
+    if readonly:
+        return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, check_same_thread=False)
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+def exists() -> bool:
+    return os.path.exists(db_path())
+
+
+def current_sources(base_path: str = None) -> dict:
+    """
+    {ruta: huella} de los archivos con que se arma la base: data_graf.xlsx,
+    el almacén de ingesta si existe (filas y dimensiones por DNI), la tabla
+    por MCP y los data_monitoreo_*.
+    """
+    paths = [data_graf_path(), os.path.join(ingest.store_dir(), ingest.CONTADOR_FECHA_MCP),
+             os.path.join(ingest.store_dir(), ingest.DIMENSIONES),
+             mcp_info_path()] + loaders.list_monitoring_files(base_path)
+    out = {}
+    for p in paths:
+        fp = cache.fingerprint(p)
+        if fp is not None:
+            out[p] = tuple(fp)
+    return out
+
+
+def recorded_sources(path: str = None) -> dict:
+    """{ruta: huella} guardadas en la tabla `fuentes`; {} si no hay base o no se puede leer."""
+    path = path or db_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with closing(connect(path)) as con:
+            rows = con.execute("SELECT path, mtime_ns, size FROM fuentes").fetchall()
+    except sqlite3.Error:
+        return {}
+    return {p: (mtime_ns, size) for p, mtime_ns, size in rows}
+
+
+def available() -> bool:
+    """
+    True si la base existe y se armó con los archivos actuales. Si alguno
+    cambió desde `build` (p. ej. con la app detenida) la app vuelve a los
+    Excel hasta que refresh.py o `cli.py db` la reconstruyan.
+    """
+    recorded = recorded_sources()
+    if not recorded:
+        return False
+    try:
+        return recorded == current_sources()
+    except OSError:
+        return False
+
+
+# ========================
+# CONSTRUCCIÓN
+# ========================
+def _prepare_registros(hechos: pd.DataFrame) -> pd.DataFrame:
+    """Filas de `registros` a partir de la tabla compacta de facts.py."""
+    out = pd.DataFrame({
+        "dni_ciu": hechos["dni_ciu"].to_numpy(),
+        "date": np.datetime_as_string(facts.day_to_date(hechos["dia"]), unit="D"),
+        "mcp": hechos["mcp"].astype(str).to_numpy(),
+        # map sobre una categórica transforma solo las categorías
+        "mcp_key": hechos["mcp"].map(schema.mcp_key).astype(str).to_numpy(),
+    })
+    for col in ("departamento", "ccpp", "empadronador"):
+        out[col] = hechos[col].astype(object).to_numpy() if col in hechos.columns else None
+    return out
+
+
+def _empadronador_totales(base_path: str) -> pd.DataFrame:
+    frames = []
+    for report in loaders.load_all_monitoring_files(base_path):
+        df = report["df"].copy()
+        if df.empty:
+            continue
+        df.insert(0, "mcp", report["mcp"])
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=["mcp", "mcp_key", "empadronador", "total_registros"])
+    out = pd.concat(frames, ignore_index=True)
+    out.insert(1, "mcp_key", out["mcp"].map(schema.mcp_key))
+    return out
+
+
+def build(base_path: str = None, path: str = None) -> dict:
+    """
+    (Re)construye la base completa en un archivo temporal y lo cambia de
+    forma atómica por el actual. Devuelve filas cargadas por tabla.
+    """
+    base_path = base_path or campaigns.data_path()
+    path = path or db_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + f".tmp{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    fuentes = current_sources(base_path)
+    registros = _prepare_registros(facts.load())
+    totales = _empadronador_totales(base_path)
+    mcp_info = cache.read_excel_cached(mcp_info_path())
+    if "MCP" in mcp_info.columns:
+        mcp_info["mcp_key"] = mcp_info["MCP"].map(schema.mcp_key)
+
+    con = connect(tmp, readonly=False)
+    try:
+        con.executescript(_SCHEMA)
+        registros.to_sql("registros", con, if_exists="append", index=False, chunksize=50_000)
+        totales.to_sql("empadronador_totales", con, if_exists="append", index=False)
+        mcp_info.to_sql("mcp_info", con, if_exists="replace", index=False)
+        con.executemany(
+            "INSERT OR REPLACE INTO fuentes VALUES (?, ?, ?)",
+            [(p, *fp) for p, fp in fuentes.items()],
+        )
+        con.execute("ANALYZE")
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, path)
+    return {"registros": len(registros), "empadronador_totales": len(totales), "mcp_info": len(mcp_info)}
+
+
+# ========================
+# CONSULTAS (agregados)
+# ========================
+def query(sql: str, params=()) -> pd.DataFrame:
+    with closing(connect()) as con:
+        return pd.read_sql_query(sql, con, params=list(params))
+
+
+def daily_counts() -> pd.DataFrame:
+    """(date, mcp, count) agrupado en SQLite."""
+    df = query("SELECT date, mcp, COUNT(dni_ciu) AS count FROM registros "
+               "GROUP BY date, mcp ORDER BY date, mcp")
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def empadronador_counts(mcp: str) -> pd.DataFrame:
+    """
+    (empadronador, total_registros) de una MCP: de los registros individuales
+    si traen empadronador, si no de los totales de data_monitoreo_*.
+    """
+    df = query("SELECT empadronador, COUNT(dni_ciu) AS total_registros FROM registros "
+               "WHERE mcp_key = ? AND empadronador IS NOT NULL GROUP BY empadronador",
+               [schema.mcp_key(mcp)])
+    if df.empty:
+        df = query("SELECT empadronador, total_registros FROM empadronador_totales WHERE mcp_key = ?",
+                   [schema.mcp_key(mcp)])
+    return df.sort_values("total_registros", ascending=False, ignore_index=True)
+
+
+def mcp_table() -> pd.DataFrame:
+    """Filas de tabla_desagregada_mcp_merged."""
+    return query("SELECT * FROM mcp_info")
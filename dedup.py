@@ -0,0 +1,121 @@
+# dedup.py
+# Índice de DNIs y calidad de los conteos (DNIs únicos vs. registros brutos).
+#
+# Un mismo dni_ciu puede registrarse dos veces en la misma MCP o en dos MCPs
+# distintas. El índice es un arreglo int64 ordenado de DNIs con el código de
+# MCP alineado: ordenar cuesta O(n log n) y detectar repetidos es comparar
+# vecinos. La primera aparición (por fecha) cuenta como el registro válido.
+#
+# Este índice se arma en memoria para la calidad de data_graf (sin almacén).
+# El único índice persistente de DNIs es el de los vistos que mantiene
+# ingest.py (_dnis.npy), con el que el almacén descarta los repetidos.
+import numpy as np
+import pandas as pd
+
+import facts
+import ingest
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+QUALITY_COLUMNS = ["mcp", "registros", "unicos", "duplicados_mcp", "duplicados_otra_mcp"]
+
+
+def build_index(dni: np.ndarray, mcp: np.ndarray, date=None) -> dict:
+    """
+    Ordena los DNIs (y su MCP) y marca los repetidos.
+    Devuelve dict con:
+      dni        int64 ordenado
+      mcp_code   código de MCP alineado a dni
+      mcps       nombres de MCP (mcps[mcp_code])
+      first      True en la primera aparición de cada DNI
+      first_mcp  código de MCP de la primera aparición, alineado a dni
+    """
+    codes, mcps = pd.factorize(pd.Series(mcp).astype(str))
+    dni = np.asarray(dni, dtype="int64")
+    # Orden por DNI y, dentro de cada DNI, por fecha y posición original
+    keys = [np.arange(len(dni))]
+    if date is not None:
+        keys.append(np.asarray(date, dtype="datetime64[ns]").astype("int64"))
+    keys.append(dni)
+    order = np.lexsort(keys)
+
+    dni_s, codes_s = dni[order], codes[order]
+    first = np.ones(len(dni_s), dtype=bool)
+    first[1:] = dni_s[1:] != dni_s[:-1]
+    # Índice de la primera aparición de cada grupo, propagado hacia adelante
+    first_pos = np.maximum.accumulate(np.where(first, np.arange(len(dni_s)), 0))
+    return {
+        "dni": dni_s,
+        "mcp_code": codes_s,
+        "mcps": np.asarray(mcps, dtype=str),
+        "first": first,
+        "first_mcp": codes_s[first_pos],
+    }
+
+
+def quality_from_index(index: dict) -> pd.DataFrame:
+    """Tabla por MCP: registros brutos, únicos y duplicados (misma / otra MCP)."""
+    n = len(index["mcps"])
+    codes = index["mcp_code"]
+    dup = ~index["first"]
+    same = dup & (index["first_mcp"] == codes)
+    return pd.DataFrame({
+        "mcp": index["mcps"],
+        "registros": np.bincount(codes, minlength=n),
+        "unicos": np.bincount(codes[index["first"]], minlength=n),
+        "duplicados_mcp": np.bincount(codes[same], minlength=n),
+        "duplicados_otra_mcp": np.bincount(codes[dup & ~same], minlength=n),
+    })
+
+
+# ========================
+# CALIDAD DEL ALMACÉN / DE data_graf
+# ========================
+def quality_from_store() -> pd.DataFrame:
+    """
+    Con el almacén incremental los repetidos nunca entran: los únicos son el
+    contador por MCP y los repetidos salen del registro de duplicados que
+    escribe ingest.py.
+    """
+    unicos = ingest.read_counters()["mcp"].rename(columns={"count": "unicos"})
+    dups = ingest.read_duplicates()
+    if dups.empty:
+        por_mcp = pd.DataFrame(columns=["mcp", "duplicados_mcp", "duplicados_otra_mcp"])
+    else:
+        dups["misma"] = dups["mcp"] == dups["mcp_original"]
+        por_mcp = (
+            dups.groupby("mcp")["misma"]
+            .agg(duplicados_mcp="sum", duplicados_otra_mcp=lambda s: int((~s).sum()))
+            .reset_index()
+        )
+    out = unicos.merge(por_mcp, on="mcp", how="outer").fillna(0)
+    for col in ("unicos", "duplicados_mcp", "duplicados_otra_mcp"):
+        out[col] = out[col].astype("int64")
+    out["registros"] = out["unicos"] + out["duplicados_mcp"] + out["duplicados_otra_mcp"]
+    return out[QUALITY_COLUMNS]
+
+
+def quality_from_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Calidad a partir de registros crudos (date, mcp, dni_ciu) o de la tabla de facts.py."""
+    hechos = df if "dia" in df.columns else facts.to_compact(df)
+    index = build_index(hechos["dni_ciu"].to_numpy(), hechos["mcp"].to_numpy(), facts.day_to_date(hechos["dia"]))
+    return quality_from_index(index)
+
+
+def load_quality(hechos: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Tabla de calidad por MCP del origen vigente: del almacén si existe, si
+    no de la tabla de hechos (`hechos` o facts.load()). No escribe nada en
+    disco: la app la llama al renderizar.
+    """
+    if ingest.daily_counts() is not None:
+        return quality_from_store()
+    return quality_from_frame(hechos if hechos is not None else facts.load())
+
+
+def totals(quality: pd.DataFrame) -> dict:
+    """Totales nacionales: registros brutos, DNIs únicos y duplicados."""
+    registros = int(quality["registros"].sum())
+    unicos = int(quality["unicos"].sum())
+    return {"registros": registros, "unicos": unicos, "duplicados": registros - unicos}
@@ -0,0 +1,249 @@
+# export.py
+# Exportación del estado actual del dashboard a un paquete estático.
+#
+# Para los días de reporte, cuando muchos monitores abren el dashboard a la
+# vez: las tres pestañas se renderizan una sola vez a archivos que cualquier
+# servidor estático puede entregar sin ejecutar Python.
+#
+#   dist/
+#     index.html               pestañas, indicadores y tabla por MCP (HTML)
+#     assets/plotly.min.js     plotly.js local (sin CDN)
+#     figuras/progreso.json    línea de avance (todas las MCPs, ocultas en la leyenda)
+#     figuras/<mcp>-barras.json, figuras/<mcp>-heatmap.json
+#     mapa/<mapa>.html         mapa completo
+#     manifest.json            fecha de exportación y huellas de data/
+#
+# Las figuras van pre-serializadas como JSON de Plotly y se cargan con
+# fetch() al abrir cada pestaña o MCP (servir la carpeta por HTTP, no file://).
+import html
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+from plotly.offline import get_plotlyjs
+
+import aggregates
+import cache
+import campaigns
+import charts
+import db
+import dedup
+import facts
+import forecast
+import heatmaps
+import loaders
+import map_assets
+import refresh
+import schema
+import views
+
+VALUE_BOX_FILE = "value_box.xlsx"  # en la carpeta de datos de la campaña
+
+_TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Dashboard RENIEC – Empadronamiento</title>
+<script src="assets/plotly.min.js"></script>
+<style>
+  body {{ font-family: sans-serif; margin: 0 2rem 2rem; color: #31333f; }}
+  nav button {{ border: 0; background: none; padding: .8rem 1rem; font-size: 1rem; cursor: pointer;
+               border-bottom: 2px solid transparent; }}
+  nav button.activa {{ border-bottom-color: #ff4b4b; color: #ff4b4b; }}
+  section {{ display: none; }}
+  section.activa {{ display: block; }}
+  .metricas {{ display: flex; gap: 2rem; flex-wrap: wrap; }}
+  .metrica span {{ display: block; font-size: .9rem; }}
+  .metrica strong {{ font-size: 2rem; font-weight: normal; }}
+  table {{ border-collapse: collapse; font-size: .9rem; }}
+  th, td {{ border: 1px solid #e6e9ef; padding: .3rem .6rem; text-align: left; }}
+  iframe {{ width: 100%; height: 800px; border: 0; }}
+  .nota {{ color: #808495; font-size: .85rem; }}
+</style>
+</head>
+<body>
+<h1>📊 {titulo}</h1>
+<p>Monitoreo de avance de los Municipios de Centros Poblados (MCP)</p>
+<p class="nota">Instantánea exportada el {exportado}.</p>
+<nav>
+  <button data-tab="tab1" class="activa">📈 Progreso General</button>
+  <button data-tab="tab2">📍 Monitoreo por MCP</button>
+  <button data-tab="tab3">🗺️ Mapa de Empadronamiento</button>
+</nav>
+
+<section id="tab1" class="activa">
+  <h3>Indicadores</h3>
+  <div class="metricas">{metricas}</div>
+  <hr>
+  <p class="nota">Clic en la leyenda para mostrar u ocultar cada MCP.</p>
+  <div id="fig-progreso"></div>
+  <hr>
+  <h3>📋 Tabla de Avance por MCP</h3>
+  {tabla}
+</section>
+
+<section id="tab2">
+  <h3>Detalle por MCP</h3>
+  <label>Selecciona un MCP: <select id="mcp">{opciones}</select></label>
+  <div id="fig-barras"></div>
+  <h2>🔥 Avance diario por empadronador</h2>
+  <div id="fig-heatmap"></div>
+  <p id="sin-heatmap" class="nota"></p>
+</section>
+
+<section id="tab3">
+  <h3>🗺️ Mapa de Empadronamiento</h3>
+  {mapa}
+</section>
+
+<script>
+const MCPS = {mcps};
+
+async function dibujar(id, url) {{
+  const div = document.getElementById(id);
+  if (!url) {{ Plotly.purge(div); return; }}
+  const fig = await (await fetch(url)).json();
+  await Plotly.react(div, fig.data, fig.layout, {{responsive: true}});
+}}
+
+function mostrarMcp(clave) {{
+  const mcp = MCPS[clave];
+  dibujar("fig-barras", mcp.barras);
+  dibujar("fig-heatmap", mcp.heatmap);
+  document.getElementById("sin-heatmap").textContent =
+    mcp.heatmap ? "" : "No hay heatmap de avance diario para esta MCP.";
+}}
+
+document.querySelectorAll("nav button").forEach(boton => boton.addEventListener("click", () => {{
+  document.querySelectorAll("nav button, section").forEach(el => el.classList.remove("activa"));
+  boton.classList.add("activa");
+  document.getElementById(boton.dataset.tab).classList.add("activa");
+  // Plotly necesita el ancho real del contenedor una vez visible
+  document.querySelectorAll("#" + boton.dataset.tab + " .js-plotly-plot").forEach(Plotly.Plots.resize);
+}}));
+document.getElementById("mcp").addEventListener("change", e => mostrarMcp(e.target.value));
+
+dibujar("fig-progreso", "figuras/progreso.json");
+if (Object.keys(MCPS).length) mostrarMcp(document.getElementById("mcp").value);
+</script>
+</body>
+</html>
+"""
+
+
+def _write_json(path: str, fig):
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(fig.to_json())
+
+
+def _metricas_html(value_box: pd.DataFrame, calidad) -> str:
+    return "".join(
+        f'<div class="metrica" title="{html.escape(ayuda or "")}">'
+        f"<span>{html.escape(etiqueta)}</span><strong>{html.escape(str(valor))}</strong></div>"
+        for etiqueta, valor, ayuda in views.indicators(value_box, calidad)
+    )
+
+
+def _progress_figure():
+    """Línea de avance con todas las MCPs, ocultas hasta hacer clic en la leyenda."""
+    if db.available():
+        tablas = aggregates.finalize_tables(db.daily_counts())
+    else:
+        tablas = aggregates.load_tables()
+    diario = tablas[aggregates.DIARIO_MCP]
+    fig = charts.build_progress_figure(diario, tablas[aggregates.TOTAL_DIARIO],
+                                       mcps_visibles=diario["mcp"].unique())
+    fig.for_each_trace(lambda t: t.update(visible="legendonly") if t.name != "TOTAL GENERAL" else None)
+    return fig
+
+
+def _empadronador_counts(entry: dict) -> pd.DataFrame:
+    if db.available():
+        return db.empadronador_counts(entry["mcp"])
+    return loaders.load_monitoring_file(entry["monitoreo"])["df"]
+
+
+def export(out: str = "dist", base_path: str = None) -> dict:
+    """
+    Escribe el paquete estático en `out` (se arma en una carpeta temporal y
+    se cambia por la anterior al final). Devuelve un resumen de lo exportado.
+    """
+    t0 = time.perf_counter()
+    base_path = base_path or campaigns.data_path()
+    tmp = out.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.join(tmp, "assets"))
+    os.makedirs(os.path.join(tmp, "figuras"))
+    avisos = []
+
+    with open(os.path.join(tmp, "assets", "plotly.min.js"), "w", encoding="utf-8") as fh:
+        fh.write(get_plotlyjs())
+
+    # Pestaña 1: indicadores, línea de avance y tabla por MCP
+    try:
+        calidad = dedup.load_quality()
+    except Exception as e:
+        calidad = None
+        avisos.append(f"calidad de DNIs: {e}")
+    value_box = cache.read_excel_cached(campaigns.data_path(VALUE_BOX_FILE))
+    tabla_mcp = db.mcp_table() if db.available() else cache.read_excel_cached(db.mcp_info_path())
+    try:
+        ritmo = forecast.load(facts.load(), tabla_mcp)["mcp"]
+    except Exception as e:
+        ritmo = None
+        avisos.append(f"ritmo de avance: {e}")
+    tabla_html = views.mcp_table(tabla_mcp, calidad, ritmo).to_html(na_rep="", float_format=lambda x: f"{x:,.2f}")
+    _write_json(os.path.join(tmp, "figuras", "progreso.json"), _progress_figure())
+
+    # Pestaña 2: barras y heatmap de cada MCP
+    mcps = {}
+    for key, entry in sorted(schema.mcp_registry(base_path).items(), key=lambda kv: kv[1]["mcp"]):
+        figuras = {"mcp": entry["mcp"], "barras": None, "heatmap": None}
+        conteo = _empadronador_counts(entry)
+        if not conteo.empty:
+            figuras["barras"] = f"figuras/{key}-barras.json"
+            _write_json(os.path.join(tmp, figuras["barras"]), charts.build_empadronador_bar(conteo, entry["mcp"]))
+        if entry["heatmap"] is not None:
+            try:
+                fig_hm = charts.build_heatmap_figure(heatmaps.load_matrix(entry["heatmap"]), entry["mcp"])
+                figuras["heatmap"] = f"figuras/{key}-heatmap.json"
+                _write_json(os.path.join(tmp, figuras["heatmap"]), fig_hm)
+            except Exception as e:
+                avisos.append(f"heatmap {entry['mcp']}: {e}")
+        mcps[key] = figuras
+
+    # Pestaña 3: el HTML del mapa completo
+    mapa_html = '<p class="nota">No se encontró el mapa de empadronamiento.</p>'
+    if map_assets.static_map_name() is not None:
+        html_path = map_assets.extract_map()
+        os.makedirs(os.path.join(tmp, "mapa"))
+        shutil.copy2(html_path, os.path.join(tmp, "mapa", os.path.basename(html_path)))
+        mapa_html = f'<iframe src="mapa/{html.escape(os.path.basename(html_path))}" loading="lazy"></iframe>'
+
+    exportado = time.strftime("%Y-%m-%d %H:%M")
+    opciones = "".join(f'<option value="{html.escape(k)}">{html.escape(v["mcp"])}</option>' for k, v in mcps.items())
+    with open(os.path.join(tmp, "index.html"), "w", encoding="utf-8") as fh:
+        fh.write(_TEMPLATE.format(
+            exportado=exportado,
+            titulo=html.escape(campaigns.current()["titulo"]),
+            metricas=_metricas_html(value_box, calidad),
+            tabla=tabla_html,
+            opciones=opciones,
+            mapa=mapa_html,
+            # </ dentro de un <script> cerraría la etiqueta
+            mcps=json.dumps(mcps, ensure_ascii=False).replace("</", "<\\/"),
+        ))
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as fh:
+        json.dump({"exportado": exportado, "campana": campaigns.current_id(), "fuentes": refresh.snapshot(base_path)}, fh, indent=1)
+
+    # Cambio de carpeta: el servidor nunca ve un paquete a medias
+    old = out.rstrip("/\\") + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(out):
+        os.replace(out, old)
+    os.replace(tmp, out)
+    shutil.rmtree(old, ignore_errors=True)
+    return {"mcps": len(mcps), "avisos": avisos, "segundos": time.perf_counter() - t0}
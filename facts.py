@@ -0,0 +1,119 @@
+# facts.py
+# Tabla de hechos de registros (un DNI por fila) en forma compacta.
+#
+# En vez del DataFrame genérico de data_graf (fechas como texto, MCPs como
+# objetos Python) se guarda:
+#
+#   dia           int32     días desde 1970-01-01
+#   mcp           category  (diccionario de MCPs)
+#   dni_ciu       int64
+#   departamento, ccpp, empadronador   category (si vienen en el origen)
+#
+# en .cache/hechos.arrow (Arrow IPC sin compresión). Se lee con memory-map:
+# las columnas numéricas apuntan al archivo, no se copian, y son de solo
+# lectura; la app guarda el DataFrame en st.cache_resource para que todas
+# las sesiones compartan el mismo objeto.
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import cache
+import campaigns
+import ingest
+from aggregates import data_graf_path, parse_dates
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+FACTS_PATH = "hechos.arrow"  # dentro de la caché de la campaña
+DIMENSIONS = ["mcp", "departamento", "ccpp", "empadronador"]
+_META_KEY = b"dashboard_sources"
+
+
+def facts_path() -> str:
+    return campaigns.cache_path(FACTS_PATH)
+
+
+def to_compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Versión compacta de registros crudos (date, mcp, dni_ciu, ...).
+    Descarta filas sin DNI numérico o sin fecha válida.
+    Lanza KeyError si faltan las columnas necesarias.
+    """
+    missing = [c for c in ("date", "mcp", "dni_ciu") if c not in df.columns]
+    if missing:
+        raise KeyError(f"los registros no contienen las columnas {missing}")
+
+    fechas = df["date"] if pd.api.types.is_datetime64_any_dtype(df["date"]) else parse_dates(df["date"])
+    dni = pd.to_numeric(df["dni_ciu"], errors="coerce")
+    ok = (fechas.notna() & dni.notna()).to_numpy()
+
+    hechos = pd.DataFrame({
+        "dia": fechas.to_numpy()[ok].astype("datetime64[D]").astype("int32"),
+        "mcp": pd.Categorical(df["mcp"].astype(str).str.strip().to_numpy()[ok]),
+        "dni_ciu": dni.to_numpy()[ok].astype("int64"),
+    })
+    for col in DIMENSIONS[1:]:
+        if col in df.columns:
+            hechos[col] = pd.Categorical(df[col].to_numpy()[ok])
+    return hechos
+
+
+def day_to_date(dia) -> np.ndarray:
+    """Índice de día (int32) -> datetime64[D]."""
+    return np.asarray(dia, dtype="int64").astype("datetime64[D]")
+
+
+def sources() -> dict:
+    """
+    Huellas de lo que define la tabla: el almacén de ingesta (filas y
+    dimensiones por DNI) o data_graf.
+    """
+    if ingest.daily_counts() is not None:
+        paths = [os.path.join(ingest.store_dir(), name) for name in (ingest.CONTADOR_FECHA_MCP, ingest.DIMENSIONES)]
+    else:
+        paths = [data_graf_path()]
+    out = {}
+    for path in paths:
+        fp = cache.fingerprint(path)
+        out[path] = list(fp) if fp is not None else None
+    return out
+
+
+def build(path: str = None) -> pd.DataFrame:
+    """Compacta los registros vigentes (ingest.read_all_records) y los guarda."""
+    path = path or facts_path()
+    fuentes = sources()
+    hechos = to_compact(ingest.read_all_records())
+    if cache.pa is None:
+        return hechos
+
+    table = cache.pa.Table.from_pandas(hechos, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _META_KEY: json.dumps(fuentes).encode("utf-8"),
+    })
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + f".tmp{os.getpid()}"
+    cache.feather.write_feather(table, tmp, compression="uncompressed")
+    os.replace(tmp, path)
+    return hechos
+
+
+def load(path: str = None) -> pd.DataFrame:
+    """
+    Tabla de hechos vigente: memory-mapped desde facts_path() si se
+    construyó con los orígenes actuales, si no se reconstruye.
+    """
+    path = path or facts_path()
+    if cache.pa is not None and os.path.exists(path):
+        try:
+            table = cache.feather.read_table(path, memory_map=True)
+            meta = json.loads((table.schema.metadata or {})[_META_KEY])
+            if meta == sources():
+                return table.to_pandas()
+        except (cache.pa.ArrowException, OSError, KeyError, ValueError):
+            pass
+    return build(path)
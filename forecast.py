@@ -0,0 +1,273 @@
+# forecast.py
+# Ritmo de avance y proyección de cumplimiento por MCP y por empadronador.
+#
+# A partir de la tabla de hechos (facts.py) se arma una matriz de conteos
+# diarios (entidad × día) y, sobre ella:
+#
+#   cum    acumulado por entidad
+#   roll   registros de los últimos WINDOW días (suma móvil)
+#
+# El estado se guarda en .cache/ritmo.npz junto con una firma por día (filas
+# y suma de una huella DNI + MCP + empadronador por fila). Al actualizar, el
+# primer día cuya firma cambió (normalmente los días nuevos) marca desde
+# dónde se recalcula: solo las filas de ese día en adelante pasan por el
+# bincount, las columnas anteriores se copian del estado, el acumulado
+# continúa desde el valor anterior y la suma móvil es la diferencia de
+# acumulados separados WINDOW días.
+#
+# El estado lo guardan solo refresh.py y cli.py (ingest, pace); la app lo lee
+# y actualiza en memoria sin escribirlo.
+#
+# La proyección por MCP divide lo que falta para POBLACION_AJUSTADA_FINAL
+# por el ritmo diario de la última ventana.
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import campaigns
+import facts
+import schema
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+STATE_PATH = "ritmo.npz"  # dentro de la caché de la campaña
+WINDOW = int(os.environ.get("DASHBOARD_PACE_WINDOW", "7"))
+LEVELS = ("mcp", "empadronador")
+_SEP = "\x1f"  # separa mcp y empadronador en las etiquetas del nivel empadronador
+
+
+def state_path() -> str:
+    return campaigns.cache_path(STATE_PATH)
+
+
+def daily_matrix(codes: np.ndarray, days: np.ndarray, n_entities: int, n_days: int) -> np.ndarray:
+    """Conteos int64 (entidad × día) con un solo bincount."""
+    flat = np.bincount(codes.astype("int64") * n_days + days, minlength=n_entities * n_days)
+    return flat.reshape(n_entities, n_days)
+
+
+def update(prev, labels: np.ndarray, counts: np.ndarray, first_day: int, window: int = WINDOW,
+           desde: int = None) -> dict:
+    """
+    Acumulados y sumas móviles de `counts`, reutilizando `prev` (estado
+    anterior del mismo nivel) hasta el primer día que cambió: `desde` si se
+    da (firma por día, ver compute), si no el primero cuyos conteos difieren.
+    Devuelve dict con labels, first_day, window, counts, cum, roll y
+    'desde' (primera columna recalculada).
+    """
+    n, d = counts.shape
+    cum = np.zeros((n, d), dtype="int64")
+    roll = np.zeros((n, d), dtype="int64")
+    start = 0
+    if prev is not None and int(prev["first_day"]) == first_day and int(prev["window"]) == window:
+        # Alinear filas del estado anterior con las etiquetas actuales
+        m = min(d, prev["counts"].shape[1])
+        pos = pd.Index(prev["labels"]).get_indexer(labels)
+        known = pos >= 0
+        if desde is not None:
+            start = min(desde, m)
+        else:
+            old_counts = np.zeros((n, m), dtype="int64")
+            old_counts[known] = prev["counts"][pos[known], :m]
+            changed = (counts[:, :m] != old_counts).any(axis=0)
+            start = int(changed.argmax()) if changed.any() else m
+        cum[known, :start] = prev["cum"][pos[known], :start]
+        roll[known, :start] = prev["roll"][pos[known], :start]
+
+    if start < d:
+        base = cum[:, start - 1:start] if start > 0 else 0
+        cum[:, start:] = base + np.cumsum(counts[:, start:], axis=1)
+        lag = np.arange(start, d) - window
+        atras = np.where(lag >= 0, cum[:, np.maximum(lag, 0)], 0)
+        roll[:, start:] = cum[:, start:] - atras
+    return {"labels": labels, "first_day": first_day, "window": window,
+            "counts": counts, "cum": cum, "roll": roll, "desde": start}
+
+
+def _read_state(path: str) -> dict:
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            data = {k: npz[k] for k in npz.files}
+    except (OSError, ValueError):
+        return {}
+    return {
+        level: {k[len(level) + 1:]: v for k, v in data.items() if k.startswith(level + "_")}
+        for level in LEVELS if f"{level}_labels" in data
+    }
+
+
+def _save_state(states: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = {f"{level}_{k}": np.asarray(v) for level, st in states.items()
+              for k, v in st.items() if k != "desde"}
+    tmp = path + f".tmp{os.getpid()}"
+    with open(tmp, "wb") as fh:
+        np.savez(fh, **arrays)
+    os.replace(tmp, path)
+
+
+def _categorical(col: pd.Series) -> pd.Categorical:
+    return col.array if isinstance(col.dtype, pd.CategoricalDtype) else pd.Categorical(col)
+
+
+def day_signature(hechos: pd.DataFrame, days: np.ndarray, n_days: int) -> np.ndarray:
+    """
+    Firma (2 × día): filas del día y suma de una huella por fila (DNI + crc32
+    de MCP y empadronador). Enteros exactos en float64 mientras un día tenga
+    menos de ~10^6 filas.
+    """
+    huella = hechos["dni_ciu"].to_numpy().astype("float64")
+    for col in ("mcp", "empadronador"):
+        if col in hechos.columns:
+            cat = _categorical(hechos[col])
+            crc = np.array([zlib.crc32(str(c).encode("utf-8")) for c in cat.categories] + [0], dtype="float64")
+            huella = huella + crc[cat.codes]  # código -1 (sin valor) -> 0
+    return np.vstack([np.bincount(days, minlength=n_days).astype("float64"),
+                      np.bincount(days, weights=huella, minlength=n_days)])
+
+
+def _first_changed(prev_sig: np.ndarray, sig: np.ndarray) -> int:
+    m = min(prev_sig.shape[1], sig.shape[1])
+    diff = (prev_sig[:, :m] != sig[:, :m]).any(axis=0)
+    return int(diff.argmax()) if diff.any() else m
+
+
+def _level_counts(prev, etiquetas: np.ndarray, dias: np.ndarray, desde: int, n_days: int):
+    """
+    (labels, counts) de un nivel: columnas < `desde` copiadas de `prev` y
+    el resto con un bincount de las filas de esos días (`etiquetas`, `dias`).
+    """
+    previas, m = np.empty(0, dtype=str), 0
+    if prev is not None and desde > 0:
+        m = min(desde, prev["counts"].shape[1])
+        previas = prev["labels"].astype(str)[prev["cum"][:, m - 1] > 0]
+    codes, nuevas = pd.factorize(etiquetas)
+    nuevas = np.asarray(nuevas, dtype=str)
+    labels = np.union1d(previas, nuevas)
+    counts = np.zeros((len(labels), n_days), dtype="int64")
+    if len(previas):
+        pos = pd.Index(prev["labels"].astype(str)).get_indexer(labels)
+        known = pos >= 0
+        counts[known, :m] = prev["counts"][pos[known], :m]
+    idx = pd.Index(labels).get_indexer(nuevas)
+    counts[:, desde:] = daily_matrix(idx[codes], dias - desde, len(labels), n_days - desde)
+    return labels, counts
+
+
+def compute(hechos: pd.DataFrame, path: str = None, window: int = WINDOW, save: bool = False) -> dict:
+    """
+    Estados por nivel ('mcp' y, si hay empadronadores, 'empadronador')
+    actualizados de forma incremental contra el guardado en `path`: solo
+    las filas desde el primer día cuya firma cambió. Con save=True escribe
+    el estado nuevo (refresh.py, cli.py); la app no lo escribe.
+    """
+    path = path or state_path()
+    prev = _read_state(path)
+    first_day = int(hechos["dia"].min())
+    n_days = int(hechos["dia"].max()) - first_day + 1
+    days = hechos["dia"].to_numpy().astype("int64") - first_day
+    sig = day_signature(hechos, days, n_days)
+
+    ref = prev.get("mcp")
+    desde = 0
+    if (ref is not None and "firma" in ref and int(ref["first_day"]) == first_day
+            and int(ref["window"]) == window):
+        desde = _first_changed(ref["firma"], sig)
+    else:
+        prev = {}
+    nuevas = days >= desde
+    dias = days[nuevas]
+
+    mcp_cat = _categorical(hechos["mcp"])
+    mcp = np.asarray(mcp_cat.categories.astype(str))[mcp_cat.codes[nuevas]]
+    entidades = {"mcp": (mcp, dias)}
+    if "empadronador" in hechos.columns and hechos["empadronador"].notna().any():
+        # Registros sin empadronador fuera
+        emp = hechos["empadronador"].to_numpy()[nuevas]
+        ok = pd.notna(emp)
+        entidades["empadronador"] = (
+            np.char.add(np.char.add(mcp[ok], _SEP), emp[ok].astype(str)), dias[ok])
+
+    states = {}
+    for level, (etiquetas, level_days) in entidades.items():
+        labels, counts = _level_counts(prev.get(level), etiquetas, level_days, desde, n_days)
+        states[level] = update(prev.get(level), labels, counts, first_day, window,
+                               desde if level in prev else None)
+    states["mcp"]["firma"] = sig
+    if save:
+        _save_state(states, path)
+    return states
+
+
+def dates(state: dict) -> np.ndarray:
+    """Fechas (datetime64[D]) de las columnas de un estado."""
+    return facts.day_to_date(int(state["first_day"]) + np.arange(state["counts"].shape[1]))
+
+
+def summary(state: dict, metas: pd.Series = None) -> pd.DataFrame:
+    """
+    Una fila por entidad con registros acumulados, ritmo diario de la última
+    ventana y, si se da `metas` (meta por mcp_key), días y fecha proyectada
+    para cumplirla. Sin ritmo o sin meta la proyección queda vacía.
+    """
+    labels = state["labels"].astype(str)
+    window = int(state["window"])
+    ultimo = dates(state)[-1]
+    out = pd.DataFrame({
+        "registros": state["cum"][:, -1],
+        "ritmo_diario": state["roll"][:, -1] / min(window, state["counts"].shape[1]),
+    })
+    partes = np.char.partition(labels, _SEP)
+    if (partes[:, 1] == _SEP).all() and len(labels):
+        out.insert(0, "mcp", partes[:, 0])
+        out.insert(1, "empadronador", partes[:, 2])
+    else:
+        out.insert(0, "mcp", labels)
+
+    if metas is not None and "empadronador" not in out.columns:
+        meta = out["mcp"].map(schema.mcp_key).map(metas)
+        faltan = (meta - out["registros"]).clip(lower=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dias = np.ceil(faltan / out["ritmo_diario"].where(out["ritmo_diario"] > 0))
+        out["meta"] = meta
+        out["dias_para_meta"] = dias
+        out["fecha_proyectada"] = pd.to_datetime(ultimo) + pd.to_timedelta(dias, unit="D")
+    return out
+
+
+def load(hechos: pd.DataFrame, tabla_mcp: pd.DataFrame = None, window: int = WINDOW,
+         save: bool = False) -> dict:
+    """
+    Punto de entrada del dashboard: {'mcp': resumen por MCP,
+    'empadronador': resumen por empadronador o None, 'estados': estados}.
+    Las metas salen de POBLACION_AJUSTADA_FINAL de tabla_mcp (si se da).
+    """
+    states = compute(hechos, window=window, save=save)
+    metas = None
+    if tabla_mcp is not None and {"MCP", "POBLACION_AJUSTADA_FINAL"} <= set(tabla_mcp.columns):
+        metas = pd.Series(
+            pd.to_numeric(tabla_mcp["POBLACION_AJUSTADA_FINAL"], errors="coerce").to_numpy(),
+            index=tabla_mcp["MCP"].map(schema.mcp_key),
+        ).groupby(level=0).sum()
+    return {
+        "mcp": summary(states["mcp"], metas),
+        "empadronador": summary(states["empadronador"]) if "empadronador" in states else None,
+        "estados": states,
+    }
+
+
+def series(state: dict, label: str) -> pd.DataFrame:
+    """Serie diaria de una entidad: date, count, cum_count y ritmo (media móvil)."""
+    i = int(np.flatnonzero(state["labels"].astype(str) == label)[0])
+    window = int(state["window"])
+    # Los primeros días la ventana todavía no está completa
+    dividir = np.minimum(np.arange(1, state["counts"].shape[1] + 1), window)
+    return pd.DataFrame({
+        "date": pd.to_datetime(dates(state)),
+        "count": state["counts"][i],
+        "cum_count": state["cum"][i],
+        "ritmo": state["roll"][i] / dividir,
+    })
@@ -0,0 +1,145 @@
+# heatmaps.py
+# Matrices del heatmap de avance diario (empadronador × fecha) precalculadas.
+#
+# Cada data/<mcp>.xlsx trae las hojas 'crosstab' (conteos) y 'annot' (texto).
+# Aquí se limpian una sola vez (índice de empadronadores, fechas parseadas,
+# columnas vacías fuera, orden por fecha) y se guardan juntas en un .npz:
+#
+#   z       float64 (n_empadronadores, n_fechas)
+#   annot   float64 (misma forma, NaN donde no hay anotación)
+#   y       nombres de empadronadores (unicode)
+#   dates   datetime64[D]
+#   source  huella (mtime_ns, tamaño) del Excel de origen
+#
+# Elegir una MCP en la pestaña 2 cuesta una lectura del .npz.
+import os
+
+import numpy as np
+import pandas as pd
+
+import cache
+import campaigns
+from aggregates import parse_dates
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+HEATMAP_DIR = "heatmaps"  # dentro de la caché de la campaña
+INDEX_NAMES = ["empadronador", "empadronadores", "nombre", "nombres"]
+
+
+def _clean_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Deja la hoja como matriz numérica con empadronadores en el índice y
+    fechas (datetime) en las columnas, ordenadas.
+    """
+    df = df.copy()
+    first_col = str(df.columns[0]).lower() if len(df.columns) > 0 else ""
+    if first_col in INDEX_NAMES:
+        # Excel guardó el índice como primera columna
+        df = df.set_index(df.columns[0])
+
+    fechas = parse_dates(pd.Series([str(c) for c in df.columns]))
+    df.columns = pd.DatetimeIndex(fechas)
+    df = df.loc[:, df.columns.notna()]
+    df = df.dropna(axis=1, how="all")
+    df = df.apply(pd.to_numeric, errors="coerce")
+    return df.sort_index(axis=1)
+
+
+def build_matrix(crosstab: pd.DataFrame, annot: pd.DataFrame) -> dict:
+    """
+    Matrices listas para go.Heatmap a partir de las hojas crudas.
+    Las anotaciones se alinean a las filas/columnas de los conteos.
+    Lanza ValueError si alguna hoja está vacía.
+    """
+    if crosstab.empty or annot.empty:
+        raise ValueError("Las hojas 'crosstab' o 'annot' están vacías.")
+
+    z = _clean_sheet(crosstab)
+    a = _clean_sheet(annot).reindex(index=z.index, columns=z.columns)
+    return {
+        "z": z.to_numpy(dtype="float64"),
+        "annot": a.to_numpy(dtype="float64"),
+        "y": np.array([str(i) for i in z.index], dtype=str),
+        "dates": z.columns.to_numpy().astype("datetime64[D]"),
+        "named_index": not pd.api.types.is_numeric_dtype(z.index),
+    }
+
+
+def heatmap_dir() -> str:
+    return campaigns.cache_path(HEATMAP_DIR)
+
+
+def matrix_path(path_excel: str) -> str:
+    stem = os.path.splitext(os.path.basename(path_excel))[0]
+    return os.path.join(heatmap_dir(), f"{stem}.npz")
+
+
+def _write(matrix: dict, dest: str, fp):
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = dest + f".tmp{os.getpid()}"
+    with open(tmp, "wb") as fh:
+        np.savez(fh, source=np.array(fp, dtype="int64"), **matrix)
+    os.replace(tmp, dest)
+
+
+def _read(dest: str):
+    with np.load(dest, allow_pickle=False) as npz:
+        matrix = {k: npz[k] for k in npz.files}
+    matrix["named_index"] = bool(matrix["named_index"])
+    return matrix
+
+
+def build(path_excel: str) -> dict:
+    """Lee las dos hojas del Excel, arma la matriz y la guarda en heatmap_dir()."""
+    fp = cache.fingerprint(path_excel)
+    crosstab = cache.read_excel_cached(path_excel, sheet_name="crosstab")
+    annot = cache.read_excel_cached(path_excel, sheet_name="annot")
+    matrix = build_matrix(crosstab, annot)
+    _write(matrix, matrix_path(path_excel), fp)
+    return matrix
+
+
+def load_matrix(path_excel: str) -> dict:
+    """
+    Matriz del heatmap de un Excel: desde el .npz si está al día con el
+    Excel, si no se reconstruye. Propaga los errores de lectura.
+    """
+    dest = matrix_path(path_excel)
+    fp = cache.fingerprint(path_excel)
+    if fp is not None and os.path.exists(dest):
+        try:
+            matrix = _read(dest)
+            if tuple(matrix.pop("source")) == fp:
+                return matrix
+        except (OSError, ValueError, KeyError):
+            pass
+    return build(path_excel)
+
+
+def has_heatmap_sheets(path_excel: str) -> bool:
+    try:
+        sheets = cache.list_sheets(path_excel)
+    except Exception:
+        return False
+    return "crosstab" in sheets and "annot" in sheets
+
+
+def build_all(base_path: str = None) -> list:
+    """
+    Construye las matrices de todos los Excel con hojas crosstab/annot.
+    Devuelve [(archivo, forma o mensaje de error)].
+    """
+    base_path = base_path or campaigns.data_path()
+    report = []
+    for f in sorted(os.listdir(base_path)):
+        path = os.path.join(base_path, f)
+        if not f.lower().endswith((".xlsx", ".xls")) or not has_heatmap_sheets(path):
+            continue
+        try:
+            matrix = build(path)
+            report.append((f, f"{matrix['z'].shape[0]}×{matrix['z'].shape[1]}"))
+        except Exception as e:
+            report.append((f, f"error: {e}"))
+    return report
@@ -0,0 +1,466 @@
+# ingest.py
+# Ingesta incremental (solo-agregar) de lotes de registros.
+#
+# Los snapshots como data/monitoreo_2do_empadronamiento_sab_2_12.xlsx traen
+# toda la campaña hasta la fecha. Aquí solo se agregan los dni_ciu que no se
+# habían visto antes, en un almacén particionado por fecha y MCP:
+#
+#   <caché de la campaña>/registros/date=2025-12-01/mcp=san_antonio_bajo/part-<lote>.parquet
+#
+# y se actualizan los contadores por (fecha, MCP), por empadronador y por MCP.
+# Así el refresco diario cuesta proporcional a las filas nuevas.
+#
+# data_graf.xlsx (el acumulado de la campaña) es el primer lote: el almacén
+# se siembra con él antes de cualquier snapshot y se vuelve a ingerir cuando
+# cambia, así la ingesta solo agrega DNIs y nunca muestra menos que data_graf.
+#
+# Las filas con un dni_ciu ya visto no entran al almacén. Si el DNI aparece
+# en otra MCP o en otra fecha que su primer registro (o dos veces en el mismo
+# lote) la fila se anota en _duplicados.parquet con la MCP original; si es el
+# mismo registro que vuelve en el snapshot siguiente no suma filas, pero sus
+# columnas opcionales (empadronador, ccpp, coordenadas...) completan o
+# actualizan las del DNI en _dimensiones.parquet. Así los snapshots enriquecen
+# los registros sembrados desde data_graf, que solo traen departamento.
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import cache
+import campaigns
+import schema
+from aggregates import DATA_GRAF_FILE, data_graf_path, parse_dates
+from schema import mcp_key
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+STORE_DIR = "registros"  # dentro de la caché de la campaña
+SNAPSHOT_PREFIX = "monitoreo_"
+
+# Columnas que se conservan en el almacén (las demás del formulario no se usan)
+REQUIRED_COLS = ["date", "mcp", "dni_ciu"]
+OPTIONAL_COLS = ["departamento", "ccpp", "empadronador",
+                 "coordenadas_utm_dirlatitude", "coordenadas_utm_dirlongitude"]
+TEXT_COLS = ["departamento", "ccpp", "empadronador"]
+
+_STATE = "_estado.json"
+_SEEN = "_dnis.npy"
+_SEEN_MCP = "_dnis_mcp.npy"      # MCP del primer registro, alineado a _dnis.npy
+_SEEN_DATE = "_dnis_fecha.npy"   # fecha del primer registro, alineado a _dnis.npy
+DUPLICADOS = "_duplicados.parquet"                          # dni_ciu, mcp, mcp_original, date, lote
+DIMENSIONES = "_dimensiones.parquet"                        # dni_ciu + OPTIONAL_COLS (última versión por DNI)
+CONTADOR_FECHA_MCP = "_contadores_fecha_mcp.parquet"        # date, mcp, count
+CONTADOR_EMPADRONADOR = "_contadores_empadronador.parquet"  # mcp, empadronador, count
+CONTADOR_MCP = "_contadores_mcp.parquet"                    # mcp, count
+
+
+def store_dir() -> str:
+    return campaigns.cache_path(STORE_DIR)
+
+
+def _path(name: str) -> str:
+    return os.path.join(store_dir(), name)
+
+
+def _atomic_write(dest: str, write):
+    tmp = dest + f".tmp{os.getpid()}"
+    write(tmp)
+    os.replace(tmp, dest)
+
+
+def _save_npy(tmp: str, arr: np.ndarray):
+    # np.save con ruta agrega '.npy' al temporal: escribimos sobre el handle
+    with open(tmp, "wb") as fh:
+        np.save(fh, arr)
+
+
+def _save_json(tmp: str, obj):
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(obj, fh)
+
+
+# ========================
+# ESTADO: archivos procesados y DNIs vistos
+# ========================
+def read_state() -> dict:
+    try:
+        with open(_path(_STATE), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {"files": {}}
+
+
+def read_seen() -> np.ndarray:
+    """DNIs ya ingeridos como arreglo int64 ordenado."""
+    try:
+        return np.load(_path(_SEEN))
+    except OSError:
+        return np.empty(0, dtype="int64")
+
+
+def read_seen_origin(seen: np.ndarray):
+    """
+    (mcp, fecha) del primer registro de cada DNI de `seen`, o None si el
+    almacén es anterior a estos archivos.
+    """
+    try:
+        mcps, dates = np.load(_path(_SEEN_MCP)), np.load(_path(_SEEN_DATE))
+    except OSError:
+        return None
+    if len(mcps) != len(seen) or len(dates) != len(seen):
+        return None
+    return mcps, dates
+
+
+def read_duplicates() -> pd.DataFrame:
+    """Filas descartadas por dni_ciu repetido (vacío si no hubo)."""
+    try:
+        return pd.read_parquet(_path(DUPLICADOS))
+    except (OSError, ValueError):
+        return pd.DataFrame({c: pd.Series(dtype="object")
+                             for c in ["dni_ciu", "mcp", "mcp_original", "date", "lote"]})
+
+
+def read_dimensions() -> pd.DataFrame:
+    """Columnas opcionales vigentes por DNI (vacío si no hay ingesta)."""
+    try:
+        return pd.read_parquet(_path(DIMENSIONES))
+    except (OSError, ValueError):
+        return pd.DataFrame({"dni_ciu": pd.Series(dtype="int64")})
+
+
+def _read_counter(name: str, keys: list) -> pd.DataFrame:
+    try:
+        return pd.read_parquet(_path(name))
+    except (OSError, ValueError):
+        return pd.DataFrame({**{k: pd.Series(dtype="object") for k in keys},
+                             "count": pd.Series(dtype="int64")})
+
+
+def daily_counts():
+    """
+    Contador (date, mcp, count) del almacén, o None si aún no hay ingesta.
+    Es la tabla que aggregates.py usa en lugar de agrupar data_graf.
+    """
+    if not os.path.exists(_path(CONTADOR_FECHA_MCP)):
+        return None
+    return pd.read_parquet(_path(CONTADOR_FECHA_MCP))
+
+
+def read_counters() -> dict:
+    """Los tres contadores del almacén (vacíos si no hay ingesta)."""
+    return {
+        "fecha_mcp": _read_counter(CONTADOR_FECHA_MCP, ["date", "mcp"]),
+        "empadronador": _read_counter(CONTADOR_EMPADRONADOR, ["mcp", "empadronador"]),
+        "mcp": _read_counter(CONTADOR_MCP, ["mcp"]),
+    }
+
+
+# ========================
+# DETECCIÓN DE LOTES NUEVOS
+# ========================
+def _is_data_graf(path: str) -> bool:
+    return os.path.basename(path).lower() == DATA_GRAF_FILE
+
+
+def _is_pending(path: str, done: dict = None) -> bool:
+    """True si el archivo existe y su versión actual no se ha ingerido."""
+    done = read_state()["files"] if done is None else done
+    fp = cache.fingerprint(path)
+    return fp is not None and done.get(os.path.abspath(path)) != list(fp)
+
+
+def pending_files(base_path: str = None) -> list:
+    """
+    data_graf.xlsx y snapshots/deltas (monitoreo_*.xlsx) cuya huella no se
+    ha ingerido aún. data_graf va primero (es la base de la campaña) y los
+    demás por fecha de modificación para respetar el orden de llegada.
+    """
+    base_path = base_path or campaigns.data_path()
+    done = read_state()["files"]
+    pending = []
+    for f in os.listdir(base_path):
+        low = f.lower()
+        if not (low.startswith(SNAPSHOT_PREFIX) or low == DATA_GRAF_FILE) or not low.endswith((".xlsx", ".xls")):
+            continue
+        path = os.path.join(base_path, f)
+        if _is_pending(path, done):
+            pending.append(path)
+    return sorted(pending, key=lambda p: (not _is_data_graf(p), cache.fingerprint(p)[0]))
+
+
+# ========================
+# INGESTA
+# ========================
+def _normalize_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """Deja solo las columnas del almacén con tipos estables."""
+    missing = [c for c in REQUIRED_COLS if c not in df.columns]
+    if missing:
+        raise KeyError(f"el lote no contiene las columnas {missing}")
+
+    cols = REQUIRED_COLS + [c for c in OPTIONAL_COLS if c in df.columns]
+    batch = df[cols].copy()
+    batch["dni_ciu"] = pd.to_numeric(batch["dni_ciu"], errors="coerce")
+    batch = batch.dropna(subset=["dni_ciu"])
+    batch["dni_ciu"] = batch["dni_ciu"].astype("int64")
+    batch["date"] = parse_dates(batch["date"])
+    batch = batch.dropna(subset=["date"])
+    batch["mcp"] = batch["mcp"].astype(str).str.strip()
+    return batch
+
+
+def _merge_counter(old: pd.DataFrame, new: pd.DataFrame, keys: list) -> pd.DataFrame:
+    if old.empty:
+        merged = new
+    else:
+        merged = pd.concat([old, new], ignore_index=True).groupby(keys, as_index=False)["count"].sum()
+    merged["count"] = merged["count"].astype("int64")
+    return merged.sort_values(keys, ignore_index=True)
+
+
+def _log_duplicates(dups: pd.DataFrame, batch_id: str):
+    """Agrega al registro de duplicados las filas repetidas del lote."""
+    if dups.empty:
+        return
+    dups = dups.assign(lote=batch_id)[["dni_ciu", "mcp", "mcp_original", "date", "lote"]]
+    # Los snapshots son acumulados: el mismo duplicado vuelve en cada uno y
+    # solo se agregan los que no estaban ya anotados
+    old = read_duplicates()
+    keys = ["dni_ciu", "mcp", "date"]
+    if not old.empty:
+        ya_anotado = dups.merge(old[keys].drop_duplicates(), on=keys, how="left", indicator=True)["_merge"] == "both"
+        dups = dups[~ya_anotado.to_numpy()]
+        if dups.empty:
+            return
+    log = pd.concat([old, dups], ignore_index=True)
+    _atomic_write(_path(DUPLICADOS), lambda tmp: log.to_parquet(tmp, index=False))
+
+
+def _upsert_dimensions(rows: pd.DataFrame):
+    """
+    Completa o actualiza en _dimensiones.parquet las columnas opcionales de
+    los DNIs de `rows` (un registro propio por DNI; los valores vacíos no
+    pisan los guardados). Devuelve el cambio del contador por empadronador
+    (mcp, empadronador, count ±) o None si no cambió.
+    """
+    cols = [c for c in OPTIONAL_COLS if c in rows.columns]
+    if not cols or rows.empty:
+        return None
+    lote = rows.drop_duplicates("dni_ciu").set_index("dni_ciu")
+    for c in TEXT_COLS:
+        if c in cols:
+            lote[c] = lote[c].where(lote[c].isna(), lote[c].astype(str).str.strip())
+    if os.path.exists(_path(DIMENSIONES)):
+        old = read_dimensions()
+    else:
+        # Almacén anterior a _dimensiones: se parte de lo que traen sus particiones
+        old = read_partitions()
+        old = old[["dni_ciu"] + [c for c in OPTIONAL_COLS if c in old.columns]]
+    old = old.set_index("dni_ciu")
+    todas = list(dict.fromkeys(list(old.columns) + cols))
+    previo = old.reindex(index=lote.index, columns=todas)
+    nuevo = previo.copy()
+    nuevo[cols] = lote[cols].where(lote[cols].notna(), previo[cols])
+    cambio = (~((nuevo == previo) | (nuevo.isna() & previo.isna())).all(axis=1)).to_numpy()
+    if not cambio.any():
+        return None
+
+    tabla = pd.concat([old.drop(index=nuevo.index[cambio], errors="ignore"), nuevo[cambio]])
+    tabla = tabla.sort_index().reset_index()
+    _atomic_write(_path(DIMENSIONES), lambda tmp: tabla.to_parquet(tmp, index=False))
+
+    # Contador por empadronador: -1 al valor anterior y +1 al nuevo de cada DNI que cambió
+    if "empadronador" not in cols:
+        return None
+    antes, despues = previo.loc[cambio, "empadronador"], nuevo.loc[cambio, "empadronador"]
+    mcp = lote.loc[cambio, "mcp"]
+    distinto = (antes != despues) & ~(antes.isna() & despues.isna())
+    if not distinto.any():
+        return None
+    delta = pd.concat([
+        pd.DataFrame({"mcp": mcp, "empadronador": antes, "count": -1})[distinto & antes.notna()],
+        pd.DataFrame({"mcp": mcp, "empadronador": despues, "count": 1})[distinto & despues.notna()],
+    ], ignore_index=True)
+    return delta.groupby(["mcp", "empadronador"], as_index=False)["count"].sum()
+
+
+def ingest_frame(df: pd.DataFrame, batch_id: str) -> int:
+    """
+    Agrega al almacén las filas de `df` con dni_ciu no vistos, anota los
+    duplicados y actualiza los contadores. Devuelve cuántas filas nuevas se
+    agregaron.
+    """
+    # Por fecha: dentro del lote, el primer registro de un DNI es el más antiguo
+    batch = _normalize_batch(df).sort_values("date", kind="stable")
+
+    # DNIs nuevos: fuera del índice ordenado y sin repetir dentro del lote
+    seen = read_seen()
+    origin = read_seen_origin(seen)
+    dnis = batch["dni_ciu"].to_numpy()
+    pos = np.minimum(np.searchsorted(seen, dnis), max(len(seen) - 1, 0))
+    ya_visto = (seen[pos] == dnis) if len(seen) else np.zeros(len(batch), bool)
+    en_lote = ~ya_visto & batch["dni_ciu"].duplicated(keep="first").to_numpy()
+    new = batch[~ya_visto & ~en_lote]
+
+    # Duplicados: repetidos dentro del lote, o ya vistos en otra MCP/fecha
+    primera = new.set_index("dni_ciu")["mcp"]
+    dups = batch[en_lote].assign(mcp_original=lambda d: d["dni_ciu"].map(primera).to_numpy())
+    if origin is not None and ya_visto.any():
+        mcp0, fecha0 = origin[0][pos[ya_visto]], origin[1][pos[ya_visto]]
+        vistos = batch[ya_visto].assign(mcp_original=mcp0)
+        distinto = (vistos["mcp"].to_numpy() != mcp0) | (vistos["date"].to_numpy().astype("datetime64[D]") != fecha0)
+        distinto &= mcp0 != ""  # origen desconocido (almacén anterior)
+        dups = pd.concat([dups, vistos[distinto]])
+    _log_duplicates(dups, batch_id)
+
+    # Registros propios del lote (nuevos o el mismo que vuelve): sus columnas
+    # opcionales actualizan las del DNI aunque no sumen filas
+    propio = ~ya_visto & ~en_lote
+    if ya_visto.any():
+        mismo = np.ones(int(ya_visto.sum()), bool) if origin is None else ~distinto
+        propio[np.flatnonzero(ya_visto)[mismo]] = True
+    emp_delta = _upsert_dimensions(batch[propio])
+    if new.empty and emp_delta is None:
+        return 0
+
+    # Particiones fecha/MCP (el nombre del lote hace la escritura idempotente)
+    for (fecha, mcp), part in new.groupby([new["date"].dt.strftime("%Y-%m-%d"), "mcp"]):
+        folder = _path(os.path.join(f"date={fecha}", f"mcp={mcp_key(mcp)}"))
+        os.makedirs(folder, exist_ok=True)
+        dest = os.path.join(folder, f"part-{batch_id}.parquet")
+        _atomic_write(dest, lambda tmp, part=part: part.to_parquet(tmp, index=False))
+
+    # Contadores en sitio
+    counters = read_counters()
+    updated = {}
+    if emp_delta is not None:
+        emp = _merge_counter(counters["empadronador"], emp_delta, ["mcp", "empadronador"])
+        updated[CONTADOR_EMPADRONADOR] = emp[emp["count"] != 0].reset_index(drop=True)
+    if not new.empty:
+        por_fecha = new.groupby(["date", "mcp"]).size().reset_index(name="count")
+        por_mcp = new.groupby("mcp").size().reset_index(name="count")
+        updated[CONTADOR_FECHA_MCP] = _merge_counter(counters["fecha_mcp"], por_fecha, ["date", "mcp"])
+        updated[CONTADOR_MCP] = _merge_counter(counters["mcp"], por_mcp, ["mcp"])
+
+    for name, table in updated.items():
+        _atomic_write(_path(name), lambda tmp, t=table: t.to_parquet(tmp, index=False))
+    if new.empty:
+        return 0
+
+    # Índice de vistos: concatenar y reordenar (estable) mantiene alineado el
+    # origen (MCP y fecha) de cada DNI
+    if origin is None:
+        origin = np.full(len(seen), "", dtype=str), np.full(len(seen), "NaT", dtype="datetime64[D]")
+    merged_seen = np.concatenate([seen, new["dni_ciu"].to_numpy()])
+    order = np.argsort(merged_seen, kind="stable")
+    merged_seen = merged_seen[order]
+    merged_mcp = np.concatenate([origin[0].astype(str), new["mcp"].to_numpy().astype(str)])[order]
+    merged_date = np.concatenate([origin[1], new["date"].to_numpy().astype("datetime64[D]")])[order]
+    _atomic_write(_path(_SEEN), lambda tmp: _save_npy(tmp, merged_seen))
+    _atomic_write(_path(_SEEN_MCP), lambda tmp: _save_npy(tmp, merged_mcp))
+    _atomic_write(_path(_SEEN_DATE), lambda tmp: _save_npy(tmp, merged_date))
+    return len(new)
+
+
+def ingest_file(path: str) -> int:
+    """
+    Ingiere un snapshot o delta y lo marca como procesado. Si data_graf.xlsx
+    está pendiente se ingiere antes, para que el almacén parta del acumulado.
+    """
+    base = data_graf_path()
+    if not _is_data_graf(path) and _is_pending(base):
+        ingest_file(base)
+    os.makedirs(store_dir(), exist_ok=True)
+    fp = cache.fingerprint(path)
+    batch_id = hashlib.sha1(f"{os.path.abspath(path)}|{fp}".encode("utf-8")).hexdigest()[:12]
+
+    added = ingest_frame(schema.read_records(path), batch_id)
+
+    state = read_state()
+    state["files"][os.path.abspath(path)] = list(fp)
+    _atomic_write(_path(_STATE), lambda tmp: _save_json(tmp, state))
+    return added
+
+
+def ingest_pending(base_path: str = None) -> list:
+    """Ingiere todos los lotes pendientes. Devuelve [(archivo, filas nuevas)]."""
+    return [(path, ingest_file(path)) for path in pending_files(base_path)]
+
+
+def verify() -> list:
+    """
+    Revisa el almacén contra los lotes ingeridos: tantas filas, DNIs vistos
+    y conteos como DNIs únicos traen los lotes, y contador por empadronador
+    completo si algún lote trae empadronador. Devuelve los problemas
+    encontrados (lista vacía si todo cuadra).
+    """
+    files = [p for p in read_state()["files"] if os.path.exists(p)]
+    if not files:
+        return ["no hay lotes ingeridos"]
+    dnis, con_empadronador = [], False
+    for path in files:
+        lote = _normalize_batch(schema.read_records(path))
+        dnis.append(lote["dni_ciu"].to_numpy())
+        con_empadronador |= "empadronador" in lote.columns and bool(lote["empadronador"].notna().any())
+    esperados = len(np.unique(np.concatenate(dnis)))
+
+    problemas = []
+    counters = read_counters()
+    registros = read_partitions()
+    for nombre, n in [("filas del almacén", len(registros)), ("DNIs vistos", len(read_seen())),
+                      ("contador por MCP", int(counters["mcp"]["count"].sum())),
+                      ("contador por fecha y MCP", int(counters["fecha_mcp"]["count"].sum()))]:
+        if n != esperados:
+            problemas.append(f"{nombre}: {n}, se esperaban {esperados} DNIs únicos")
+    if con_empadronador:
+        con_valor = int(registros["empadronador"].notna().sum()) if "empadronador" in registros else 0
+        por_empadronador = int(counters["empadronador"]["count"].sum())
+        if con_valor == 0 or por_empadronador != con_valor:
+            problemas.append(f"contador por empadronador: {por_empadronador}, "
+                             f"registros con empadronador: {con_valor}")
+    return problemas
+
+
+def read_all_records() -> pd.DataFrame:
+    """
+    Registros individuales: del almacén si ya hubo ingesta (sembrado con
+    data_graf, ver ingest_file), si no de data_graf.xlsx (tal como viene,
+    con repetidos).
+    """
+    if daily_counts() is not None:
+        return read_partitions()
+    return schema.read_records(data_graf_path())
+
+
+def read_partitions(date=None, mcp=None) -> pd.DataFrame:
+    """
+    Lee registros del almacén, opcionalmente filtrando por partición
+    (fecha 'YYYY-MM-DD' y/o nombre de MCP) sin abrir las demás.
+    """
+    if not os.path.isdir(store_dir()):
+        return pd.DataFrame(columns=REQUIRED_COLS)
+    frames = []
+    for d in sorted(os.listdir(store_dir())):
+        if not d.startswith("date=") or (date is not None and d != f"date={date}"):
+            continue
+        for m in sorted(os.listdir(_path(d))):
+            if mcp is not None and m != f"mcp={mcp_key(mcp)}":
+                continue
+            folder = _path(os.path.join(d, m))
+            frames += [pd.read_parquet(os.path.join(folder, p)) for p in sorted(os.listdir(folder))
+                       if p.endswith(".parquet")]
+    if not frames:
+        return pd.DataFrame(columns=REQUIRED_COLS)
+    return _with_dimensions(pd.concat(frames, ignore_index=True))
+
+
+def _with_dimensions(records: pd.DataFrame) -> pd.DataFrame:
+    """Aplica a los registros las columnas opcionales vigentes de su DNI."""
+    dims = read_dimensions().set_index("dni_ciu")
+    for c in dims.columns:
+        valores = records["dni_ciu"].map(dims[c])
+        records[c] = valores.where(valores.notna(), records[c]) if c in records.columns else valores
+    return records
@@ -0,0 +1,141 @@
+# loaders.py
+# Carga de los libros de monitoreo por MCP (data_monitoreo_*.xlsx): un índice
+# barato de MCPs, la carga de un solo archivo bajo demanda y la carga de
+# todos en paralelo (CLI / pruebas de rendimiento).
+#
+# Cada archivo se procesa de forma independiente (lectura de las columnas que
+# indica schema.py + conteo por empadronador), así que se reparten en un pool.
+# Las funciones de aquí no llaman a Streamlit: devuelven los avisos para que
+# la app los muestre en el hilo principal.
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+import cache
+import campaigns
+import schema
+
+MONITOREO_PREFIX = schema.MONITOREO_PREFIX
+EMPTY_COLUMNS = ["empadronador", "total_registros"]
+
+
+def list_monitoring_files(base_path: str = None) -> list:
+    """Rutas de los data_monitoreo_*.xlsx/.xls de `base_path`, ordenadas."""
+    base_path = base_path or campaigns.data_path()
+    files = []
+    for f in sorted(os.listdir(base_path)):
+        low = f.lower()
+        if low.startswith(MONITOREO_PREFIX) and (low.endswith(".xlsx") or low.endswith(".xls")):
+            files.append(os.path.join(base_path, f))
+    return files
+
+
+mcp_name_from_file = schema.mcp_name_from_file
+
+
+def summarize_monitoring_frame(df: pd.DataFrame, filename: str, mapping=None):
+    """
+    Convierte la hoja de un MCP a (empadronador, total_registros).
+    `mapping` es el {rol: columna} de schema.py (se resuelve si no se da).
+    Devuelve (DataFrame, lista de avisos).
+    """
+    warnings = []
+    if not isinstance(df, pd.DataFrame):
+        warnings.append(f"El archivo {filename} no se pudo leer como tabla. Se añade vacío.")
+        return pd.DataFrame(columns=EMPTY_COLUMNS), warnings
+    if mapping is None:
+        mapping = schema.resolve_columns(df.columns)
+
+    # Caso 1: archivo ya viene agregado: 'empadronador' y 'total_registros'
+    if "empadronador" in mapping and "total_registros" in mapping:
+        df2 = df[[mapping["empadronador"], mapping["total_registros"]]]
+        df2.columns = EMPTY_COLUMNS
+        return schema.coerce_roles(df2).reset_index(drop=True), warnings
+
+    # Caso 2: archivo crudo con registros individuales: contar DNIs por empadronador
+    if "empadronador" in mapping and "dni" in mapping:
+        try:
+            crudo = df[[mapping["empadronador"], mapping["dni"]]]
+            crudo.columns = ["empadronador", "dni"]
+            conteo = (
+                schema.coerce_roles(crudo)
+                .groupby("empadronador", observed=True)["dni"]
+                .count()
+                .reset_index(name="total_registros")
+                .sort_values("total_registros", ascending=False, ignore_index=True)
+            )
+            return conteo[EMPTY_COLUMNS], warnings
+        except Exception as e:
+            warnings.append(f"No se pudo agregar/contar para {filename}: {e}")
+
+    warnings.append(f"El archivo {filename} no tiene las columnas esperadas (empadronador/total_registros o empadronador + dni).")
+    return pd.DataFrame(columns=EMPTY_COLUMNS), warnings
+
+
+def load_monitoring_file(path: str) -> dict:
+    """
+    Lee y resume un archivo de monitoreo. Nunca lanza excepción: los errores
+    quedan como avisos. Devuelve un dict con mcp, df, avisos, filas y segundos.
+    """
+    t0 = time.perf_counter()
+    filename = os.path.basename(path)
+    warnings = []
+    mapping = None
+    try:
+        # Solo las columnas de rol que usa el resumen (mapeo guardado por
+        # huella), renombradas al rol y con tipos explícitos
+        mapping = schema.column_mapping(path)
+        roles = ["empadronador", "total_registros"] if "total_registros" in mapping else ["empadronador", "dni"]
+        df = schema.read_roles(path, roles)
+        mapping = {r: r for r in roles}
+    except KeyError:
+        # Faltan columnas de rol: summarize_monitoring_frame da el aviso
+        df, mapping = pd.DataFrame(), {}
+    except Exception as e:
+        warnings.append(f"Advertencia al leer {path} (sheet=0): {e}")
+        df = pd.DataFrame()
+
+    summary, more = summarize_monitoring_frame(df, filename, mapping)
+    return {
+        "archivo": filename,
+        "mcp": mcp_name_from_file(filename),
+        "df": summary,
+        "avisos": warnings + more,
+        "filas": len(df),
+        "segundos": time.perf_counter() - t0,
+    }
+
+
+def _needs_parsing(paths: list) -> bool:
+    """True si algún archivo no tiene aún entrada en la caché columnar."""
+    return any(not os.path.exists(cache.cache_path(p, 0)) for p in paths)
+
+
+def load_all_monitoring_files(base_path: str = None, max_workers=None, processes=None) -> list:
+    """
+    Carga todos los archivos de monitoreo en paralelo.
+    - processes=None elige solo: procesos si hay que parsear Excel con
+      openpyxl (CPU), hilos si todo sale de la caché columnar (E/S).
+    - Devuelve la lista de reportes de load_monitoring_file en orden de archivo.
+    """
+    paths = list_monitoring_files(base_path)
+    if not paths:
+        return []
+    if processes is None:
+        processes = cache.pa is not None and _needs_parsing(paths)
+    workers = max_workers or min(len(paths), os.cpu_count() or 1, 8)
+
+    # Los hilos y procesos del pool arrancan sin campaña activa: se les pasa
+    # la actual para que usen su caché columnar
+    campana = (campaigns.current(),)
+    if processes and workers > 1:
+        # 'spawn' evita heredar los hilos del servidor de Streamlit en el fork
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=campaigns.set_current, initargs=campana) as pool:
+            return list(pool.map(load_monitoring_file, paths))
+    with ThreadPoolExecutor(max_workers=workers, initializer=campaigns.set_current, initargs=campana) as pool:
+        return list(pool.map(load_monitoring_file, paths))
@@ -0,0 +1,397 @@
+# loadtest.py
+# Prueba de carga: muchas sesiones headless contra una instancia de streamlit_app.py.
+#
+# Arma en una carpeta temporal una copia de la app con datos sintéticos
+# (bench.py), levanta `streamlit run` sobre ella (sin red externa) y abre N
+# sesiones concurrentes por websocket que hablan el mismo protocolo que el
+# navegador (BackMsg/ForwardMsg de Streamlit). Cada sesión abre la app y luego
+# repite, con pausas aleatorias:
+#
+#   departamento  elige un departamento en el drill-down (pestaña 1)
+#   mcp           elige un MCP en la pestaña 2
+#   mapa          descarga el HTML estático que pide el iframe de la pestaña 3
+#
+# Cambiar de pestaña no llega al servidor (st.tabs se resuelve en el
+# navegador): se modela como la pausa entre acciones.
+#
+#   python cli.py loadtest --users 1 10 50 --rows 10000 --mcps 10 --out carga.json
+#
+# Por caso (usuarios × filas × MCPs) se reporta p50/p95/p99 de latencia por
+# acción (envío del rerun -> script_finished, o descarga completa del mapa),
+# CPU del worker (promedio y pico, en % de un núcleo) y memoria RSS (al
+# arrancar y pico), leídos de /proc o de psutil si está instalado.
+import asyncio
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+import bench
+
+try:
+    import psutil
+except ImportError:  # se lee /proc directamente
+    psutil = None
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_USERS = [1, 10, 50]
+DEFAULT_ROWS = [10_000]
+DEFAULT_MCPS = [10]
+STEPS = 6               # acciones por sesión después de abrir la app
+THINK_SECONDS = 1.0     # pausa máxima entre acciones
+MAP_MB = 5              # tamaño del HTML sintético del mapa (el real ronda 27 MB)
+SAMPLE_SECONDS = 0.25   # muestreo de CPU/memoria del worker
+START_TIMEOUT = 120
+RERUN_TIMEOUT = 300
+
+ACTIONS = {"departamento": "Departamento:", "mcp": "Selecciona un MCP:", "mapa": None}
+
+
+# ========================
+# APP Y DATOS SINTÉTICOS
+# ========================
+def write_app(workdir: str, rows: int, mcps: int, map_mb: float = MAP_MB):
+    """
+    Copia la app a `workdir` (su caché, static/ y data/ quedan aislados) y
+    escribe los Excel sintéticos y el ZIP del mapa en workdir/data.
+    """
+    for path in glob.glob(os.path.join(APP_DIR, "*.py")):
+        shutil.copy2(path, workdir)
+    shutil.copytree(os.path.join(APP_DIR, ".streamlit"), os.path.join(workdir, ".streamlit"), dirs_exist_ok=True)
+
+    base = os.path.join(workdir, "data")
+    data_graf = bench.write_dataset(base, rows, mcps)["data_graf"]
+
+    # Tabla por MCP y value boxes con el esquema de los archivos reales
+    por_mcp = data_graf.groupby("mcp").agg(departamento=("departamento", "first"), dni_ciu=("dni_ciu", "size"))
+    tabla = pd.DataFrame({
+        "departamento": por_mcp["departamento"].to_numpy(),
+        "MCP": por_mcp.index.to_numpy(),
+        "PROV": [f"PROVINCIA {i % 7}" for i in range(len(por_mcp))],
+        "POBLACION_AJUSTADA_FINAL": (por_mcp["dni_ciu"].to_numpy() * 3).astype("int64"),
+        "dni_ciu": por_mcp["dni_ciu"].to_numpy(),
+        "Monitor": [f"MONITOR {i % 20}" for i in range(len(por_mcp))],
+    })
+    tabla["PORC_AVANCE"] = tabla["dni_ciu"] / tabla["POBLACION_AJUSTADA_FINAL"] * 100
+    tabla.to_excel(os.path.join(base, "tabla_desagregada_mcp_merged.xlsx"), index=False)
+    pd.DataFrame({
+        "Variable": ["dnis_registrados", "departamentos", "MCPs", "CCPPs", "fecha_registro"],
+        "Valor": [len(data_graf), data_graf["departamento"].nunique(), mcps, mcps * 10, bench.N_DAYS],
+    }).to_excel(os.path.join(base, "value_box.xlsx"), index=False)
+
+    # HTML del mapa del tamaño pedido (el navegador lo descarga como estático)
+    bloque = '<div class="marker" style="left:0px;top:0px"></div>\n' * 1024
+    repeticiones = max(1, int(map_mb * 2**20 / len(bloque)))
+    with zipfile.ZipFile(os.path.join(base, "mapa_empadronamiento.zip"), "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("mapa_empadronamiento.html", "<html><body>\n" + bloque * repeticiones + "</body></html>")
+
+
+# ========================
+# WORKER
+# ========================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir: str, port: int) -> subprocess.Popen:
+    """Levanta streamlit headless en `workdir` y espera a que responda /_stcore/health."""
+    env = dict(os.environ, DASHBOARD_REFRESH_INTERVAL="0")
+    env.pop("DASHBOARD_PERF", None)
+    log = open(os.path.join(workdir, "streamlit.log"), "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "streamlit_app.py",
+         "--server.headless", "true", "--server.port", str(port), "--server.address", "127.0.0.1",
+         "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"streamlit terminó al arrancar (ver {log.name})")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.3)
+    proc.kill()
+    raise TimeoutError(f"streamlit no respondió en {START_TIMEOUT}s (ver {log.name})")
+
+
+def stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def process_usage(pid: int):
+    """(segundos de CPU acumulados, RSS en bytes) del proceso."""
+    if psutil is not None:
+        p = psutil.Process(pid)
+        t = p.cpu_times()
+        return t.user + t.system, p.memory_info().rss
+    with open(f"/proc/{pid}/stat") as fh:
+        campos = fh.read().rsplit(")", 1)[1].split()
+    with open(f"/proc/{pid}/statm") as fh:
+        paginas = int(fh.read().split()[1])
+    cpu = (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK")
+    return cpu, paginas * os.sysconf("SC_PAGE_SIZE")
+
+
+class ResourceSampler(threading.Thread):
+    """Muestrea CPU y RSS del worker cada SAMPLE_SECONDS mientras corre la carga."""
+
+    def __init__(self, pid: int, interval: float = SAMPLE_SECONDS):
+        super().__init__(name="loadtest-sampler", daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def run(self):
+        while True:
+            try:
+                self.samples.append((time.perf_counter(), *process_usage(self.pid)))
+            except (OSError, ValueError):
+                break
+            if self._stop_event.wait(self.interval):
+                break
+
+    def summary(self) -> dict:
+        if len(self.samples) < 2:
+            return {"cpu_pct_mean": None, "cpu_pct_peak": None, "rss_mb_start": None, "rss_mb_peak": None}
+        t, cpu, rss = (np.array(x, dtype="float64") for x in zip(*self.samples))
+        tramos = np.diff(cpu) / np.diff(t) * 100
+        return {
+            "cpu_pct_mean": round(float((cpu[-1] - cpu[0]) / (t[-1] - t[0]) * 100), 1),
+            "cpu_pct_peak": round(float(tramos.max()), 1),
+            "rss_mb_start": round(float(rss[0]) / 2**20, 1),
+            "rss_mb_peak": round(float(rss.max()) / 2**20, 1),
+        }
+
+
+# ========================
+# SESIONES
+# ========================
+class Session:
+    """Una pestaña del navegador: mantiene los widgets y su estado entre reruns."""
+
+    def __init__(self, port: int, rng: random.Random):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        self._widget_state = WidgetState
+        self.port = port
+        self.rng = rng
+        self.page_hash = ""
+        self.widgets = {}   # etiqueta -> (id, opciones)
+        self.states = {}    # id -> WidgetState enviado al servidor
+        self.iframe = None
+        self.errors = 0
+
+    async def rerun(self, ws) -> float:
+        """Envía un rerun con el estado actual y espera script_finished. Devuelve segundos."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = self.page_hash
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        vistos = set()
+        t0 = time.perf_counter()
+        await ws.send(msg.SerializeToString())
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await asyncio.wait_for(ws.recv(), RERUN_TIMEOUT))
+            tipo = fwd.WhichOneof("type")
+            if tipo == "new_session":
+                self.page_hash = fwd.new_session.page_script_hash
+            elif tipo == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                vistos.update(self._element(fwd.delta.new_element))
+            elif tipo == "script_finished":
+                if fwd.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                segundos = time.perf_counter() - t0
+                # Widgets que ya no se muestran dejan de enviarse (como en el navegador)
+                self.states = {k: v for k, v in self.states.items() if k in vistos}
+                return segundos
+
+    def _element(self, element) -> list:
+        tipo = element.WhichOneof("type")
+        if tipo in ("selectbox", "radio"):
+            w = getattr(element, tipo)
+            self.widgets[w.label] = (w.id, list(w.options))
+            return [w.id]
+        if tipo == "iframe" and element.iframe.src:
+            self.iframe = element.iframe.src
+        elif tipo == "exception":
+            self.errors += 1
+        return []
+
+    async def choose(self, ws, label: str):
+        """Elige una opción al azar en el widget `label`. None si no está en pantalla."""
+        if label not in self.widgets:
+            return None
+        wid, opciones = self.widgets[label]
+        self.states[wid] = self._widget_state(id=wid, string_value=self.rng.choice(opciones))
+        return await self.rerun(ws)
+
+    async def open_map(self):
+        """Descarga completa del HTML del mapa. None si la app no lo sirve como estático."""
+        if not self.iframe:
+            return None
+        url = f"http://127.0.0.1:{self.port}/{self.iframe.lstrip('/')}"
+
+        def descargar():
+            t0 = time.perf_counter()
+            with urllib.request.urlopen(url, timeout=RERUN_TIMEOUT) as r:
+                while r.read(1 << 20):
+                    pass
+            return time.perf_counter() - t0
+        return await asyncio.get_running_loop().run_in_executor(None, descargar)
+
+
+async def _user(i: int, port: int, steps: int, think: float, latencias: dict, errores: list):
+    rng = random.Random(i)
+    # Llegadas escalonadas dentro de la primera pausa
+    await asyncio.sleep(rng.uniform(0, think))
+    session = Session(port, rng)
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                                      max_size=None, open_timeout=START_TIMEOUT) as ws:
+            latencias["abrir"].append(await session.rerun(ws))
+            for _ in range(steps):
+                # Lectura y cambios de pestaña (no generan tráfico)
+                await asyncio.sleep(rng.uniform(0, think))
+                accion = rng.choice(list(ACTIONS))
+                if accion == "mapa":
+                    segundos = await session.open_map()
+                else:
+                    segundos = await session.choose(ws, ACTIONS[accion])
+                if segundos is not None:
+                    latencias[accion].append(segundos)
+    except Exception as e:
+        errores.append(f"sesión {i}: {type(e).__name__}: {e}")
+    if session.errors:
+        errores.append(f"sesión {i}: {session.errors} excepciones en la app")
+
+
+def _percentiles(valores: list) -> dict:
+    if not valores:
+        return {"n": 0}
+    v = np.asarray(valores)
+    p50, p95, p99 = np.percentile(v, [50, 95, 99])
+    return {"n": len(v), "p50": round(float(p50), 4), "p95": round(float(p95), 4),
+            "p99": round(float(p99), 4), "max": round(float(v.max()), 4)}
+
+
+async def _drive(port: int, users: int, steps: int, think: float):
+    latencias = {"abrir": [], **{a: [] for a in ACTIONS}}
+    errores = []
+    await asyncio.gather(*(_user(i, port, steps, think, latencias, errores) for i in range(users)))
+    return latencias, errores
+
+
+# ========================
+# CASOS
+# ========================
+def run_case(workdir: str, users: int, rows: int, mcps: int, steps: int = STEPS, think: float = THINK_SECONDS) -> dict:
+    """Un worker nuevo sobre la app de `workdir` y `users` sesiones concurrentes."""
+    port = _free_port()
+    proc = start_server(workdir, port)
+    try:
+        # Primera sesión sola: cachés en frío (carga de Excel, cubo, etc.)
+        frio, errores_frio = asyncio.run(_drive(port, 1, 0, 0))
+        sampler = ResourceSampler(proc.pid)
+        sampler.start()
+        t0 = time.perf_counter()
+        latencias, errores = asyncio.run(_drive(port, users, steps, think))
+        duracion = time.perf_counter() - t0
+        sampler.stop()
+    finally:
+        stop_server(proc)
+
+    reruns = latencias["abrir"] + latencias["departamento"] + latencias["mcp"]
+    return {
+        "users": users,
+        "rows": rows,
+        "mcps": mcps,
+        "cold_first_rerun": round(frio["abrir"][0], 3) if frio["abrir"] else None,
+        "seconds": round(duracion, 2),
+        "rerun": _percentiles(reruns),
+        "actions": {accion: _percentiles(v) for accion, v in latencias.items()},
+        "worker": sampler.summary(),
+        "errors": errores_frio + errores,
+    }
+
+
+def run(users_list=None, rows_list=None, mcps_list=None, steps: int = STEPS, think: float = THINK_SECONDS,
+        map_mb: float = MAP_MB, out=None, keep=False, progress=None) -> dict:
+    """
+    Corre la matriz filas × MCPs × usuarios (un worker nuevo por caso) y
+    escribe el JSON en `out` (si se da). `progress(caso)` se llama al
+    terminar cada caso.
+    """
+    if websockets is None:
+        raise RuntimeError("La prueba de carga necesita el paquete 'websockets' (pip install websockets).")
+    users_list = users_list or DEFAULT_USERS
+    rows_list = rows_list or DEFAULT_ROWS
+    mcps_list = mcps_list or DEFAULT_MCPS
+    workdir = tempfile.mkdtemp(prefix="loadtest_dashboard_")
+
+    import streamlit
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "cpus": os.cpu_count(),
+        "steps": steps,
+        "think_seconds": think,
+        "map_mb": map_mb,
+        "cases": [],
+    }
+    try:
+        for rows in rows_list:
+            for mcps in mcps_list:
+                app = os.path.join(workdir, f"r{rows}_m{mcps}")
+                os.makedirs(app)
+                write_app(app, rows, mcps, map_mb)
+                for users in users_list:
+                    caso = run_case(app, users, rows, mcps, steps, think)
+                    results["cases"].append(caso)
+                    if progress:
+                        progress(caso)
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if out:
+        with open(out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return results
@@ -0,0 +1,148 @@
+# map_assets.py
+# Mapa de empadronamiento: el HTML del ZIP se extrae una sola vez como archivo
+# estático (el navegador lo descarga y cachea por HTTP, sin pasar por Python en
+# cada rerun) y los puntos de registro (coordenadas de los snapshots) se
+# guardan ordenados por MCP para enviar al navegador solo los de la MCP elegida.
+import hashlib
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+import cache
+import campaigns
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+MAP_ZIP_FILE = "mapa_empadronamiento.zip"  # en la carpeta de datos de la campaña
+MAP_MEMBER = "mapa_empadronamiento.html"
+
+# Streamlit sirve ./static/ en /app/static/ cuando server.enableStaticServing = true;
+# cada campaña extrae su mapa en su propia subcarpeta (campaigns.static_map_dir)
+STATIC_DIR = "static"
+
+POINTS_PATH = os.path.join("mapa", "puntos.parquet")  # dentro de la caché de la campaña
+LAT_COL = "coordenadas_utm_dirlatitude"
+LON_COL = "coordenadas_utm_dirlongitude"
+
+
+def map_zip_path() -> str:
+    return campaigns.data_path(MAP_ZIP_FILE)
+
+
+def points_path() -> str:
+    return campaigns.cache_path(POINTS_PATH)
+
+
+# ========================
+# HTML ESTÁTICO
+# ========================
+def static_map_name(zip_path: str = None):
+    """
+    Nombre del HTML extraído para la versión actual del ZIP (incluye la
+    huella en el nombre para que el navegador no sirva una versión vieja).
+    Devuelve None si el ZIP no existe.
+    """
+    fp = cache.fingerprint(zip_path or map_zip_path())
+    if fp is None:
+        return None
+    version = hashlib.sha1(f"{fp[0]}|{fp[1]}".encode("utf-8")).hexdigest()[:12]
+    return f"mapa_empadronamiento-{version}.html"
+
+
+def extract_map(zip_path: str = None, dest_dir: str = None) -> str:
+    """
+    Extrae el HTML del ZIP a `dest_dir` si aún no está extraído y borra las
+    versiones anteriores. Devuelve la ruta del HTML extraído.
+    Lanza FileNotFoundError si el ZIP no existe.
+    """
+    zip_path = zip_path or map_zip_path()
+    dest_dir = dest_dir or campaigns.static_map_dir()
+    name = static_map_name(zip_path)
+    if name is None:
+        raise FileNotFoundError(zip_path)
+    dest = os.path.join(dest_dir, name)
+    if os.path.exists(dest):
+        return dest
+
+    os.makedirs(dest_dir, exist_ok=True)
+    tmp = dest + f".tmp{os.getpid()}"
+    with zipfile.ZipFile(zip_path, "r") as z, z.open(MAP_MEMBER) as src, open(tmp, "wb") as out:
+        # Copia por bloques: no se carga el HTML completo en memoria
+        while True:
+            chunk = src.read(1 << 20)
+            if not chunk:
+                break
+            out.write(chunk)
+    os.replace(tmp, dest)
+
+    for old in os.listdir(dest_dir):
+        if old.startswith("mapa_empadronamiento-") and old != name:
+            try:
+                os.remove(os.path.join(dest_dir, old))
+            except OSError:
+                pass
+    return dest
+
+
+# ========================
+# PUNTOS POR MCP
+# ========================
+def build_points(registros: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tabla de puntos (mcp, empadronador, date, lat, lon) ordenada por MCP, a
+    partir de los registros con coordenadas (las del snapshot, ver
+    ingest.py). La guarda en points_path() y la devuelve.
+    """
+    if LAT_COL not in registros.columns or LON_COL not in registros.columns:
+        raise KeyError(f"los registros no tienen las columnas {LAT_COL}/{LON_COL}")
+
+    keep = [c for c in ("mcp", "empadronador", "date") if c in registros.columns]
+    puntos = registros[keep].copy()
+    puntos["lat"] = pd.to_numeric(registros[LAT_COL], errors="coerce")
+    puntos["lon"] = pd.to_numeric(registros[LON_COL], errors="coerce")
+    puntos = puntos.dropna(subset=["lat", "lon"])
+    puntos["mcp"] = puntos["mcp"].astype(str)
+    puntos = puntos.sort_values("mcp", kind="stable", ignore_index=True)
+
+    dest = points_path()
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = dest + f".tmp{os.getpid()}"
+    puntos.to_parquet(tmp, index=False)
+    os.replace(tmp, dest)
+    return puntos
+
+
+def build_points_from_store():
+    """Reconstruye los puntos desde el almacén de ingesta; None si no trae coordenadas."""
+    import ingest
+
+    registros = ingest.read_partitions()
+    if LAT_COL not in registros.columns or registros[LAT_COL].isna().all():
+        return None
+    return build_points(registros)
+
+
+def read_points():
+    """Tabla de puntos por MCP, o None si no se ha construido."""
+    path = points_path()
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def mcp_points(puntos: pd.DataFrame, mcp: str, margin: float = 0.005):
+    """
+    (puntos de la MCP, recuadro lat_min, lat_max, lon_min, lon_max). La
+    tabla viene ordenada por MCP: un searchsorted ubica el tramo sin
+    recorrer los demás puntos. Recuadro None si la MCP no tiene puntos.
+    """
+    mcps = puntos["mcp"].to_numpy()
+    start, stop = np.searchsorted(mcps, mcp, side="left"), np.searchsorted(mcps, mcp, side="right")
+    sub = puntos.iloc[start:stop]
+    if sub.empty:
+        return sub, None
+    return sub, (sub["lat"].min() - margin, sub["lat"].max() + margin,
+                 sub["lon"].min() - margin, sub["lon"].max() + margin)
@@ -0,0 +1,171 @@
+# perf.py
+# Instrumentación liviana de tiempos y memoria por rerun.
+#
+# Se activa con DASHBOARD_PERF=1. Desactivada, todas las funciones son no-ops.
+# Cada sesión de Streamlit ejecuta el script en su propio hilo, así que los
+# registros del rerun en curso se guardan por hilo (threading.local).
+#
+#   perf.start_run()                    al inicio del script
+#   with perf.timed("load:data_graf"):  alrededor de cargas, agregaciones, figuras
+#   perf.cached_call("load_excel", f)   llamada de primer nivel a una función cacheada
+#   perf.cache_miss("load_excel")       dentro de las funciones @st.cache_data
+#   with perf.prewarm():                 calentamiento fuera de una sesión (refresh.py)
+#   perf.frame_size("value_box", df)    memoria de DataFrames
+#   perf.finish_run()                   al final: escribe una línea JSON en el log
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("DASHBOARD_PERF", "").lower() in ("1", "true", "yes")
+LOG_PATH = os.environ.get("DASHBOARD_PERF_LOG", os.path.join(".cache", "perf.jsonl"))
+
+_local = threading.local()
+_log_lock = threading.Lock()
+# Los fallos de caché se cuentan a nivel de proceso: el cuerpo de una función
+# cacheada puede correr en cualquier sesión
+_misses = Counter()
+_calls = Counter()
+# Fallos del calentamiento en el hilo de refresco: no tienen llamada de una
+# sesión que les corresponda y se reportan aparte para no falsear los aciertos
+_prewarmed = Counter()
+_counter_lock = threading.Lock()
+
+
+def _run():
+    run = getattr(_local, "run", None)
+    if run is None:
+        run = _local.run = {"timings": [], "frames": {}, "started": time.perf_counter()}
+    return run
+
+
+def start_run():
+    """Reinicia los registros del rerun del hilo actual."""
+    if ENABLED:
+        _local.run = {"timings": [], "frames": {}, "started": time.perf_counter()}
+
+
+@contextmanager
+def timed(name: str):
+    """Mide el bloque (segundos de reloj) y lo agrega al rerun actual."""
+    if not ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _run()["timings"].append((name, time.perf_counter() - t0))
+
+
+def _pending() -> list:
+    """Pila de llamadas de cached_call en curso en este hilo (True = su cuerpo corrió)."""
+    pila = getattr(_local, "pending", None)
+    if pila is None:
+        pila = _local.pending = []
+    return pila
+
+
+def cached_call(name: str, fn, *args, **kwargs):
+    """
+    Llama a una función @st.cache_data midiendo el tiempo y contando la
+    llamada y, si cache_miss() marcó su cuerpo, el fallo. Llamadas y fallos
+    se cuentan en el mismo nivel: las funciones cacheadas anidadas (p. ej.
+    load_fact_table dentro de load_pace) corren solo cuando la exterior
+    falla y no suman fallos propios sin llamada.
+    """
+    if not ENABLED:
+        return fn(*args, **kwargs)
+    pila = _pending()
+    pila.append(False)
+    try:
+        with timed(name):
+            return fn(*args, **kwargs)
+    finally:
+        fallo = pila.pop()
+        with _counter_lock:
+            if getattr(_local, "prewarm", False):
+                _prewarmed[name] += fallo
+            else:
+                _calls[name] += 1
+                _misses[name] += fallo
+
+
+@contextmanager
+def prewarm():
+    """Los fallos de caché del bloque (en este hilo) cuentan como calentamiento, no como fallos."""
+    previous = getattr(_local, "prewarm", False)
+    _local.prewarm = True
+    try:
+        yield
+    finally:
+        _local.prewarm = previous
+
+
+def cache_miss(name: str):
+    """
+    Marcar al comienzo del cuerpo de una función cacheada (solo corre en fallo).
+    Dentro de cached_call marca la llamada en curso; fuera de ella solo se
+    cuenta el calentamiento (warm_caches llama a las funciones directamente).
+    """
+    if not ENABLED:
+        return
+    pila = _pending()
+    if pila:
+        pila[-1] = True
+    elif getattr(_local, "prewarm", False):
+        with _counter_lock:
+            _prewarmed[name] += 1
+
+
+def cache_stats() -> dict:
+    """{nombre: {'llamadas', 'fallos', 'aciertos', 'precalentadas'}} acumulado del proceso."""
+    with _counter_lock:
+        return {
+            name: {"llamadas": _calls[name], "fallos": _misses[name],
+                   "aciertos": _calls[name] - _misses[name],
+                   "precalentadas": _prewarmed[name]}
+            for name in sorted(set(_calls) | set(_misses) | set(_prewarmed))
+        }
+
+
+def frame_size(name: str, df):
+    """Registra la memoria (bytes, deep) de un DataFrame del rerun actual."""
+    if not ENABLED or df is None or not hasattr(df, "memory_usage"):
+        return
+    _run()["frames"][name] = int(df.memory_usage(deep=True).sum())
+
+
+def current() -> dict:
+    """Resumen del rerun en curso (para el panel)."""
+    run = _run()
+    return {
+        "timings": list(run["timings"]),
+        "frames": dict(run["frames"]),
+        "total": time.perf_counter() - run["started"],
+        "cache": cache_stats(),
+    }
+
+
+def finish_run(**extra):
+    """Escribe el resumen del rerun como una línea JSON en LOG_PATH."""
+    if not ENABLED:
+        return
+    summary = current()
+    record = {
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "thread": threading.current_thread().name,
+        "total_s": round(summary["total"], 4),
+        "timings": [{"name": n, "s": round(s, 4)} for n, s in summary["timings"]],
+        "frames_bytes": summary["frames"],
+        "cache": summary["cache"],
+        **extra,
+    }
+    try:
+        os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+        with _log_lock, open(LOG_PATH, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError:
+        pass
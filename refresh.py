@@ -0,0 +1,230 @@
+# refresh.py
+# Refresco en segundo plano cuando cambian los archivos de una campaña.
+#
+# Un hilo por campaña abierta (ver campaigns.py) revisa cada
+# DASHBOARD_REFRESH_INTERVAL segundos las huellas (mtime, tamaño) de su
+# carpeta de datos. Si algo cambió reconstruye, fuera de las peticiones y
+# dentro de la caché de esa campaña, solo los derivados afectados:
+#
+#   cualquier Excel          caché columnar de sus hojas (cache.py)
+#   monitoreo_*.xlsx         almacén incremental (ingest.py); también data_graf.xlsx
+#                            si el almacén ya existe (es su lote base)
+#   data_graf.xlsx / ingest  tabla de hechos compacta, tablas pre-agregadas y
+#                            ritmo de avance incremental (forecast.py)
+#   + tabla por MCP          cubo del drill-down (cube.py)
+#   libros crosstab/annot    matrices .npz del heatmap (heatmaps.py)
+#   mapa_empadronamiento.zip HTML estático del mapa (map_assets.py)
+#   ingest con coordenadas   puntos por MCP de la vista ligera del mapa (map_assets.py)
+#   cualquier cambio         base SQLite, si se usa (db.py)
+#   hechos nuevos            resumen compartido para comparar campañas (compare.py)
+#
+# Luego llama a `on_refresh(generacion_nueva)` para calentar las cachés de
+# la app con la nueva generación y recién entonces la publica: las sesiones
+# siguen leyendo la generación anterior (ya caliente) hasta ese momento.
+# Cada campaña lleva su propia generación: refrescar una no invalida las
+# cachés de las demás.
+import logging
+import os
+import threading
+import time
+
+import cache
+import campaigns
+
+INTERVAL = float(os.environ.get("DASHBOARD_REFRESH_INTERVAL", "30"))
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_states = {}  # id de campaña -> estado del refresco
+
+
+def _state(campaign_id: str = None) -> dict:
+    """Estado de una campaña (la activa si None); llamar con _lock tomado."""
+    campaign_id = campaign_id or campaigns.current_id()
+    if campaign_id not in _states:
+        _states[campaign_id] = {"generation": 0, "last_check": None, "last_refresh": None,
+                                "report": [], "error": None}
+    return _states[campaign_id]
+
+
+def generation(campaign_id: str = None) -> int:
+    """Generación publicada: las funciones cacheadas la reciben como argumento."""
+    with _lock:
+        return _state(campaign_id)["generation"]
+
+
+def status(campaign_id: str = None) -> dict:
+    """Copia del estado del refresco (para el panel de rendimiento)."""
+    with _lock:
+        state = _state(campaign_id)
+        return dict(state, report=list(state["report"]))
+
+
+def snapshot(base_path: str = None) -> dict:
+    """{ruta: huella} de los Excel y ZIP de `base_path`."""
+    base_path = base_path or campaigns.data_path()
+    out = {}
+    try:
+        names = os.listdir(base_path)
+    except OSError:
+        return out
+    for f in names:
+        if f.lower().endswith((".xlsx", ".xls", ".zip")):
+            path = os.path.join(base_path, f)
+            fp = cache.fingerprint(path)
+            if fp is not None:
+                out[path] = fp
+    return out
+
+
+def changed(before: dict, after: dict) -> list:
+    """Rutas agregadas, modificadas o borradas entre dos snapshots."""
+    return sorted(p for p in set(before) | set(after) if before.get(p) != after.get(p))
+
+
+def rebuild(paths: list, base_path: str = None) -> list:
+    """
+    Reconstruye los derivados de la campaña activa afectados por `paths`.
+    Devuelve [(tarea, estado)]; un error en una tarea no detiene las demás.
+    """
+    import aggregates
+    import compare
+    import cube
+    import db
+    import facts
+    import forecast
+    import heatmaps
+    import ingest
+    import map_assets
+
+    base_path = base_path or campaigns.data_path()
+    report = []
+
+    def step(name, fn, *args):
+        try:
+            result = fn(*args)
+            report.append((name, "ok" if result is None else str(result)))
+        except Exception as e:
+            report.append((name, f"error: {e}"))
+
+    existing = [p for p in paths if os.path.exists(p)]
+    excel = [p for p in existing if p.lower().endswith((".xlsx", ".xls"))]
+    for path in excel:
+        step(f"cache:{os.path.basename(path)}", lambda p: len(cache.prebuild_file(p)), path)
+    step("cache:desalojo", cache.evict_stale)
+
+    snapshots = [p for p in excel if os.path.basename(p).lower().startswith(ingest.SNAPSHOT_PREFIX)]
+    if snapshots or (aggregates.data_graf_path() in paths and ingest.daily_counts() is not None):
+        step("ingest", lambda: sum(n for _, n in ingest.ingest_pending(base_path)))
+    if snapshots or aggregates.data_graf_path() in paths:
+        step("hechos", lambda: len(facts.load()))
+        step("agregados", lambda: len(aggregates.load_tables()[aggregates.DIARIO_MCP]))
+        step("ritmo", lambda: f"desde columna {forecast.compute(facts.load(), save=True)['mcp']['desde']}")
+        if ingest.daily_counts() is not None:
+            step("puntos", _build_points)
+    if snapshots or aggregates.data_graf_path() in paths or db.mcp_info_path() in paths:
+        step("cubo", lambda: sum(len(l) for l in cube.load()["labels"]))
+        step("comparacion", compare.publish)
+
+    for path in excel:
+        if heatmaps.has_heatmap_sheets(path):
+            step(f"heatmap:{os.path.basename(path)}", lambda p: heatmaps.build(p)["z"].shape, path)
+
+    if map_assets.map_zip_path() in existing:
+        step("mapa", map_assets.extract_map)
+
+    if db.exists():
+        step("db", lambda: db.build(base_path)["registros"])
+    return report
+
+
+def _build_points():
+    import map_assets
+
+    puntos = map_assets.build_points_from_store()
+    return "sin coordenadas" if puntos is None else len(puntos)
+
+
+class Watcher(threading.Thread):
+    """Hilo demonio que revisa los datos de una campaña y refresca sus derivados."""
+
+    def __init__(self, campaign=None, on_refresh=None, interval: float = INTERVAL):
+        if campaign is None:
+            campaign = campaigns.current()
+        self.campaign = campaign if isinstance(campaign, dict) else campaigns.get(campaign)
+        super().__init__(name=f"dashboard-refresh-{self.campaign['id']}", daemon=True)
+        self.base_path = self.campaign["data"]
+        self.on_refresh = on_refresh
+        self.interval = interval
+        self.fingerprints = self._baseline()
+        self._stop_event = threading.Event()
+
+    def _baseline(self) -> dict:
+        """
+        Huellas de partida: las actuales, salvo las de los archivos de la base
+        SQLite, que salen de su tabla `fuentes`. Así lo que cambió con la app
+        detenida se reconstruye en la primera vuelta.
+        """
+        import db
+
+        current = snapshot(self.base_path)
+        with campaigns.activate(self.campaign):
+            recorded = db.recorded_sources()
+        base = os.path.normpath(self.base_path)
+        return {**current, **{p: fp for p, fp in recorded.items()
+                              if os.path.normpath(os.path.dirname(p)) == base}}
+
+    def stop(self):
+        self._stop_event.set()
+
+    def check(self) -> bool:
+        """Una vuelta: True si hubo cambios y se publicó una generación nueva."""
+        with campaigns.activate(self.campaign):
+            return self._check()
+
+    def _check(self) -> bool:
+        current = snapshot(self.base_path)
+        paths = changed(self.fingerprints, current)
+        with _lock:
+            _state()["last_check"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        if not paths:
+            return False
+
+        t0 = time.perf_counter()
+        report = rebuild(paths, self.base_path)
+        new_generation = generation() + 1
+        error = None
+        if self.on_refresh is not None:
+            try:
+                self.on_refresh(new_generation)
+            except Exception as e:
+                error = f"calentamiento: {e}"
+                log.exception("Fallo al calentar las cachés")
+        self.fingerprints = current
+        with _lock:
+            _state().update(
+                generation=new_generation,
+                last_refresh=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                report=[("archivos", ", ".join(os.path.basename(p) for p in paths))] + report
+                       + [("segundos", f"{time.perf_counter() - t0:.2f}")],
+                error=error,
+            )
+        return True
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # El hilo no debe morir por un archivo a medio copiar
+                log.exception("Fallo al refrescar %s", self.base_path)
+
+
+def start(campaign=None, on_refresh=None, interval: float = INTERVAL):
+    """Arranca el vigilante de una campaña (None si interval <= 0 lo desactiva)."""
+    if interval <= 0:
+        return None
+    watcher = Watcher(campaign, on_refresh, interval)
+    watcher.start()
+    return watcher
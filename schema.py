@@ -0,0 +1,221 @@
+# schema.py
+# Registro de esquemas de los libros y de los archivos de cada MCP.
+#
+# - Columnas: qué columna de un libro cumple cada rol (empadronador, dni,
+#   total_registros). Se resuelve una vez por archivo y se guarda por huella
+#   (mtime, tamaño) en esquemas.json de la caché de la campaña, así las cargas siguientes leen
+#   solo esas columnas con tipos explícitos (read_roles, para data_monitoreo_*).
+#   Los libros de registros (data_graf, snapshots) se leen con read_records:
+#   solo las columnas que usa el almacén, por nombre exacto.
+# - MCPs: una clave sin tildes ('LA PEÑITA' -> 'la_penita') une el archivo de
+#   monitoreo, el libro del heatmap y la partición del almacén de una MCP,
+#   aunque los nombres de archivo difieran en tildes o mayúsculas.
+import json
+import os
+import re
+import threading
+import unicodedata
+
+import pandas as pd
+
+import cache
+import campaigns
+import heatmaps
+
+# ========================
+# CONFIGURACIÓN
+# ========================
+SCHEMA_PATH = "esquemas.json"  # dentro de la caché de la campaña
+MONITOREO_PREFIX = "data_monitoreo_"
+
+# Por rol: nombres exactos (preferidos) y fragmentos aceptados, en orden de
+# preferencia. Se comparan contra los nombres de columna normalizados.
+ROLES = {
+    "empadronador": (["empadronador"], ["empadronador", "registrador", "usuario", "nom"]),
+    "total_registros": (["total_registros"], []),
+    "dni": (["dni_ciu", "dni"], ["dni", "num_doc", "doc"]),
+}
+DTYPES = {"empadronador": "category", "dni": "int64", "total_registros": "int64"}
+
+# Libros de registros individuales (data_graf.xlsx y snapshots monitoreo_*):
+# columnas por nombre exacto; las demás del formulario no se leen
+RECORD_COLUMNS = ["date", "mcp", "dni_ciu", "departamento", "ccpp", "empadronador",
+                  "coordenadas_utm_dirlatitude", "coordenadas_utm_dirlongitude"]
+RECORD_DTYPES = {"dni_ciu": "Int64", "coordenadas_utm_dirlatitude": "float64",
+                 "coordenadas_utm_dirlongitude": "float64"}
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def mcp_key(name) -> str:
+    """
+    Clave estable de una MCP para rutas: sin tildes, minúsculas y '_'.
+    'LA PEÑITA' -> 'la_penita', 'LA VILLA LETIRA - BECARA' -> 'la_villa_letira_becara'
+    """
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+# ========================
+# COLUMNAS
+# ========================
+def resolve_columns(columns) -> dict:
+    """
+    {rol: columna original} para los roles que se encuentran en `columns`.
+    Los nombres se normalizan todos a la vez; un rol toma primero un nombre
+    exacto y si no la primera columna que contenga alguno de sus fragmentos.
+    """
+    columns = list(columns)
+    names = pd.Index([str(c) for c in columns]).str.lower().str.strip()
+    mapping = {}
+    for role, (exact, fragments) in ROLES.items():
+        hit = names.isin(exact).nonzero()[0]
+        if not len(hit):
+            for fragment in fragments:
+                hit = names.str.contains(fragment, regex=False).nonzero()[0]
+                if len(hit):
+                    break
+        if len(hit):
+            mapping[role] = columns[hit[0]]
+    return mapping
+
+
+def schema_path() -> str:
+    return campaigns.cache_path(SCHEMA_PATH)
+
+
+def _read_registry() -> dict:
+    try:
+        with open(schema_path(), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_registry(registry: dict):
+    dest = schema_path()
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    tmp = dest + f".tmp{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(registry, fh, ensure_ascii=False, indent=1)
+    os.replace(tmp, dest)
+
+
+def column_mapping(path: str, sheet_name=0) -> dict:
+    """
+    Mapeo de roles de una hoja, resuelto una vez por versión del archivo.
+    Solo lee los encabezados (de la caché columnar si existe). Propaga los
+    errores de lectura.
+    """
+    fp = cache.fingerprint(path)
+    key = f"{os.path.abspath(path)}|{sheet_name}"
+    with _memo_lock:
+        hit = _memo.get(key)
+    if hit is not None and hit[0] == fp:
+        return hit[1]
+
+    entry = _read_registry().get(key)
+    if entry is not None and fp is not None and tuple(entry["source"]) == fp:
+        mapping = entry["columns"]
+    else:
+        mapping = resolve_columns(cache.read_columns(path, sheet_name))
+        if fp is not None:
+            # Fuera las entradas de archivos que ya no existen
+            registry = {k: v for k, v in _read_registry().items() if os.path.exists(k.rsplit("|", 1)[0])}
+            registry[key] = {"source": list(fp), "columns": mapping}
+            try:
+                _save_registry(registry)
+            except OSError:
+                pass
+    with _memo_lock:
+        _memo[key] = (fp, mapping)
+    return mapping
+
+
+def read_roles(path: str, roles: list, sheet_name=0) -> pd.DataFrame:
+    """
+    Lee solo las columnas de `roles` (renombradas al rol) con tipos
+    explícitos: empadronador categórico, dni y total_registros int64.
+    Los DNI no numéricos se descartan. Lanza KeyError si falta algún rol.
+    """
+    mapping = column_mapping(path, sheet_name)
+    missing = [r for r in roles if r not in mapping]
+    if missing:
+        raise KeyError(missing)
+    df = cache.read_excel_cached(path, sheet_name=sheet_name, columns=[mapping[r] for r in roles])
+    df.columns = roles
+    return coerce_roles(df)
+
+
+def read_records(path: str, sheet_name=0) -> pd.DataFrame:
+    """
+    Lee de un libro de registros solo las RECORD_COLUMNS presentes, con DNI
+    entero (nulo si no es numérico) y coordenadas float64. Los encabezados
+    salen de la caché columnar si existe.
+    """
+    presentes = set(cache.read_columns(path, sheet_name))
+    columns = [c for c in RECORD_COLUMNS if c in presentes]
+    df = cache.read_excel_cached(path, sheet_name=sheet_name, columns=columns or None)
+    for col, dtype in RECORD_DTYPES.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+    return df
+
+
+def coerce_roles(df: pd.DataFrame) -> pd.DataFrame:
+    """Aplica DTYPES a las columnas de rol presentes en `df`."""
+    if "dni" in df.columns:
+        dni = pd.to_numeric(df["dni"], errors="coerce")
+        df = df[dni.notna()].assign(dni=dni.dropna().astype(DTYPES["dni"]))
+    if "total_registros" in df.columns:
+        total = pd.to_numeric(df["total_registros"], errors="coerce").fillna(0)
+        df = df.assign(total_registros=total.astype(DTYPES["total_registros"]))
+    if "empadronador" in df.columns:
+        df = df.assign(empadronador=df["empadronador"].astype(DTYPES["empadronador"]))
+    return df
+
+
+# ========================
+# ARCHIVOS POR MCP
+# ========================
+def mcp_name_from_file(filename: str) -> str:
+    """
+    Nombre legible de la MCP: quitar prefijo y extensión, reemplazar
+    underscores por espacios y pasar a mayúsculas.
+    """
+    name = os.path.splitext(os.path.basename(filename))[0]
+    if name.lower().startswith(MONITOREO_PREFIX):
+        name = name[len(MONITOREO_PREFIX):]
+    return name.replace("_", " ").strip().upper()
+
+
+def mcp_registry(base_path: str = None) -> dict:
+    """
+    Índice clave -> {'mcp', 'monitoreo', 'heatmap', 'matriz', 'particion'}
+    de las MCPs con archivo data_monitoreo_*. Solo lista la carpeta.
+      monitoreo  data/data_monitoreo_<mcp>.xlsx
+      heatmap    data/<mcp>.xlsx (hojas crosstab/annot) o None
+      matriz     .npz precalculado del heatmap (heatmaps.py) o None
+      particion  nombre de carpeta en el almacén de ingest.py (mcp=<clave>)
+    """
+    base_path = base_path or campaigns.data_path()
+    excel = [f for f in sorted(os.listdir(base_path)) if f.lower().endswith((".xlsx", ".xls"))]
+    registry = {}
+    for f in excel:
+        if f.lower().startswith(MONITOREO_PREFIX):
+            key = mcp_key(mcp_name_from_file(f))
+            registry[key] = {
+                "mcp": mcp_name_from_file(f),
+                "monitoreo": os.path.join(base_path, f),
+                "heatmap": None,
+                "matriz": None,
+                "particion": f"mcp={key}",
+            }
+    for f in excel:
+        key = mcp_key(os.path.splitext(f)[0])
+        if key in registry and not f.lower().startswith(MONITOREO_PREFIX):
+            registry[key]["heatmap"] = os.path.join(base_path, f)
+            registry[key]["matriz"] = heatmaps.matrix_path(f)
+    return registry
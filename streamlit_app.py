@@ -1,10 +1,28 @@
 # streamlit_app.py (archivo completo)
+import functools
 import os
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 import streamlit.components.v1 as components
 
+import aggregates
+import campaigns
+import charts
+import compare
+import cube
+import db
+import dedup
+import facts
+import forecast
+import heatmaps
+import loaders
+import map_assets
+import perf
+import refresh
+import schema
+import views
+from cache import read_excel_cached
+
 # ========================
 # CONFIGURACIÓN GENERAL
 # ========================
@@ -13,22 +31,65 @@ st.set_page_config(
     layout="wide"
 )
 
-st.title("📊 2do Empadronamiento")
+perf.start_run()
+
+# ========================
+# CAMPAÑA (ver campaigns.py)
+# ========================
+# Cada campaña (2do, 3er empadronamiento, otra región...) tiene sus datos y
+# sus cachés en disco por separado. El rerun fija la campaña elegida para su
+# hilo y solo se carga esa partición; las demás no ocupan memoria hasta que
+# alguien las abre.
+CAMPANAS = campaigns.discover()
+# Campañas cuyas tablas residentes (hechos, cubo...) se conservan a la vez;
+# la menos usada sale de la caché al abrir otra
+CAMPAIGN_CACHE_ENTRIES = int(os.environ.get("DASHBOARD_CAMPAIGN_CACHE_ENTRIES", "2"))
+# Límites de las cachés por MCP: compartidas entre sesiones, LRU por número de
+# entradas y con caducidad, para que la memoria no crezca con cientos de MCPs.
+MCP_CACHE_ENTRIES = int(os.environ.get("DASHBOARD_MCP_CACHE_ENTRIES", "32"))
+MCP_CACHE_TTL = int(os.environ.get("DASHBOARD_MCP_CACHE_TTL", "3600"))
+
+ids_campanas = list(CAMPANAS)
+inicial = campaigns.default_id()
+campana = inicial if inicial in CAMPANAS else ids_campanas[0]
+if len(CAMPANAS) > 1:
+    campana = st.sidebar.selectbox(
+        "Campaña:", options=ids_campanas, index=ids_campanas.index(campana),
+        format_func=lambda c: CAMPANAS[c]["titulo"] + (f" ({CAMPANAS[c]['region']})" if CAMPANAS[c]["region"] else ""),
+        key="campana"
+    )
+campaigns.set_current(CAMPANAS[campana])
+
+st.title(f"📊 {CAMPANAS[campana]['titulo']}")
 st.markdown("Monitoreo de avance de los Municipios de Centros Poblados (MCP)")
 
 # ========================
 # Helper: cargar excel con manejo de errores
 # ========================
-@st.cache_data
-def load_excel(path: str, sheet_name=0):
+# Generación de datos publicada por el refresco en segundo plano (ver
+# refresh.py). Las funciones cacheadas la reciben como argumento `version`:
+# cuando cambian los datos de la campaña el hilo calienta la generación nueva
+# antes de publicarla. Las que no reciben una ruta reciben además `campana`
+# (la campaña activa): solo forma parte de la clave de caché.
+generacion = refresh.generation(campana)
+DATA_DIR = campaigns.data_path()
+
+# value_box y tabla por MCP de cada campaña retenida, en la generación
+# publicada y en la que se está calentando
+@st.cache_data(max_entries=4 * CAMPAIGN_CACHE_ENTRIES, ttl=MCP_CACHE_TTL)
+def load_excel(path: str, sheet_name=0, version=0):
     """
     Lee un Excel de forma robusta.
     - sheet_name por defecto es 0 (primera hoja).
+    - version: generación de refresh.py (solo forma parte de la clave de caché).
+    - Pasa por la caché columnar en disco (ver cache.py): solo se parsea
+      el Excel la primera vez o cuando cambia el archivo.
     - Si ocurre un error devuelve DataFrame vacío.
     """
+    perf.cache_miss("load_excel")
     try:
         # Forzamos sheet_name por defecto a 0 para evitar que read_excel devuelva dict()
-        return pd.read_excel(path, sheet_name=sheet_name)
+        return read_excel_cached(path, sheet_name=sheet_name)
     except Exception as e:
         st.warning(f"Advertencia al leer {path} (sheet={sheet_name}): {e}")
         return pd.DataFrame()
@@ -36,111 +97,200 @@ def load_excel(path: str, sheet_name=0):
 # ========================
 # Cargar DataFrames principales
 # ========================
-value_box = load_excel("data/value_box.xlsx")
-data_graf = load_excel("data/data_graf.xlsx")
-tabla_desagregada_mcp_merged = load_excel("data/tabla_desagregada_mcp_merged.xlsx")
+value_box = perf.cached_call("load_excel", load_excel, os.path.join(DATA_DIR, "value_box.xlsx"), version=generacion)
+tabla_desagregada_mcp_merged = perf.cached_call("load_excel", load_excel, db.mcp_info_path(), version=generacion)
+perf.frame_size("value_box", value_box)
+perf.frame_size("tabla_desagregada_mcp_merged", tabla_desagregada_mcp_merged)
 
 # ================================
-# CARGA AUTOMÁTICA DE MCPs (busca files que empiecen con data_monitoreo_)
+# CARGA BAJO DEMANDA DE MCPs (busca files que empiecen con data_monitoreo_)
 # ================================
-@st.cache_data
-def load_mcp_details_from_data_folder():
-    base_path = "data"
+
+@st.cache_data(ttl=60)
+def load_mcp_index(campana, version=0):
+    """
+    Archivos de cada MCP a partir de los nombres de archivo (no lee ningún
+    Excel). Devuelve dict MCP -> entrada de schema.mcp_registry, o {} si no
+    se puede listar la carpeta de datos de la campaña.
+    """
+    perf.cache_miss("load_mcp_index")
     try:
-        files = os.listdir(base_path)
+        return {e["mcp"]: e for e in schema.mcp_registry().values()}
     except Exception as e:
-        st.error(f"No se pudo listar la carpeta data/: {e}")
+        st.error(f"No se pudo listar la carpeta {campaigns.data_path()}: {e}")
         return {}
 
-    mcp_dict = {}
-
-    for f in files:
-        low = f.lower()
-        if low.startswith("data_monitoreo_") and (low.endswith(".xlsx") or low.endswith(".xls")):
-            path = os.path.join(base_path, f)
-
-            # Intentar leer la primera hoja (como DataFrame). load_excel devuelve DataFrame o DataFrame vacío.
-            df = load_excel(path, sheet_name=0)
-
-            # Si por alguna razón load_excel devolviera dict (no debería), intentar coger la primera hoja.
-            if isinstance(df, dict):
-                # tomar la primera hoja del dict
-                try:
-                    first_sheet = list(df.keys())[0]
-                    df = df[first_sheet]
-                except Exception:
-                    df = pd.DataFrame()
-
-            # Nombre legible de la MCP: quitar prefijo y extensión, reemplazar guiones/underscores por espacios
-            name = f[len("data_monitoreo_"):]
-            # remover extensión
-            if name.lower().endswith(".xlsx"):
-                name = name[:-5]
-            elif name.lower().endswith(".xls"):
-                name = name[:-4]
-            # formatear nombre: cambiar underscores por espacios y mayúsculas
-            mcp_name = name.replace("_", " ").strip().upper()
-
-            # Si df no es DataFrame, lo avisamos y añadimos vacío
-            if not isinstance(df, pd.DataFrame):
-                st.warning(f"El archivo {f} no se pudo leer como tabla. Se añade vacío para {mcp_name}.")
-                mcp_dict[mcp_name] = pd.DataFrame(columns=["empadronador", "total_registros"])
-                continue
-
-            # Normalizar columnas para reconocimiento (pero no forzamos renombrar en el DF original salvo para uso interno)
-            cols_lower = [str(c).lower().strip() for c in df.columns]
-
-            # Caso 1: archivo ya viene agregado: 'empadronador' y 'total_registros'
-            if ("empadronador" in cols_lower) and ("total_registros" in cols_lower):
-                # Hacemos copia y uniformizamos nombres a minúsculas
-                df2 = df.copy()
-                df2.columns = [str(c).lower().strip() for c in df2.columns]
-                # Asegurar los tipos
-                try:
-                    df2["total_registros"] = pd.to_numeric(df2["total_registros"], errors="coerce").fillna(0).astype(int)
-                except Exception:
-                    pass
-                mcp_dict[mcp_name] = df2[["empadronador", "total_registros"]]
-                continue
-
-            # Caso 2: archivo crudo con registros individuales: buscar columna dni + empadronador para agrupar
-            possible_dni_cols = [c for c in df.columns if "dni" in str(c).lower() or "doc" in str(c).lower() or "num_doc" in str(c).lower()]
-            possible_emp_cols = [c for c in df.columns if "empadronador" in str(c).lower() or "usuario" in str(c).lower() or "registrador" in str(c).lower() or "nom" in str(c).lower()]
-
-            if possible_dni_cols and possible_emp_cols:
-                dni_col = possible_dni_cols[0]
-                emp_col = possible_emp_cols[0]
-                try:
-                    conteo = (
-                        df.groupby(emp_col)[dni_col]
-                        .count()
-                        .reset_index(name="total_registros")
-                        .rename(columns={emp_col: "empadronador"})
-                        .sort_values("total_registros", ascending=False)
-                    )
-                    # Normalizar columnas
-                    conteo.columns = [c.lower().strip() for c in conteo.columns]
-                    mcp_dict[mcp_name] = conteo[["empadronador", "total_registros"]]
-                    continue
-                except Exception as e:
-                    st.warning(f"No se pudo agregar/contar para {f}: {e}")
-
-            # Si llegamos aquí no pudimos procesar el archivo: lo guardamos pero vacío para avisar luego
-            st.warning(f"El archivo {f} no tiene las columnas esperadas (empadronador/total_registros o empadronador + dni).")
-            mcp_dict[mcp_name] = pd.DataFrame(columns=["empadronador", "total_registros"])
-
-    return mcp_dict
-
-mcp_details = load_mcp_details_from_data_folder()
+@st.cache_data(max_entries=MCP_CACHE_ENTRIES, ttl=MCP_CACHE_TTL)
+def load_mcp_detail(path: str, version=0):
+    """
+    Carga un solo archivo de monitoreo (ver loaders.py) cuando se elige su MCP.
+    Devuelve (DataFrame empadronador/total_registros, lista de avisos).
+    """
+    perf.cache_miss("load_mcp_detail")
+    report = loaders.load_monitoring_file(path)
+    return report["df"], report["avisos"]
+
+@st.cache_data(max_entries=MCP_CACHE_ENTRIES, ttl=MCP_CACHE_TTL)
+def load_mcp_counts(campana, mcp: str, version=0):
+    """Conteo por empadronador de una MCP consultado a la base SQLite (ver db.py)."""
+    perf.cache_miss("load_mcp_counts")
+    return db.empadronador_counts(mcp), []
+
+@st.cache_data(max_entries=MCP_CACHE_ENTRIES, ttl=MCP_CACHE_TTL)
+def load_heatmap_matrix(path: str, version=0):
+    """
+    Matrices del heatmap de un MCP (ver heatmaps.py), con la misma caché acotada.
+    Lanza ValueError si las hojas 'crosstab' o 'annot' están vacías.
+    """
+    perf.cache_miss("load_heatmap_matrix")
+    return heatmaps.load_matrix(path)
+
+mcp_index = perf.cached_call("load_mcp_index", load_mcp_index, campana, generacion)
+
+# ================================
+# TABLAS PRE-AGREGADAS DE AVANCE (ver aggregates.py)
+# ================================
+# Si existe la base SQLite (python cli.py db) las pestañas consultan agregados
+# a la base en vez de cargar tablas completas en memoria (ver db.py).
+USE_DB = db.available()
+
+@st.cache_resource(max_entries=2 * CAMPAIGN_CACHE_ENTRIES)
+def load_cube(campana, version=0):
+    """
+    Cubo departamento → provincia → MCP → ... × día (ver cube.py), compartido
+    entre sesiones. None si no se puede armar (p. ej. sin data_graf.xlsx).
+    """
+    perf.cache_miss("load_cube")
+    try:
+        return cube.load()
+    except Exception:
+        return None
+
+@st.cache_data(max_entries=MCP_CACHE_ENTRIES, ttl=MCP_CACHE_TTL)
+def load_progress_tables(campana, ruta=(), version=0):
+    """
+    Devuelve (data_agregado, data_total) ya agregados por fecha/MCP.
+    - Con el cubo: series diarias de las MCPs bajo `ruta` (drill-down), sin reagrupar registros.
+    - Sin él: GROUP BY en la base SQLite o tablas pre-agregadas de data_graf.xlsx.
+    Si no se pueden construir devuelve (None, mensaje de error).
+    """
+    perf.cache_miss("load_progress_tables")
+    try:
+        cubo = load_cube(campana, version)
+        if cubo is not None:
+            tablas = aggregates.finalize_tables(cube.daily_counts(cubo, cube.node(cubo, ruta)))
+        elif db.available():
+            tablas = aggregates.finalize_tables(db.daily_counts())
+        else:
+            tablas = aggregates.load_tables()
+    except KeyError:
+        return None, "`data_graf.xlsx` no contiene las columnas necesarias ('date','mcp','dni_ciu') para mostrar el gráfico temporal."
+    except Exception as e:
+        return None, f"No se pudo cargar `data_graf.xlsx`: {e}"
+    return tablas[aggregates.DIARIO_MCP], tablas[aggregates.TOTAL_DIARIO]
+
+@st.cache_data(max_entries=2 * CAMPAIGN_CACHE_ENTRIES, ttl=MCP_CACHE_TTL)
+def load_mcp_table(campana, version=0):
+    """
+    Tabla de avance por MCP (desde la base si existe). Se lee aquí y no del
+    global del script: warm_caches la llama desde el hilo de refresco.
+    """
+    perf.cache_miss("load_mcp_table")
+    if db.available():
+        return db.mcp_table()
+    return load_excel(db.mcp_info_path(), version=version)
+
+@st.cache_resource(max_entries=2 * CAMPAIGN_CACHE_ENTRIES)
+def load_fact_table(campana, version=0):
+    """
+    Tabla de hechos compacta (ver facts.py): memory-mapped y de solo lectura.
+    cache_resource la comparte entre sesiones sin copiarla en cada rerun
+    (cache_data devolvería una copia deserializada por llamada).
+    """
+    perf.cache_miss("load_fact_table")
+    return facts.load()
+
+@st.cache_data(max_entries=2 * CAMPAIGN_CACHE_ENTRIES, ttl=MCP_CACHE_TTL)
+def load_dni_quality(campana, version=0):
+    """
+    Registros brutos vs. DNIs únicos por MCP (ver dedup.py).
+    Devuelve None si no se puede calcular (p. ej. sin data_graf.xlsx).
+    """
+    perf.cache_miss("load_dni_quality")
+    try:
+        return dedup.load_quality(load_fact_table(campana, version))
+    except Exception:
+        return None
+
+calidad_dnis = perf.cached_call("load_dni_quality", load_dni_quality, campana, generacion)
+
+@st.cache_data(max_entries=2 * CAMPAIGN_CACHE_ENTRIES, ttl=MCP_CACHE_TTL)
+def load_pace(campana, version=0):
+    """
+    Ritmo de avance y proyección por MCP y empadronador (ver forecast.py).
+    Devuelve None si no se puede calcular.
+    """
+    perf.cache_miss("load_pace")
+    try:
+        return forecast.load(load_fact_table(campana, version), load_mcp_table(campana, version))
+    except Exception:
+        return None
+
+ritmo = perf.cached_call("load_pace", load_pace, campana, generacion)
+
+def warm_caches(campana: str, version: int):
+    """
+    Corre en el hilo de refresh.py de la campaña (que ya la tiene activa):
+    llena las cachés de la generación nueva (vistas por defecto de cada
+    pestaña) antes de que se publique. Sus fallos de caché se cuentan aparte
+    (perf.prewarm) para no restar aciertos a las sesiones.
+    """
+    with perf.prewarm():
+        load_excel(campaigns.data_path("value_box.xlsx"), version=version)
+        load_excel(db.mcp_info_path(), version=version)
+        load_fact_table(campana, version)
+        load_mcp_index(campana, version)
+        load_cube(campana, version)
+        load_progress_tables(campana, (), version)
+        load_mcp_table(campana, version)
+        load_dni_quality(campana, version)
+        load_pace(campana, version)
+        load_map_points(campana, version)
+
+@st.cache_resource
+def start_refresh_worker(campana: str):
+    """
+    Un vigilante por campaña y proceso (ver refresh.py), arrancado la
+    primera vez que alguien abre la campaña: las que nadie abre no cuestan.
+    """
+    return refresh.start(CAMPANAS[campana], on_refresh=functools.partial(warm_caches, campana))
+
+start_refresh_worker(campana)
+
+@st.cache_data(ttl=60)
+def load_comparison(campanas: tuple, version=0):
+    """
+    Agregados compartidos de las campañas (ver compare.py): no abre la tabla
+    de hechos ni el cubo de ninguna. None si no se pueden leer.
+    """
+    perf.cache_miss("load_comparison")
+    try:
+        return compare.load(campanas)
+    except Exception:
+        return None
 
 # ========================
 # PESTAÑAS
 # ========================
-tab1, tab2, tab3 = st.tabs([
+nombres_tabs = [
     "📈 Progreso General",
     "📍 Monitoreo por MCP",
     "🗺️ Mapa de Empadronamiento"
-])
+]
+# La comparación solo aparece cuando hay más de una campaña
+if len(CAMPANAS) > 1:
+    nombres_tabs.append("🔀 Comparar campañas")
+tab1, tab2, tab3, *tab_comparacion = st.tabs(nombres_tabs)
 
 # ===========================================
 # 📈 TAB 1: PROGRESO GENERAL
@@ -148,146 +298,76 @@ tab1, tab2, tab3 = st.tabs([
 with tab1:
     st.subheader("Indicadores")
 
-    # Prevenir error si value_box vacío
-    if not value_box.empty and ("Variable" in value_box.columns) and ("Valor" in value_box.columns):
-        indicadores = dict(zip(value_box["Variable"], value_box["Valor"]))
-    else:
-        indicadores = {}
-
-    # Extraer valores con fallback
-    dnis_reg = indicadores.get("dnis_registrados", 0)
-    deps = indicadores.get("departamentos", 0)
-    mcps = indicadores.get("MCPs", 0)
-    ccpp = indicadores.get("CCPPs", 0)
-    fechas = indicadores.get("fecha_registro", 0)
-
     # Value Boxes (Métricas)
-    col1, col2, col3, col4, col5 = st.columns(5)
-    col1.metric("🆔 DNIs Registrados", f"{int(dnis_reg):,}" if pd.notna(dnis_reg) else "0")
-    col2.metric("🗺️ Departamentos", deps)
-    col3.metric("🏛️ MCPs", mcps)
-    col4.metric("📍 Centros Poblados", ccpp)
-    col5.metric("🗓️ Fechas de trabajo", fechas)
+    columnas_metricas = st.columns(5)
+    for col, (etiqueta, valor, ayuda) in zip(columnas_metricas, views.indicators(value_box, calidad_dnis)):
+        col.metric(etiqueta, valor, help=ayuda)
 
     st.markdown("---")
 
-    # GRÁFICO — Avance por fecha y MCP
-    if not data_graf.empty:
-        try:
-            # intentar parseo con formato dado; si falla, dejar tal cual
-            data_graf = data_graf.copy()
-            if "date" in data_graf.columns:
-                try:
-                    data_graf['date'] = pd.to_datetime(data_graf['date'], format='%d%b%Y')
-                except Exception:
-                    data_graf['date'] = pd.to_datetime(data_graf['date'], errors='coerce')
-
-            # Agregado por MCP (necesita columna dni_ciu en raw)
-            if ("mcp" in data_graf.columns) and ("dni_ciu" in data_graf.columns):
-                data_agregado = (
-                    data_graf.groupby(['date', 'mcp'])['dni_ciu']
-                    .count()
-                    .reset_index()
-                    .rename(columns={'dni_ciu': 'count'})
-                ).sort_values('date')
-
-                data_total = (
-                    data_agregado.groupby('date')['count']
-                    .sum()
-                    .reset_index()
-                    .rename(columns={'count': 'total_count'})
+    # Drill-down sobre el cubo precalculado (ver cube.py): cada nivel elegido
+    # filtra el gráfico, la tabla por MCP y la lista de MCPs de la pestaña 2
+    cubo = perf.cached_call("load_cube", load_cube, campana, generacion)
+    ruta = ()
+    mcps_ruta = None
+    if cubo is not None:
+        for col, nivel in zip(st.columns(len(cubo["levels"])), cubo["levels"]):
+            hijos = cube.children(cubo, cube.node(cubo, ruta))
+            if hijos.empty:
+                break
+            opcion = col.selectbox(f"{cube.HIERARCHY[nivel]}:", options=["Todos"] + hijos["etiqueta"].tolist())
+            if opcion == "Todos":
+                break
+            ruta += (opcion,)
+
+        nodo = cube.node(cubo, ruta)
+        hijos = cube.children(cubo, nodo)
+        if ruta:
+            st.caption(f"{' › '.join(ruta)}: {cube.total(cubo, nodo):,} registros")
+            mcps_ruta = {schema.mcp_key(m) for m in cube.labels(cubo, nodo, "mcp")}
+        if not hijos.empty:
+            nivel_hijos = cube.HIERARCHY[cube.level_name(cubo, nodo[0] + 1)]
+            with perf.timed("chart:drilldown"):
+                fig = charts.build_drilldown_bar(
+                    hijos, nivel_hijos, f"Registros por {nivel_hijos.lower()} — {' › '.join(ruta) or cube.TOTAL}"
                 )
+            with perf.timed("render:drilldown"):
+                st.plotly_chart(fig, use_container_width=True)
 
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(
-                    x=data_total['date'],
-                    y=data_total['total_count'],
-                    mode='lines+markers',
-                    name='TOTAL GENERAL',
-                    line=dict(color='red', width=3),
-                    marker=dict(size=8),
-                    hovertemplate='<b>TOTAL GENERAL</b><br>Fecha: %{x}<br>Registros: %{y}<extra></extra>'
-                ))
-
-                for mcp in data_agregado['mcp'].unique():
-                    df_mcp_line = data_agregado[data_agregado['mcp'] == mcp]
-                    fig.add_trace(go.Scatter(
-                        x=df_mcp_line['date'],
-                        y=df_mcp_line['count'],
-                        mode='lines+markers',
-                        name=mcp,
-                        line=dict(width=1.5),
-                        marker=dict(size=5),
-                        visible='legendonly',
-                        hovertemplate=f'<b>{mcp}</b><br>Fecha: %{{x}}<br>Registros: %{{y}}<extra></extra>'
-                    ))
-
-                fig.update_layout(
-                    title='📈 Avance de Registros por MCP y Fecha',
-                    xaxis_title='Fecha',
-                    yaxis_title='Cantidad de Registros (DNI)',
-                    hovermode='x unified',
-                    legend=dict(
-                        title='MCPs (clic para mostrar/ocultar)',
-                        yanchor="top",
-                        y=0.99,
-                        xanchor="left",
-                        x=1.01
-                    ),
-                    height=600,
-                    template='plotly_white'
-                )
+    data_agregado, data_total = perf.cached_call("load_progress_tables", load_progress_tables, campana, ruta, generacion)
+    perf.frame_size("data_agregado", data_agregado)
 
+    # GRÁFICO — Avance por fecha y MCP (desde tablas pre-agregadas)
+    if data_agregado is not None:
+        try:
+            # Solo se construyen y envían las series de las MCPs elegidas
+            mcps_linea = st.multiselect(
+                "MCPs a mostrar en el gráfico:",
+                options=sorted(data_agregado['mcp'].unique()),
+                placeholder="Solo TOTAL GENERAL"
+            )
+            with perf.timed("chart:progreso"):
+                fig = charts.build_progress_figure(data_agregado, data_total, mcps_visibles=mcps_linea)
+            with perf.timed("render:progreso"):
                 st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("`data_graf.xlsx` no contiene las columnas necesarias ('date','mcp','dni_ciu') para mostrar el gráfico temporal.")
         except Exception as e:
             st.error(f"Error al procesar data_graf: {e}")
     else:
-        st.warning("No se pudo cargar `data_graf.xlsx`. No se muestra el gráfico.")
+        st.warning(f"{data_total} No se muestra el gráfico.")
 
     st.markdown("---")
 
     # Tabla de Avance por MCP (si existe)
     st.subheader("📋 Tabla de Avance por MCP")
-    if not tabla_desagregada_mcp_merged.empty:
+    tabla_mcp = perf.cached_call("load_mcp_table", load_mcp_table, campana, generacion)
+    if mcps_ruta is not None and "MCP" in tabla_mcp.columns:
+        tabla_mcp = tabla_mcp[tabla_mcp["MCP"].map(schema.mcp_key).isin(mcps_ruta)]
+    if not tabla_mcp.empty:
         try:
-            tabla_ordenada = tabla_desagregada_mcp_merged.sort_values(
-                by=["departamento", "PROV", "MCP"]
-            )
-
-            tabla_mostrar = tabla_ordenada.rename(columns={
-                "departamento": "Departamento",
-                "PROV": "Provincia",
-                "MCP": "Municipalidad de Centro Poblado",
-                "Monitor": "Monitor",
-                "POBLACION_AJUSTADA_FINAL": "Población Electoral Estimada",
-                "dni_ciu": "Cantidad de DNIs Registrados",
-                "PORC_AVANCE": "% Avance",
-            })
-
-            # ORDENAR DE MAYOR A MENOR POR DNIs REGISTRADOS
-            tabla_mostrar = tabla_mostrar.sort_values(
-                by="Cantidad de DNIs Registrados",
-                ascending=False
-            )
-
-            tabla_mostrar = tabla_mostrar.reset_index(drop=True)
-            tabla_mostrar.index = tabla_mostrar.index + 1
-            tabla_mostrar.index.name = "N°"
-
-            columnas_mostrar = [
-                "Departamento",
-                "Provincia",
-                "Municipalidad de Centro Poblado",
-                "Población Electoral Estimada",
-                "Cantidad de DNIs Registrados",
-                "% Avance",
-                "Monitor"
-            ]
+            tabla_mostrar = views.mcp_table(tabla_mcp, calidad_dnis, ritmo["mcp"] if ritmo else None)
 
             st.dataframe(
-                tabla_mostrar[columnas_mostrar],
+                tabla_mostrar,
                 use_container_width=True,
                 height=600
             )
@@ -304,45 +384,31 @@ with tab1:
 with tab2:
     st.subheader("Detalle por MCP")
 
-    if not mcp_details:
-        st.warning("No se encontraron archivos de monitoreo (data_monitoreo_*) en la carpeta data/.")
+    if not mcp_index:
+        st.warning(f"No se encontraron archivos de monitoreo (data_monitoreo_*) en la carpeta {DATA_DIR}/.")
     else:
         # Ordenar lista de MCPs para el selector
-        lista_mcps = sorted(list(mcp_details.keys()))
+        lista_mcps = sorted(list(mcp_index.keys()))
+        # Solo las MCPs bajo la selección del drill-down de la pestaña 1
+        if mcps_ruta is not None:
+            lista_mcps = [m for m in lista_mcps if schema.mcp_key(m) in mcps_ruta] or lista_mcps
+            st.caption(f"Filtrado por {' › '.join(ruta)} (pestaña Progreso General).")
         mcp_seleccionado = st.selectbox("Selecciona un MCP:", options=lista_mcps)
 
-        # Obtener df
-        df_mcp = mcp_details.get(mcp_seleccionado, pd.DataFrame())
+        # Obtener df (consulta a la base, o solo el archivo del MCP elegido)
+        if USE_DB:
+            df_mcp, avisos_mcp = perf.cached_call("load_mcp_counts", load_mcp_counts, campana, mcp_seleccionado, generacion)
+        else:
+            df_mcp, avisos_mcp = perf.cached_call("load_mcp_detail", load_mcp_detail, mcp_index[mcp_seleccionado]["monitoreo"], generacion)
+        perf.frame_size("df_mcp", df_mcp)
+        for aviso in avisos_mcp:
+            st.warning(aviso)
 
         if df_mcp.empty:
             st.warning(f"No hay datos procesables para {mcp_seleccionado}.")
         else:
-            # Aseguramos nombres en minúsculas (nuestro contrato interno)
-            df_mcp = df_mcp.copy()
-            df_mcp.columns = [c.lower().strip() for c in df_mcp.columns]
-
-            # Si existe total_registros ya lo usamos; si no, intentar agrupar por empadronador + dni
-            if ("empadronador" in df_mcp.columns) and ("total_registros" in df_mcp.columns):
-                conteo = df_mcp.sort_values("total_registros", ascending=True)
-            else:
-                # intentar agrupar por empadronador identificando columna de dni si existe
-                possible_dni = [c for c in df_mcp.columns if "dni" in c or "doc" in c or "num_doc" in c]
-                possible_emp = [c for c in df_mcp.columns if "empadronador" in c or "usuario" in c or "registrador" in c or "nom" in c]
-
-                if possible_emp and possible_dni:
-                    emp_col = possible_emp[0]
-                    dni_col = possible_dni[0]
-                    conteo = (
-                        df_mcp.groupby(emp_col)[dni_col]
-                        .count()
-                        .reset_index(name="total_registros")
-                        .rename(columns={emp_col: "empadronador"})
-                        .sort_values("total_registros", ascending=True)
-                    )
-                else:
-                    st.error("El archivo no tiene columnas identificables para empadronador y/o DNI. "
-                             "Asegura que la hoja tenga 'empadronador' y 'total_registros' o columnas con 'dni' y 'empadronador'.")
-                    conteo = pd.DataFrame(columns=["empadronador", "total_registros"])
+            # Ambos orígenes devuelven (empadronador, total_registros) con tipos fijos (ver schema.py)
+            conteo = df_mcp.sort_values("total_registros", ascending=True)
 
             if conteo.empty:
                 st.warning("No hay registros para mostrar.")
@@ -350,30 +416,59 @@ with tab2:
                 st.markdown(f"### 🧑‍💼 Registros por empadronador — {mcp_seleccionado}")
 
                 # Gráfico horizontal
-                fig = go.Figure()
-                fig.add_trace(go.Bar(
-                    x=conteo["total_registros"],
-                    y=conteo["empadronador"],
-                    orientation="h",
-                    marker=dict(color="#4A90E2"),
-                    hovertemplate="<b>%{y}</b><br>Registros: %{x}<extra></extra>"
-                ))
-
-                fig.update_layout(
-                    title=f"Total de registros por empadronador — {mcp_seleccionado}",
-                    xaxis_title="Total de registros (DNIs)",
-                    yaxis_title="Empadronador",
-                    height=600,
-                    template="plotly_white",
-                    margin=dict(l=200)  # espacio para nombres largos de empadronadores
-                )
+                with perf.timed("chart:barras_empadronador"):
+                    fig = charts.build_empadronador_bar(conteo, mcp_seleccionado)
 
-                st.plotly_chart(fig, use_container_width=True)
+                with perf.timed("render:barras_empadronador"):
+                    st.plotly_chart(fig, use_container_width=True)
 
                 # Tabla resumen (ordenada desc)
                 st.markdown("### 📋 Tabla de conteo general")
                 st.dataframe(conteo.sort_values("total_registros", ascending=False), use_container_width=True)
 
+                # Desglose del cubo bajo la MCP (centro poblado, empadronador), si los registros lo traen
+                nodo_mcp = cube.mcp_node(cubo, mcp_seleccionado) if cubo is not None else None
+                if nodo_mcp is not None:
+                    hijos_mcp = cube.children(cubo, nodo_mcp)
+                    # Sin snapshots de la MCP todo cae en "(sin dato)": no hay desglose que mostrar
+                    if not hijos_mcp.empty and not (hijos_mcp["etiqueta"] == cube.SIN_DATO).all():
+                        nivel_hijos = cube.HIERARCHY[cube.level_name(cubo, nodo_mcp[0] + 1)]
+                        with perf.timed("chart:drilldown_mcp"):
+                            fig = charts.build_drilldown_bar(
+                                hijos_mcp, nivel_hijos, f"Registros por {nivel_hijos.lower()} — {mcp_seleccionado}"
+                            )
+                        st.plotly_chart(fig, use_container_width=True)
+
+                # ===========================================
+                # 📈 RITMO DE AVANCE Y PROYECCIÓN (forecast.py)
+                # ===========================================
+                # Cruce por clave sin tildes ni guiones (LA VILLA LETIRA BECARA -> LA VILLA LETIRA - BECARA)
+                filas_ritmo = None
+                if ritmo:
+                    filas_ritmo = ritmo["mcp"][ritmo["mcp"]["mcp"].map(schema.mcp_key) == schema.mcp_key(mcp_seleccionado)]
+                if filas_ritmo is not None and not filas_ritmo.empty:
+                    fila = filas_ritmo.iloc[0]
+                    st.markdown("---")
+                    st.markdown(f"## 📈 Ritmo de avance — últimos {forecast.WINDOW} días")
+                    with perf.timed("chart:ritmo"):
+                        fig_ritmo = charts.build_pace_figure(
+                            forecast.series(ritmo["estados"]["mcp"], fila["mcp"]), mcp_seleccionado,
+                            fila.get("meta"), fila.get("fecha_proyectada"),
+                        )
+                    with perf.timed("render:ritmo"):
+                        st.plotly_chart(fig_ritmo, use_container_width=True)
+
+                    # Por empadronador, si la fuente de registros lo trae
+                    if ritmo["empadronador"] is not None:
+                        por_emp = ritmo["empadronador"][ritmo["empadronador"]["mcp"] == fila["mcp"]]
+                        if not por_emp.empty:
+                            st.dataframe(
+                                por_emp.drop(columns="mcp").sort_values("ritmo_diario", ascending=False)
+                                .rename(columns={"empadronador": "Empadronador", "registros": "Registros",
+                                                 "ritmo_diario": "Ritmo diario (DNIs/día)"}),
+                                use_container_width=True, hide_index=True,
+                            )
+
 
                 # ===========================================
                 # 🔥 HEATMAP DE AVANCE DIARIO POR EMPADRONADOR
@@ -381,99 +476,57 @@ with tab2:
                 st.markdown("---")
                 st.markdown("## 🔥 Avance diario por empadronador")
 
-                # Nombre estandarizado para buscar el archivo
-                nombre_archivo = mcp_seleccionado.lower().replace(" ", "_")
-                path_excel = f"data/{nombre_archivo}.xlsx"
+                # Libro del heatmap emparejado por clave sin tildes (LA PEÑITA -> la_penita.xlsx)
+                path_excel = mcp_index[mcp_seleccionado]["heatmap"]
 
-                if os.path.exists(path_excel):
+                if path_excel is not None:
 
                     try:
-                        # Leer las dos hojas esperadas: 'crosstab' y 'annot'
-                        diario_df = load_excel(path_excel, sheet_name="crosstab")
-                        annot_df = load_excel(path_excel, sheet_name="annot")
-
-                        # Si load_excel devolviera dict por alguna razón, extraer primera hoja:
-                        if isinstance(diario_df, dict):
-                            diario_df = diario_df[list(diario_df.keys())[0]]
-                        if isinstance(annot_df, dict):
-                            annot_df = annot_df[list(annot_df.keys())[0]]
-
-                        if not diario_df.empty and not annot_df.empty:
-
-                            diario_sorted = diario_df.copy()
-                            annot_sorted = annot_df.copy()
-
-                            # --- FIX: asegurar índice con nombres ---
-                            # Si la primera columna contiene los nombres de empadronadores (cuando excel guardó el índice como columna)
-                            first_col = str(diario_sorted.columns[0]).lower() if len(diario_sorted.columns) > 0 else ""
-                            if first_col in ["empadronador", "empadronadores", "nombre", "nombres"]:
-                                # establecer esa columna como índice
-                                diario_sorted = diario_sorted.set_index(diario_sorted.columns[0])
-                                annot_sorted = annot_sorted.set_index(annot_sorted.columns[0])
-
-                            # Convertir columnas a fecha y limpiar columnas malas
-                            diario_sorted.columns = pd.to_datetime(diario_sorted.columns, errors="coerce")
-                            annot_sorted.columns = pd.to_datetime(annot_sorted.columns, errors="coerce")
-
-                            diario_sorted = diario_sorted.dropna(axis=1, how="all")
-                            annot_sorted = annot_sorted.dropna(axis=1, how="all")
-
-                            # Ordenar columnas (fechas)
-                            diario_sorted = diario_sorted.sort_index(axis=1)
-                            annot_sorted = annot_sorted.sort_index(axis=1)
-
-                            # Verificar que tengamos índices con nombres (empadronadores)
-                            if diario_sorted.index.is_integer() or diario_sorted.index.name is None and all(isinstance(i, (int, float)) for i in diario_sorted.index):
-                                # índice numérico: los nombres no se leyeron correctamente
-                                st.warning("Atención: el crosstab no tiene un índice de empadronadores. Verifica que la hoja 'crosstab' tenga los nombres como índice o como primera columna llamada 'empadronador'.")
-                            # Formato de fecha bonito para etiquetas x
-                            x_labels = diario_sorted.columns.strftime('%d/%m/%Y')
-
-                            # Construir HEATMAP
-                            fig_hm = go.Figure(data=go.Heatmap(
-                                z=diario_sorted.values,
-                                x=x_labels,
-                                y=diario_sorted.index.astype(str),
-                                text=annot_sorted.values,
-                                texttemplate="%{text}",
-                                colorscale="YlGnBu",
-                                zmin=0,
-                                zmax=30,
-                                colorbar=dict(title="Avances diarios"),
-                                hovertemplate=(
-                                    'Empadronador: %{y}<br>'
-                                    'Fecha: %{x}<br>'
-                                    'Avances: %{z}<extra></extra>'
-                                )
-                            ))
-
-                            fig_hm.update_layout(
-                                title=f"📅 Heatmap de avances diarios — {mcp_seleccionado}",
-                                xaxis_title="Fecha",
-                                yaxis_title="Empadronadores",
-                                width=1000,
-                                height=600,
-                                margin=dict(l=160, r=20)
-                            )
+                        # Matrices ya limpias desde el .npz (ver heatmaps.py)
+                        hm = perf.cached_call("load_heatmap_matrix", load_heatmap_matrix, path_excel, generacion)
 
-                            # Asegurar que Plotly muestre los nombres y margenes
-                            fig_hm.update_yaxes(automargin=True)
+                        if not hm["named_index"]:
+                            # índice numérico: los nombres no se leyeron correctamente
+                            st.warning("Atención: el crosstab no tiene un índice de empadronadores. Verifica que la hoja 'crosstab' tenga los nombres como índice o como primera columna llamada 'empadronador'.")
+                        with perf.timed("chart:heatmap"):
+                            fig_hm = charts.build_heatmap_figure(hm, mcp_seleccionado)
 
+                        with perf.timed("render:heatmap"):
                             st.plotly_chart(fig_hm, use_container_width=True)
 
-                        else:
-                            st.warning("Las hojas 'crosstab' o 'annot' están vacías. No se puede generar el heatmap.")
-
+                    except ValueError as e:
+                        st.warning(f"{e} No se puede generar el heatmap.")
                     except Exception as e:
                         st.error(f"Error procesando heatmap para {mcp_seleccionado}: {e}")
 
                 else:
-                    st.info(f"No se encontró el archivo '{nombre_archivo}.xlsx' en la carpeta data/.")
+                    st.info(f"No se encontró el archivo '{schema.mcp_key(mcp_seleccionado)}.xlsx' en la carpeta {DATA_DIR}/.")
 
 
 # ===========================================
 # 🗺️ TAB 3: MAPA DE EMPADRONAMIENTO (ZIP)
 # ===========================================
+@st.cache_resource
+def prepare_static_map(zip_path: str, version: str):
+    """
+    Extrae el HTML del ZIP una sola vez por versión (ver map_assets.py) en la
+    carpeta estática de la campaña activa (el ZIP ya es de esa campaña).
+    cache_resource: una sola extracción por proceso, compartida entre sesiones.
+    """
+    return map_assets.extract_map(zip_path)
+
+@st.cache_resource
+def load_map_html(html_path: str):
+    """Contenido del HTML, solo para cuando no está activo el servido estático."""
+    with open(html_path, encoding="utf-8") as f:
+        return f.read()
+
+@st.cache_data(max_entries=2 * CAMPAIGN_CACHE_ENTRIES, ttl=MCP_CACHE_TTL)
+def load_map_points(campana, version=0):
+    """Puntos ordenados por MCP (None si no se construyeron con `cli.py map` o el refresco)."""
+    perf.cache_miss("load_map_points")
+    return map_assets.read_points()
+
 with tab3:
     st.subheader("🗺️ Mapa de Empadronamiento")
 
@@ -482,25 +535,111 @@ with tab3:
         "- 🔴 Rojo: Puntos donde se registraron formularios virtuales\n"
     )
 
-    # Ruta al ZIP
-    zip_path = "data/mapa_empadronamiento.zip"
+    puntos = perf.cached_call("load_map_points", load_map_points, campana, generacion)
+    vista = "Mapa completo"
+    if puntos is not None and not puntos.empty:
+        vista = st.radio("Vista:", ["Mapa completo", "Puntos por MCP (ligero)"], horizontal=True)
+
+    if vista == "Puntos por MCP (ligero)":
+        mcp_mapa = st.selectbox("MCP:", options=sorted(puntos["mcp"].dropna().unique()), key="mcp_mapa")
+        # Solo se envían al navegador los puntos de la MCP
+        with perf.timed("query:puntos_mcp"):
+            visibles, bbox = map_assets.mcp_points(puntos, mcp_mapa)
+        with perf.timed("chart:mapa_puntos"):
+            fig_map = charts.build_points_map(visibles, bbox)
+        st.caption(f"{len(visibles):,} puntos de {mcp_mapa}")
+        with perf.timed("render:mapa_puntos"):
+            st.plotly_chart(fig_map, use_container_width=True)
 
-    if os.path.exists(zip_path):
+    else:
+        # Ruta al ZIP
+        zip_path = map_assets.map_zip_path()
+        version = map_assets.static_map_name(zip_path)
+
+        if version is not None:
+            try:
+                with perf.timed("map:preparar"):
+                    html_path = prepare_static_map(zip_path, version)
+
+                if st.get_option("server.enableStaticServing"):
+                    # El navegador descarga el HTML como archivo estático (cacheable)
+                    rel = os.path.relpath(html_path, map_assets.STATIC_DIR).replace(os.sep, "/")
+                    with perf.timed("render:mapa_iframe"):
+                        components.iframe(f"app/static/{rel}", height=800, scrolling=True)
+                else:
+                    with perf.timed("render:mapa_html"):
+                        components.html(load_map_html(html_path), height=800, scrolling=True)
 
-        import zipfile
+            except Exception as e:
+                st.error(f"Error leyendo el archivo ZIP: {e}")
 
-        try:
-            # Abrir ZIP y leer el HTML internamente
-            with zipfile.ZipFile(zip_path, "r") as z:
-                with z.open("mapa_empadronamiento.html") as f:
-                    html_content = f.read().decode("utf-8")
+        else:
+            st.error(f"No se encontró '{zip_path}'. Súbelo a la carpeta {DATA_DIR}/.")
 
-            # Mostrar el mapa en Streamlit
-            components.html(html_content, height=800, scrolling=True)
 
-        except Exception as e:
-            st.error(f"Error leyendo el archivo ZIP: {e}")
+# ===========================================
+# 🔀 TAB 4: COMPARAR CAMPAÑAS (ver compare.py)
+# ===========================================
+for tab4 in tab_comparacion:
+    with tab4:
+        st.subheader("🔀 Comparación entre campañas")
+        elegidas = st.multiselect(
+            "Campañas a comparar:", options=ids_campanas, default=ids_campanas,
+            format_func=lambda c: CAMPANAS[c]["titulo"]
+        )
+        compartido = perf.cached_call("load_comparison", load_comparison, tuple(elegidas), generacion) if elegidas else None
+        if compartido is None or compartido.empty:
+            st.info("No hay datos de avance publicados para las campañas elegidas.")
+        else:
+            with perf.timed("chart:comparacion"):
+                fig_comp = charts.build_campaign_comparison(compartido)
+            with perf.timed("render:comparacion"):
+                st.plotly_chart(fig_comp, use_container_width=True)
+            st.dataframe(views.campaign_table(compartido), use_container_width=True, hide_index=True)
+            faltan = [CAMPANAS[c]["titulo"] for c in elegidas if c not in set(compartido["campana"])]
+            if faltan:
+                st.warning(f"Sin datos de avance para: {', '.join(faltan)}.")
 
-    else:
-        st.error(f"No se encontró '{zip_path}'. Súbelo a la carpeta data/.")
 
+# ===========================================
+# ⏱️ PANEL DE RENDIMIENTO (solo administradores)
+# ===========================================
+# Visible con DASHBOARD_PERF=1 abriendo la app con ?admin=<DASHBOARD_ADMIN_TOKEN>.
+# Sin token definido el panel no se muestra (las métricas igual van al log).
+if perf.ENABLED:
+    admin_token = os.environ.get("DASHBOARD_ADMIN_TOKEN")
+    if admin_token and st.query_params.get("admin") == admin_token:
+        resumen = perf.current()
+        with st.sidebar.expander("⏱️ Rendimiento del rerun", expanded=False):
+            st.metric("Tiempo total del script", f"{resumen['total']:.3f} s")
+            st.markdown("**Tiempos**")
+            st.dataframe(
+                pd.DataFrame(resumen["timings"], columns=["etapa", "segundos"]).sort_values("segundos", ascending=False),
+                use_container_width=True, hide_index=True
+            )
+            st.markdown("**Caché (acumulado del proceso)**")
+            st.dataframe(
+                pd.DataFrame.from_dict(resumen["cache"], orient="index"),
+                use_container_width=True
+            )
+            st.markdown("**Memoria de DataFrames**")
+            st.dataframe(
+                pd.DataFrame(
+                    [(k, v / 2**20) for k, v in resumen["frames"].items()],
+                    columns=["tabla", "MB"]
+                ),
+                use_container_width=True, hide_index=True
+            )
+            estado_refresco = refresh.status(campana)
+            st.markdown(f"**Refresco de {DATA_DIR}/** — generación {estado_refresco['generation']}, "
+                        f"última revisión {estado_refresco['last_check'] or '—'}")
+            if estado_refresco["report"]:
+                st.dataframe(
+                    pd.DataFrame(estado_refresco["report"], columns=["tarea", "resultado"]),
+                    use_container_width=True, hide_index=True
+                )
+            if estado_refresco["error"]:
+                st.warning(estado_refresco["error"])
+            st.caption(f"Log estructurado: {perf.LOG_PATH}")
+
+perf.finish_run()
@@ -0,0 +1,138 @@
+# views.py
+# Tablas e indicadores tal como se muestran en la pestaña 1 (sin llamadas a
+# Streamlit): los usa la app y la exportación estática (export.py).
+import pandas as pd
+
+import dedup
+import schema
+
+COLUMNAS_TABLA_MCP = {
+    "departamento": "Departamento",
+    "PROV": "Provincia",
+    "MCP": "Municipalidad de Centro Poblado",
+    "Monitor": "Monitor",
+    "POBLACION_AJUSTADA_FINAL": "Población Electoral Estimada",
+    "dni_ciu": "Cantidad de DNIs Registrados",
+    "PORC_AVANCE": "% Avance",
+    "unicos": "DNIs únicos",
+    "duplicados": "Registros duplicados",
+    "ritmo_diario": "Ritmo diario (DNIs/día)",
+    "fecha_proyectada": "Fecha proyectada de meta",
+}
+
+
+def indicators(value_box: pd.DataFrame, calidad=None) -> list:
+    """
+    Value boxes de la pestaña 1 como [(etiqueta, valor, ayuda o None)].
+    Con la tabla de calidad (dedup.py) los DNIs son DNIs únicos.
+    """
+    # Prevenir error si value_box vacío
+    if not value_box.empty and ("Variable" in value_box.columns) and ("Valor" in value_box.columns):
+        valores = dict(zip(value_box["Variable"], value_box["Valor"]))
+    else:
+        valores = {}
+
+    dnis_reg = valores.get("dnis_registrados", 0)
+    if calidad is not None:
+        # DNIs únicos: un DNI registrado dos veces (en la misma u otra MCP) cuenta una vez
+        totales = dedup.totals(calidad)
+        dnis = (f"{totales['unicos']:,}",
+                f"DNIs únicos. Registros brutos: {totales['registros']:,} · duplicados: {totales['duplicados']:,}")
+    else:
+        dnis = (f"{int(dnis_reg):,}" if pd.notna(dnis_reg) else "0", None)
+
+    return [
+        ("🆔 DNIs Registrados", *dnis),
+        ("🗺️ Departamentos", valores.get("departamentos", 0), None),
+        ("🏛️ MCPs", valores.get("MCPs", 0), None),
+        ("📍 Centros Poblados", valores.get("CCPPs", 0), None),
+        ("🗓️ Fechas de trabajo", valores.get("fecha_registro", 0), None),
+    ]
+
+
+def mcp_table(tabla_mcp: pd.DataFrame, calidad=None, ritmo=None) -> pd.DataFrame:
+    """
+    Tabla de avance por MCP lista para mostrar: columnas renombradas,
+    DNIs únicos/duplicados (si hay tabla de calidad), ritmo y fecha
+    proyectada (si hay resumen de forecast.py) y orden por DNIs
+    registrados de mayor a menor, numerada desde 1.
+    Lanza KeyError si faltan columnas de tabla_desagregada_mcp_merged.
+    """
+    tabla = tabla_mcp.sort_values(by=["departamento", "PROV", "MCP"])
+
+    # DNIs únicos y duplicados por MCP (cruce por clave sin tildes)
+    columnas_calidad = []
+    if calidad is not None:
+        por_mcp = calidad.assign(
+            mcp_key=calidad["mcp"].map(schema.mcp_key),
+            duplicados=calidad["duplicados_mcp"] + calidad["duplicados_otra_mcp"],
+        )[["mcp_key", "unicos", "duplicados"]]
+        tabla = tabla.assign(mcp_key=tabla["MCP"].map(schema.mcp_key))
+        tabla = tabla.drop(columns=["unicos", "duplicados"], errors="ignore").merge(
+            por_mcp, on="mcp_key", how="left"
+        ).astype({"unicos": "Int64", "duplicados": "Int64"})
+        columnas_calidad = ["DNIs únicos", "Registros duplicados"]
+
+    # Ritmo de la última ventana y fecha proyectada para la meta (forecast.py)
+    columnas_ritmo = []
+    if ritmo is not None:
+        por_mcp = ritmo.assign(mcp_key=ritmo["mcp"].map(schema.mcp_key))[["mcp_key", "ritmo_diario", "fecha_proyectada"]]
+        tabla = tabla.assign(mcp_key=tabla["MCP"].map(schema.mcp_key))
+        tabla = tabla.drop(columns=["ritmo_diario", "fecha_proyectada"], errors="ignore").merge(
+            por_mcp, on="mcp_key", how="left"
+        )
+        tabla["ritmo_diario"] = tabla["ritmo_diario"].round(1)
+        tabla["fecha_proyectada"] = tabla["fecha_proyectada"].dt.date
+        columnas_ritmo = ["Ritmo diario (DNIs/día)", "Fecha proyectada de meta"]
+
+    tabla = tabla.rename(columns=COLUMNAS_TABLA_MCP)
+
+    # ORDENAR DE MAYOR A MENOR POR DNIs REGISTRADOS
+    tabla = tabla.sort_values(by="Cantidad de DNIs Registrados", ascending=False)
+    tabla = tabla.reset_index(drop=True)
+    tabla.index = tabla.index + 1
+    tabla.index.name = "N°"
+
+    columnas_mostrar = [
+        "Departamento",
+        "Provincia",
+        "Municipalidad de Centro Poblado",
+        "Población Electoral Estimada",
+        "Cantidad de DNIs Registrados",
+        *columnas_calidad,
+        "% Avance",
+        *columnas_ritmo,
+        "Monitor"
+    ]
+    return tabla[columnas_mostrar]
+
+
+def campaign_table(compartido: pd.DataFrame) -> pd.DataFrame:
+    """
+    Resumen por campaña para la vista de comparación, desde los agregados
+    compartidos de compare.py: inicio, último día, DNIs, meta, avance y
+    ritmo promedio. Una fila por campaña, en el orden en que vienen.
+    """
+    por_campana = compartido.groupby("campana", sort=False).agg(
+        titulo=("titulo", "first"),
+        region=("region", "first"),
+        inicio=("date", "min"),
+        ultimo=("date", "max"),
+        dias=("dia", "max"),
+        registros=("count", "sum"),
+        meta=("meta", "first"),
+        mcps=("mcps", "first"),
+    )
+    dias = por_campana["dias"] + 1
+    return pd.DataFrame({
+        "Campaña": por_campana["titulo"],
+        "Región": por_campana["region"].fillna(""),
+        "Inicio": por_campana["inicio"].dt.date,
+        "Último registro": por_campana["ultimo"].dt.date,
+        "Días de trabajo": dias,
+        "MCPs": por_campana["mcps"],
+        "DNIs registrados": por_campana["registros"],
+        "Meta": por_campana["meta"],
+        "% Avance": (100 * por_campana["registros"] / por_campana["meta"]).round(1),
+        "Ritmo promedio (DNIs/día)": (por_campana["registros"] / dias).round(1),
+    }).reset_index(drop=True)